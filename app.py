@@ -1,75 +1,63 @@
 import os
-from flask import Flask, render_template, redirect, url_for, request, flash, send_from_directory, send_file, jsonify, session
+from flask import Flask, current_app, render_template, redirect, url_for, request, flash, send_from_directory, send_file, jsonify, session, abort
+from flask.cli import with_appcontext
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, current_user, logout_user, current_user
 from flask_wtf import FlaskForm, CSRFProtect
-from sqlalchemy import text
+from sqlalchemy import text, func, tuple_, inspect as sa_inspect
+from sqlalchemy.orm import load_only
 from wtforms import StringField, PasswordField, SelectField, TextAreaField, DateField, IntegerField, HiddenField, FileField, SubmitField
 from wtforms.validators import DataRequired, Length
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, date, timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from io import BytesIO
-from flask_mail import Mail, Message
 import re
 import json
-from cryptography.fernet import Fernet
+import click
 from sqlalchemy import TypeDecorator, Text
 from sqlalchemy.ext.hybrid import hybrid_property
 import sqlite3
-from medications_data import ELDERLY_MEDS
-# Initialize Flask app
-app = Flask(__name__)
-# app.py
-import csv
-
-def init_medications():
-    elderly_meds = []
-    with open('medications.csv', newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            elderly_meds.append((row['brand_name'], row['generic_name'], row['common_uses']))
-
-    c.execute('SELECT COUNT(*) FROM medications')
-    if c.fetchone()[0] == 0:
-        c.executemany('INSERT INTO medications (brand_name, generic_name, common_uses) VALUES (?, ?, ?)', elderly_meds)
-        conn.commit()
-    conn.close()
-
-
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///afh.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'documents'
-app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB file size limit
-app.config['MAIL_SERVER'] = 'smtp.gmail.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'your-email@gmail.com')
-app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'your-app-password')
-app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_USERNAME', 'your-email@gmail.com')
-
-# Initialize encryption
-ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
-if not ENCRYPTION_KEY:
-    # Generate a key for development - in production, set ENCRYPTION_KEY in secrets
-    ENCRYPTION_KEY = Fernet.generate_key().decode()
-    print("Warning: Using generated encryption key. Set ENCRYPTION_KEY in secrets for production.")
-cipher = Fernet(ENCRYPTION_KEY.encode())
+from db_tuning import database_uri_from_env, engine_options_for, configure_sqlite, run_sqlite_maintenance, start_sqlite_maintenance
 
 # Import models and initialize database
-from models import db, Resident, FoodIntake, LiquidIntake, BowelMovement, UrineOutput, Vitals, EncryptedText, IncidentReport
-db.init_app(app)
-
-# Initialize other extensions
-csrf = CSRFProtect(app)
-mail = Mail(app)
-login_manager = LoginManager(app)
+from models import db, Resident, FoodIntake, LiquidIntake, IntakeDaily, IntakeRisk, BowelMovement, UrineOutput, Vitals, VitalsBaseline, EncryptedText, FIELD_CODEC, IncidentReport
+from audit import init_audit, record_audit, verify_audit_chain, create_checkpoint
+from migrations import run_migrations, current_version
+from catalog import sync_medication_catalog, import_catalog_csv
+from key_management import get_keyring, reencrypt_columns, reencrypt_files
+from envelope import ensure_data_keys, rewrap_data_keys
+from resident_directory import directory, init_resident_directory
+from resident_deletion import delete_resident_history
+from intake_risk import refresh_intake, rebuild_intake_daily, score_all_residents, at_risk_residents
+from file_reaper import init_file_reaper, reaper
+from instrumentation import endpoint_stats, init_instrumentation
+from prometheus_metrics import count_document_bytes, init_prometheus, track_mail
+from slow_queries import init_slow_query_log, slowest_statements
+from profiling import init_profiling, profiles
+from drug_interactions import interactions
+from emar import SHIFTS, build_grid, current_shift, is_id, parse_dose_results, shift_window
+
+# Extensions are bound to an app in create_app()
+csrf = CSRFProtect()
+login_manager = LoginManager()
 login_manager.login_view = 'login'
 
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Views are collected here and registered on the app in create_app(). Unlike a
+# Blueprint this keeps endpoint names unprefixed, so url_for('home') works as before.
+_routes = []
+
+def route(rule, **options):
+    def decorator(view):
+        _routes.append((rule, view, options))
+        return view
+    return decorator
+
+def get_mail():
+    """Return the app's Flask-Mail state, importing Flask-Mail on first use"""
+    if 'mail' not in current_app.extensions:
+        from flask_mail import Mail
+        Mail(current_app)
+    return current_app.extensions['mail']
 
 # Database Models
 class User(db.Model, UserMixin):
@@ -85,15 +73,17 @@ class DeleteResidentForm(FlaskForm):
 class Medication(db.Model):
     __table_args__ = {'extend_existing': True}
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     dosage = db.Column(db.String(50))
     frequency = db.Column(db.String(50))
-    _notes = db.Column(EncryptedText)
+    _notes = db.Column(EncryptedText(FIELD_CODEC))
     start_date = db.Column(db.Date)
     expiration_date = db.Column(db.Date)
     form = db.Column(db.String(50))
-    _common_uses = db.Column(EncryptedText)
+    _common_uses = db.Column(EncryptedText(FIELD_CODEC))
+    # Comma-separated HH:MM times chosen in the wizard; see emar.parse_frequency
+    administration_times = db.Column(db.String(100))
 
     @hybrid_property
     def notes(self):
@@ -112,20 +102,33 @@ class Medication(db.Model):
         self._common_uses = value
 
 class MedicationLog(db.Model):
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        db.Index('ix_medication_log_resident_date', 'resident_id', 'date'),
+        {'extend_existing': True},
+    )
     id = db.Column(db.Integer, primary_key=True)
     medication_id = db.Column(db.Integer, db.ForeignKey('medication.id'), nullable=False)
     resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
     date = db.Column(db.Date, nullable=False)
     time = db.Column(db.Time, nullable=False)
     administered = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20))  # emar.DOSE_RESULTS; administered is True only for 'administered'
+    _reason = db.Column(EncryptedText(FIELD_CODEC))  # Why a dose was refused or held
+
+    @hybrid_property
+    def reason(self):
+        return self._reason
+
+    @reason.setter
+    def reason(self, value):
+        self._reason = value
 
 class Document(db.Model):
     __table_args__ = {'extend_existing': True}
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
-    _filename = db.Column(EncryptedText, nullable=False)
-    _name = db.Column(EncryptedText, nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
+    _filename = db.Column(EncryptedText(FIELD_CODEC), nullable=False)
+    _name = db.Column(EncryptedText(FIELD_CODEC), nullable=False)
     upload_date = db.Column(db.Date, nullable=False)
     expiration_date = db.Column(db.Date)
 
@@ -151,6 +154,21 @@ class AuditLog(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     action = db.Column(db.String(100), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    prev_hash = db.Column(db.String(64))  # entry_hash of the previous entry
+    entry_hash = db.Column(db.String(64))  # sha256 over prev_hash and this entry
+
+class AuditCheckpoint(db.Model):
+    __table_args__ = {'extend_existing': True}
+    id = db.Column(db.Integer, primary_key=True)
+    last_audit_id = db.Column(db.Integer, nullable=False)
+    entry_hash = db.Column(db.String(64), nullable=False)  # chain head at last_audit_id
+    row_count = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# Audit entries are written in the same transaction as the change they record
+# and hash-chained so tampering can be detected
+init_audit(db, AuditLog, AuditCheckpoint)
+init_resident_directory(db)
 
 class MedicationCatalog(db.Model):
     __table_args__ = {'extend_existing': True}
@@ -158,9 +176,9 @@ class MedicationCatalog(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
     default_dosage = db.Column(db.String(50))
     default_frequency = db.Column(db.String(50))
-    _default_notes = db.Column(EncryptedText)
+    _default_notes = db.Column(EncryptedText(FIELD_CODEC))
     form = db.Column(db.String(50))
-    _common_uses = db.Column(EncryptedText)
+    _common_uses = db.Column(EncryptedText(FIELD_CODEC))
 
     @hybrid_property
     def default_notes(self):
@@ -187,6 +205,12 @@ class NotificationLog(db.Model):
 
     __table_args__ = (db.UniqueConstraint('alert_key', 'alert_type'),)
 
+# Tables holding a resident's history, in the order they are deleted
+RESIDENT_HISTORY_MODELS = [
+    MedicationLog, Medication, Document, FoodIntake, LiquidIntake,
+    BowelMovement, UrineOutput, Vitals, VitalsBaseline, IntakeDaily, IntakeRisk, IncidentReport,
+]
+
 # Import forms
 from forms import FoodIntakeForm, LiquidIntakeForm, BowelMovementForm, UrineOutputForm, IncidentReportForm
 
@@ -293,14 +317,15 @@ class DeleteResidentForm(FlaskForm):
 # Send email notification
 def send_alert_email(subject, body):
     try:
-        msg = Message(subject, recipients=[app.config['MAIL_DEFAULT_SENDER']])
+        from flask_mail import Message
+        msg = Message(subject, recipients=[current_app.config['MAIL_DEFAULT_SENDER']])
         msg.body = body
-        mail.send(msg)
+        with track_mail():
+            get_mail().send(msg)
     except Exception as e:
         flash(f'Failed to send email: {str(e)}')
 
 # Context processor for current year
-@app.context_processor
 def utility_processor():
     def get_current_year():
         return datetime.now().year
@@ -312,7 +337,7 @@ def load_user(user_id):
     return db.session.get(User, int(user_id))
 
 # Routes
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     form = LoginForm()
     if form.validate_on_submit():
@@ -321,27 +346,25 @@ def login():
         user = User.query.filter_by(username=username).first()
         if user and check_password_hash(user.password_hash, password):
             login_user(user)
-            audit_log = AuditLog(user_id=user.id, action=f"User {username} logged in")
-            db.session.add(audit_log)
+            record_audit(db, user.id, f"User {username} logged in")
             db.session.commit()
             return redirect(url_for('home'))
         else:
             flash('Invalid username or password')
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@route('/logout')
 @login_required
 def logout():
-    audit_log = AuditLog(user_id=current_user.id, action=f"User {current_user.username} logged out")
-    db.session.add(audit_log)
+    record_audit(db, current_user.id, f"User {current_user.username} logged out")
     db.session.commit()
     logout_user()
     return redirect(url_for('login'))
 
-@app.route('/')
+@route('/')
 @login_required
 def home():
-    residents = Resident.query.all()
+    residents = directory.all(db)
     total_residents = len(residents)
     today = date.today()
 
@@ -369,7 +392,7 @@ def home():
         for med in medications:
             if not med.expiration_date:
                 continue
-            resident = Resident.query.get(med.resident_id)
+            resident = directory.get(db, med.resident_id)
             if not resident:
                 continue
                 
@@ -387,7 +410,7 @@ def home():
         for doc in documents:
             if not doc.expiration_date:
                 continue
-            resident = Resident.query.get(doc.resident_id)
+            resident = directory.get(db, doc.resident_id)
             if not resident:
                 continue
                 
@@ -404,15 +427,25 @@ def home():
         print(f"Error checking alerts: {e}")
         alerts = []
 
+    # Residents with recent vitals or intake flags, from the cached scores
+    from vitals_analytics import flagged_residents
+    watch = {}
+    for resident_id, flags, as_of in flagged_residents(db, today) + at_risk_residents(db, today):
+        watch.setdefault(resident_id, []).extend(
+            dict(flag, message=f"{flag['message']} (as of {as_of})") for flag in flags
+        )
+    watch_flags = [(directory.get(db, resident_id), flags) for resident_id, flags in sorted(watch.items())]
+    watch_flags = [(resident, flags) for resident, flags in watch_flags if resident]
+
     chart_labels = [d.isoformat() for d in date_range]
     chart_data = {
         'breakfast': [meal_counts[d]['breakfast'] for d in chart_labels],
         'lunch': [meal_counts[d]['lunch'] for d in chart_labels],
         'dinner': [meal_counts[d]['dinner'] for d in chart_labels]
     }
-    return render_template('home.html', residents=residents, total_residents=total_residents, alerts=alerts, chart_labels=chart_labels, chart_data=chart_data)
+    return render_template('home.html', residents=residents, total_residents=total_residents, alerts=alerts, watch_flags=watch_flags, chart_labels=chart_labels, chart_data=chart_data)
 
-@app.route('/api/medication-suggestions', methods=['GET'])
+@route('/api/medication-suggestions', methods=['GET'])
 @login_required
 def medication_suggestions():
     if current_user.role != 'admin':
@@ -444,16 +477,19 @@ def medication_suggestions():
 
     return jsonify(results)
 
-@app.route('/audit_logs')
+@route('/audit_logs')
 @login_required
 def audit_logs():
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('home'))
-    logs = AuditLog.query.order_by(AuditLog.timestamp.desc()).all()
-    return render_template('audit_logs.html', logs=logs, User=User)
+    # Usernames come from the same query rather than one lookup per row
+    logs = (db.session.query(AuditLog, User.username)
+            .outerjoin(User, User.id == AuditLog.user_id)
+            .order_by(AuditLog.timestamp.desc()).all())
+    return render_template('audit_logs.html', logs=logs)
 
-@app.route('/users', methods=['GET'])
+@route('/users', methods=['GET'])
 @login_required
 def users():
     if current_user.role != 'admin':
@@ -462,7 +498,7 @@ def users():
     users = User.query.all()
     return render_template('users.html', users=users)
 
-@app.route('/user/add', methods=['GET', 'POST'])
+@route('/user/add', methods=['GET', 'POST'])
 @login_required
 def add_user():
     if current_user.role != 'admin':
@@ -485,15 +521,13 @@ def add_user():
             return render_template('add_user.html', title='Add User', form=form)
         new_user = User(username=username, password_hash=generate_password_hash(password), role=role)
         db.session.add(new_user)
-        db.session.commit()
-        audit_log = AuditLog(user_id=current_user.id, action=f"Added user {username}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Added user {username}")
         db.session.commit()
         flash('User added successfully.')
         return redirect(url_for('users'))
     return render_template('add_user.html', title='Add User', form=form)
 
-@app.route('/user/<int:user_id>/edit', methods=['GET', 'POST'])
+@route('/user/<int:user_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_user(user_id):
     if current_user.role != 'admin':
@@ -519,9 +553,7 @@ def edit_user(user_id):
                 return render_template('add_user.html', title='Edit User', form=form, user=user)
             user.password_hash = generate_password_hash(password)
         user.role = role
-        db.session.commit()
-        audit_log = AuditLog(user_id=current_user.id, action=f"Edited user {username}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Edited user {username}")
         db.session.commit()
         flash('User updated successfully.')
         return redirect(url_for('users'))
@@ -529,7 +561,7 @@ def edit_user(user_id):
     form.role.data = user.role
     return render_template('add_user.html', title='Edit User', form=form, user=user)
 
-@app.route('/user/<int:user_id>/delete', methods=['POST'])
+@route('/user/<int:user_id>/delete', methods=['POST'])
 @login_required
 def delete_user(user_id):
     if current_user.role != 'admin':
@@ -541,14 +573,12 @@ def delete_user(user_id):
         return redirect(url_for('users'))
     username = user.username
     db.session.delete(user)
-    db.session.commit()
-    audit_log = AuditLog(user_id=current_user.id, action=f"Deleted user {username}")
-    db.session.add(audit_log)
+    record_audit(db, current_user.id, f"Deleted user {username}")
     db.session.commit()
     flash('User deleted successfully.')
     return redirect(url_for('users'))
 
-@app.route('/resident/add', methods=['GET', 'POST'])
+@route('/resident/add', methods=['GET', 'POST'])
 @login_required
 def add_resident():
     if current_user.role != 'admin':
@@ -565,15 +595,13 @@ def add_resident():
             return render_template('add_resident.html', title='Add Resident', form=form)
         new_resident = Resident(name=name, dob=dob, medical_info=medical_info, emergency_contact=emergency_contact)
         db.session.add(new_resident)
-        db.session.commit()
-        audit_log = AuditLog(user_id=current_user.id, action=f"Added resident {name}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Added resident {name}")
         db.session.commit()
         flash('Resident added successfully.')
         return redirect(url_for('home'))
     return render_template('add_resident.html', title='Add Resident', form=form)
 
-@app.route('/resident/<int:resident_id>/edit', methods=['GET', 'POST'])
+@route('/resident/<int:resident_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_resident(resident_id):
     if current_user.role != 'admin':
@@ -593,9 +621,7 @@ def edit_resident(resident_id):
         resident.dob = dob
         resident.medical_info = medical_info
         resident.emergency_contact = emergency_contact
-        db.session.commit()
-        audit_log = AuditLog(user_id=current_user.id, action=f"Edited resident {name}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Edited resident {name}")
         db.session.commit()
         flash('Resident updated successfully.')
         return redirect(url_for('resident_profile', resident_id=resident_id))
@@ -605,7 +631,7 @@ def edit_resident(resident_id):
     form.emergency_contact.data = resident.emergency_contact
     return render_template('add_resident.html', title='Edit Resident', form=form, resident=resident)
 
-@app.route('/resident/<int:resident_id>/delete', methods=['GET', 'POST'])
+@route('/resident/<int:resident_id>/delete', methods=['GET', 'POST'])
 @login_required
 def delete_resident(resident_id):
     if current_user.role != 'admin':
@@ -621,33 +647,11 @@ def delete_resident(resident_id):
         if csrf_token or form.validate_on_submit():
             name = resident.name
             try:
-                medication_logs = MedicationLog.query.filter_by(resident_id=resident_id).all()
-                for log in medication_logs:
-                    db.session.delete(log)
-
-                medications = Medication.query.filter_by(resident_id=resident_id).all()
-                for med in medications:
-                    db.session.delete(med)
-
-                documents = Document.query.filter_by(resident_id=resident_id).all()
-                for doc in documents:
-                    try:
-                        os.remove(os.path.join(app.config['UPLOAD_FOLDER'], doc.filename))
-                    except OSError:
-                        pass
-                    db.session.delete(doc)
-
-                FoodIntake.query.filter_by(resident_id=resident_id).delete()
-                LiquidIntake.query.filter_by(resident_id=resident_id).delete()
-                BowelMovement.query.filter_by(resident_id=resident_id).delete()
-                UrineOutput.query.filter_by(resident_id=resident_id).delete()
-                Vitals.query.filter_by(resident_id=resident_id).delete()
+                delete_resident_history(db, resident_id, RESIDENT_HISTORY_MODELS, Document,
+                                        current_app.config['UPLOAD_FOLDER'])
 
                 db.session.delete(resident)
-                db.session.commit()
-
-                audit_log = AuditLog(user_id=current_user.id, action=f"Deleted resident {name}")
-                db.session.add(audit_log)
+                record_audit(db, current_user.id, f"Deleted resident {name}")
                 db.session.commit()
 
                 # Handle AJAX requests from resident profile page
@@ -669,12 +673,12 @@ def delete_resident(resident_id):
 
     return render_template('delete_resident.html', resident=resident, form=form)
 
-@app.route('/resident/<int:resident_id>')
+@route('/resident/<int:resident_id>')
 @login_required
 def resident_profile(resident_id):
     resident = Resident.query.get_or_404(resident_id)
     return render_template('resident_profile.html', resident=resident)
-@app.route('/search_medications')
+@route('/search_medications')
 def search_medications():
     query = request.args.get('q', '')
     if not query:
@@ -701,7 +705,7 @@ def search_medications():
     ])
 
 
-@app.route('/resident/<int:resident_id>/daily-log-wizard', methods=['GET', 'POST'])
+@route('/resident/<int:resident_id>/daily-log-wizard', methods=['GET', 'POST'])
 @login_required
 def daily_log_wizard(resident_id):
     if current_user.role not in ['admin', 'caregiver']:
@@ -781,6 +785,8 @@ def daily_log_wizard(resident_id):
             if form.submit.data and current_step_index == len(steps) - 1:
                 # Save Vitals (breakfast only)
                 if session['daily_log_wizard']['breakfast']['vitals']:
+                    # Replaces the day's reading, as daily_log_submit does, so the baseline fold stays one per day
+                    Vitals.query.filter_by(resident_id=resident_id, date=today, meal_type='breakfast').delete()
                     vitals = Vitals(
                         resident_id=resident_id,
                         date=today,
@@ -790,6 +796,10 @@ def daily_log_wizard(resident_id):
                         pulse=session['daily_log_wizard']['breakfast']['vitals']['pulse']
                     )
                     db.session.add(vitals)
+                    from vitals_analytics import update_vitals_baseline
+                    update_vitals_baseline(db, resident_id, today, {
+                        'systolic': vitals.systolic, 'diastolic': vitals.diastolic, 'pulse': vitals.pulse
+                    })
 
                 # Save Food, Liquid, Bowel, Urine for each meal
                 for meal in ['breakfast', 'lunch', 'dinner']:
@@ -832,9 +842,8 @@ def daily_log_wizard(resident_id):
                         )
                         db.session.add(urine)
 
-                db.session.commit()
-                audit_log = AuditLog(user_id=current_user.id, action=f"Completed daily log for {resident.name}")
-                db.session.add(audit_log)
+                refresh_intake(db, resident_id, today)
+                record_audit(db, current_user.id, f"Completed daily log for {resident.name}")
                 db.session.commit()
                 session.pop('daily_log_wizard', None)  # Clear session
                 flash('Daily log saved successfully.')
@@ -873,13 +882,15 @@ def daily_log_wizard(resident_id):
 
     return render_template('daily_log_wizard.html', resident=resident, form=form, current_step=current_step, current_meal=current_meal, steps=steps, current_step_index=current_step_index)
 
-@app.route('/resident/<int:resident_id>/daily-log-submit', methods=['POST'])
+@route('/resident/<int:resident_id>/daily-log-submit', methods=['POST'])
 @login_required
 def daily_log_submit(resident_id):
     if current_user.role not in ['admin', 'caregiver']:
         return jsonify({'error': 'Access denied'}), 403
 
-    resident = Resident.query.get_or_404(resident_id)
+    resident = directory.get(db, resident_id)
+    if not resident:
+        abort(404)
 
     # Handle both JSON and form data
     if request.is_json:
@@ -914,6 +925,10 @@ def daily_log_submit(resident_id):
                 pulse=int(form_data['pulse'])
             )
             db.session.add(vitals)
+            from vitals_analytics import update_vitals_baseline
+            update_vitals_baseline(db, resident_id, today, {
+                'systolic': vitals.systolic, 'diastolic': vitals.diastolic, 'pulse': vitals.pulse
+            })
 
         # Save Food Intake
         if form_data.get('intake_level'):
@@ -984,11 +999,10 @@ def daily_log_submit(resident_id):
             )
             db.session.add(urine)
 
-        db.session.commit()
+        refresh_intake(db, resident_id, today)
 
         # Audit log
-        audit_log = AuditLog(user_id=current_user.id, action=f"Completed {meal_type} log for {resident.name}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Completed {meal_type} log for {resident.name}")
         db.session.commit()
 
         return jsonify({'success': True, 'message': 'Daily log saved successfully'})
@@ -1000,7 +1014,21 @@ def daily_log_submit(resident_id):
         db.session.rollback()
         return jsonify({'error': f'Database error: {str(e)}'}), 500
 
-@app.route('/resident/<int:resident_id>/logs', methods=['GET', 'POST'])
+@route('/api/resident/<int:resident_id>/vitals')
+@login_required
+def vitals_analysis(resident_id):
+    """Vitals history with rolling baselines, z-scores, EWMA and current flags: ?days=90"""
+    if not directory.get(db, resident_id):
+        abort(404)
+    from vitals_analytics import analyze_vitals, load_vitals_arrays
+    days = request.args.get('days', 90, type=int)
+    start = date.today() - timedelta(days=days - 1) if days > 0 else None
+    analysis = analyze_vitals(load_vitals_arrays(db, resident_id, start))
+    baseline = VitalsBaseline.query.filter_by(resident_id=resident_id).first()
+    analysis['flags'] = json.loads(baseline.flags) if baseline and baseline.flags else []
+    return jsonify(analysis)
+
+@route('/resident/<int:resident_id>/logs', methods=['GET', 'POST'])
 @login_required
 def daily_logs(resident_id):
     resident = Resident.query.get_or_404(resident_id)
@@ -1057,9 +1085,8 @@ def daily_logs(resident_id):
                 return redirect(url_for('daily_logs', resident_id=resident_id, date=log_date.isoformat()))
             new_food = FoodIntake(resident_id=resident_id, date=log_date, meal_type=meal_type, intake_level=description)
             db.session.add(new_food)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Added food intake for {resident.name}")
-            db.session.add(audit_log)
+            refresh_intake(db, resident_id, log_date)
+            record_audit(db, current_user.id, f"Added food intake for {resident.name}")
             db.session.commit()
             flash('Food intake added successfully.')
         elif liquid_form.validate_on_submit() and 'add_liquid' in request.form and current_user.role in ['admin', 'caregiver']:
@@ -1067,9 +1094,8 @@ def daily_logs(resident_id):
             amount = sanitize_input(liquid_form.amount.data)
             new_liquid = LiquidIntake(resident_id=resident_id, date=log_date, meal_type='breakfast', intake=liquid_type or amount)
             db.session.add(new_liquid)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Added liquid intake for {resident.name}")
-            db.session.add(audit_log)
+            refresh_intake(db, resident_id, log_date)
+            record_audit(db, current_user.id, f"Added liquid intake for {resident.name}")
             db.session.commit()
             flash('Liquid intake added successfully.')
         elif bowel_form.validate_on_submit() and 'add_bowel' in request.form and current_user.role in ['admin', 'caregiver']:
@@ -1080,9 +1106,7 @@ def daily_logs(resident_id):
                 return redirect(url_for('daily_logs', resident_id=resident_id, date=log_date.isoformat()))
             new_bowel = BowelMovement(resident_id=resident_id, date=log_date, meal_type='breakfast', size=size, consistency=consistency)
             db.session.add(new_bowel)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Added bowel movement for {resident.name}")
-            db.session.add(audit_log)
+            record_audit(db, current_user.id, f"Added bowel movement for {resident.name}")
             db.session.commit()
             flash('Bowel movement added successfully.')
         elif urine_form.validate_on_submit() and 'add_urine' in request.form and current_user.role in ['admin', 'caregiver']:
@@ -1092,9 +1116,7 @@ def daily_logs(resident_id):
                 return redirect(url_for('daily_logs', resident_id=resident_id, date=log_date.isoformat()))
             new_urine = UrineOutput(resident_id=resident_id, date=log_date, meal_type='breakfast', output=output)
             db.session.add(new_urine)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Added urine output for {resident.name}")
-            db.session.add(audit_log)
+            record_audit(db, current_user.id, f"Added urine output for {resident.name}")
             db.session.commit()
             flash('Urine output added successfully.')
         return redirect(url_for('daily_logs', resident_id=resident_id, date=log_date.isoformat()))
@@ -1105,10 +1127,39 @@ def daily_logs(resident_id):
                           vitals=vitals, missing_logs=missing_logs, prev_date=prev_date, next_date=next_date,
                           food_form=food_form, liquid_form=liquid_form, bowel_form=bowel_form, urine_form=urine_form)
 
-@app.route('/resident/<int:resident_id>/medications', methods=['GET', 'POST'])
+def medication_log_query(resident_id):
+    """A resident's dose history with medication names joined in; callers order and bound it"""
+    return db.session.query(
+        MedicationLog.id, MedicationLog.date, MedicationLog.time, MedicationLog.status,
+        MedicationLog.administered, Medication.name.label('medication_name')
+    ).join(Medication, Medication.id == MedicationLog.medication_id).filter(MedicationLog.resident_id == resident_id)
+
+def medication_log_newest_first(query):
+    return query.order_by(MedicationLog.date.desc(), MedicationLog.time.desc(), MedicationLog.id.desc())
+
+def medication_log_status(row):
+    return (row.status or ('administered' if row.administered else 'missed')).title()
+
+def medication_log_cursor(log_date, log_time, log_id):
+    """Keyset cursor for dose history: date, time and id of the last row shown"""
+    return f"{log_date.isoformat()}T{log_time.isoformat()}_{log_id}"
+
+def parse_medication_log_cursor(value):
+    try:
+        stamp, log_id = value.rsplit('_', 1)
+        stamp = datetime.fromisoformat(stamp)
+        return stamp.date(), stamp.time(), int(log_id)
+    except (AttributeError, ValueError):
+        return None
+
+@route('/resident/<int:resident_id>/medications', methods=['GET', 'POST'])
 @login_required
 def medications(resident_id):
+    # The add-medication wizard posts form data but asks for JSON back
+    wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
     if current_user.role != 'admin':
+        if wants_json:
+            return jsonify({'error': 'Access denied'}), 403
         flash('Access denied')
         return redirect(url_for('home'))
 
@@ -1129,8 +1180,14 @@ def medications(resident_id):
             common_uses = sanitize_input(request.form.get('common_uses', ''))
             start_date_str = request.form.get('start_date', '')
             end_date_str = request.form.get('end_date', '')
+            administration_times = []
+            for key, value in request.form.items():
+                if key.startswith('medication_time_') and re.fullmatch(r'\d{2}:\d{2}', value.strip()):
+                    administration_times.append(value.strip())
 
             if not name:
+                if wants_json:
+                    return jsonify({'error': 'Medication name is required'}), 400
                 flash('Medication name is required')
                 return redirect(url_for('medications', resident_id=resident_id))
 
@@ -1148,6 +1205,12 @@ def medications(resident_id):
                 except ValueError:
                     pass
 
+            # Screen against the resident's current medications before adding
+            today = date.today()
+            findings = interactions.check(name, [
+                med.name for med in medications if not med.expiration_date or med.expiration_date >= today
+            ])
+
             new_med = Medication(
                 resident_id=resident_id, 
                 name=name, 
@@ -1157,7 +1220,8 @@ def medications(resident_id):
                 form=form_type, 
                 common_uses=common_uses, 
                 start_date=start_date, 
-                expiration_date=expiration_date
+                expiration_date=expiration_date,
+                administration_times=','.join(sorted(set(administration_times))) or None
             )
             db.session.add(new_med)
 
@@ -1173,20 +1237,23 @@ def medications(resident_id):
                 )
                 db.session.add(catalog_entry)
 
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Added medication {name} for {resident.name}")
-            db.session.add(audit_log)
+            # Ids keep the entry within AuditLog.action however long the names are
+            db.session.flush()
+            warning_note = f" ({len(findings)} interaction warnings)" if findings else ""
+            record_audit(db, current_user.id, f"Added medication {new_med.id} for resident {resident_id}{warning_note}")
             db.session.commit()
             flash('Medication added successfully.')
+            if wants_json:
+                return jsonify({'success': True, 'medication_id': new_med.id, 'findings': findings})
+            for finding in findings:
+                flash(finding['message'], 'warning')
         elif log_form.validate_on_submit() and 'log_dose' in request.form:
             medication_id = log_form.medication_id.data
             time = datetime.strptime(log_form.time.data, '%H:%M').time()
             med_name = Medication.query.get(medication_id).name
-            new_log = MedicationLog(medication_id=medication_id, resident_id=resident_id, date=date.today(), time=time, administered=True)
+            new_log = MedicationLog(medication_id=medication_id, resident_id=resident_id, date=date.today(), time=time, administered=True, status='administered')
             db.session.add(new_log)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Logged dose for {med_name} for {resident.name}")
-            db.session.add(audit_log)
+            record_audit(db, current_user.id, f"Logged dose for {med_name} for {resident.name}")
             db.session.commit()
             flash('Dose logged successfully.')
         elif 'delete_medication' in request.form:
@@ -1194,18 +1261,47 @@ def medications(resident_id):
             medication = Medication.query.get_or_404(medication_id)
             med_name = medication.name
             db.session.delete(medication)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Deleted medication {med_name} for {resident.name}")
-            db.session.add(audit_log)
+            record_audit(db, current_user.id, f"Deleted medication {med_name} for {resident.name}")
             db.session.commit()
             flash('Medication deleted successfully.')
         return redirect(url_for('medications', resident_id=resident_id))
 
-    medication_logs = MedicationLog.query.filter_by(resident_id=resident_id).all()
+    # Only the recent window is rendered; older doses are fetched page by page from medication_log_history()
+    window_start = date.today() - timedelta(days=current_app.config['MEDICATION_LOG_DAYS'] - 1)
+    medication_logs = medication_log_newest_first(
+        medication_log_query(resident_id).filter(MedicationLog.date >= window_start)
+    ).all()
+    has_older = db.session.query(
+        MedicationLog.query.filter(MedicationLog.resident_id == resident_id, MedicationLog.date < window_start).exists()
+    ).scalar()
+    older_cursor = medication_log_cursor(window_start, datetime.min.time(), 0) if has_older else None
     return render_template('medications.html', resident=resident, medications=medications, medication_logs=medication_logs,
+                          medication_log_status=medication_log_status, window_start=window_start, older_cursor=older_cursor,
                           medication_form=medication_form, log_form=log_form)
 
-@app.route('/resident/<int:resident_id>/documents', methods=['GET', 'POST'])
+@route('/api/resident/<int:resident_id>/medication-logs')
+@login_required
+def medication_log_history(resident_id):
+    """Older dose history, newest first: ?before=<cursor>&limit=50"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    page_size = min(max(request.args.get('limit', current_app.config['MEDICATION_LOG_PAGE_SIZE'], type=int), 1), 500)
+    query = medication_log_query(resident_id)
+    cursor = parse_medication_log_cursor(request.args.get('before'))
+    if cursor:
+        query = query.filter(tuple_(MedicationLog.date, MedicationLog.time, MedicationLog.id) < cursor)
+    rows = medication_log_newest_first(query).limit(page_size + 1).all()
+    next_cursor = medication_log_cursor(*[rows[page_size - 1][i] for i in (1, 2, 0)]) if len(rows) > page_size else None
+    return jsonify({
+        'logs': [
+            {'id': row.id, 'date': row.date.isoformat(), 'time': row.time.strftime('%H:%M'),
+             'medication': row.medication_name, 'status': medication_log_status(row)}
+            for row in rows[:page_size]
+        ],
+        'next': next_cursor,
+    })
+
+@route('/resident/<int:resident_id>/documents', methods=['GET', 'POST'])
 @login_required
 def documents(resident_id):
     if current_user.role != 'admin':
@@ -1233,14 +1329,12 @@ def documents(resident_id):
                 filename = f"{resident_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}"
                 encrypted_filename = f"{filename}.enc"
                 file_data = file.read()
-                encrypted_data = cipher.encrypt(file_data)
-                with open(os.path.join(app.config['UPLOAD_FOLDER'], encrypted_filename), 'wb') as f:
+                encrypted_data = get_keyring().encrypt(file_data)
+                with open(os.path.join(current_app.config['UPLOAD_FOLDER'], encrypted_filename), 'wb') as f:
                     f.write(encrypted_data)
                 new_doc = Document(resident_id=resident_id, filename=encrypted_filename, name=name, upload_date=date.today(), expiration_date=expiration_date)
                 db.session.add(new_doc)
-                db.session.commit()
-                audit_log = AuditLog(user_id=current_user.id, action=f"Uploaded document {name} for {resident.name}")
-                db.session.add(audit_log)
+                record_audit(db, current_user.id, f"Uploaded document {name} for {resident.name}")
                 db.session.commit()
                 flash('Document uploaded successfully.')
             except Exception as e:
@@ -1250,29 +1344,28 @@ def documents(resident_id):
             document = Document.query.get_or_404(document_id)
             doc_name = document.name
             try:
-                os.remove(os.path.join(app.config['UPLOAD_FOLDER'], document.filename))
+                os.remove(os.path.join(current_app.config['UPLOAD_FOLDER'], document.filename))
             except OSError:
                 pass
             db.session.delete(document)
-            db.session.commit()
-            audit_log = AuditLog(user_id=current_user.id, action=f"Deleted document {doc_name} for {resident.name}")
-            db.session.add(audit_log)
+            record_audit(db, current_user.id, f"Deleted document {doc_name} for {resident.name}")
             db.session.commit()
             flash('Document deleted successfully.')
         return redirect(url_for('documents', resident_id=resident_id))
 
     return render_template('documents.html', resident=resident, documents=documents, expired_documents=expired_documents, form=form)
 
-@app.route('/documents/<path:filename>')
+@route('/documents/<path:filename>')
 @login_required
 def serve_document(filename):
     if current_user.role != 'admin':
         flash('Access denied')
         return redirect(url_for('home'))
     try:
-        with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'rb') as f:
+        with open(os.path.join(current_app.config['UPLOAD_FOLDER'], filename), 'rb') as f:
             encrypted_data = f.read()
-        decrypted_data = cipher.decrypt(encrypted_data)
+        decrypted_data = get_keyring().decrypt(encrypted_data)
+        count_document_bytes(len(decrypted_data))
         original_filename = filename.replace('.enc', '')
         return send_file(
             BytesIO(decrypted_data),
@@ -1284,7 +1377,7 @@ def serve_document(filename):
         flash(f'Failed to serve document: {str(e)}')
         return redirect(url_for('home'))
 
-@app.route('/resident/<int:resident_id>/report', methods=['GET', 'POST'])
+@route('/resident/<int:resident_id>/report', methods=['GET', 'POST'])
 @login_required
 def report(resident_id):
     resident = Resident.query.get_or_404(resident_id)
@@ -1304,7 +1397,9 @@ def report(resident_id):
     liquid_intakes = LiquidIntake.query.filter_by(resident_id=resident_id).filter(LiquidIntake.date.between(start_date, end_date)).all()
     bowel_movements = BowelMovement.query.filter_by(resident_id=resident_id).filter(BowelMovement.date.between(start_date, end_date)).all()
     urine_outputs = UrineOutput.query.filter_by(resident_id=resident_id).filter(UrineOutput.date.between(start_date, end_date)).all()
-    medication_logs = MedicationLog.query.filter_by(resident_id=resident_id).filter(MedicationLog.date.between(start_date, end_date)).all()
+    medication_logs = medication_log_query(resident_id).filter(MedicationLog.date.between(start_date, end_date)).order_by(
+        MedicationLog.date, MedicationLog.time, MedicationLog.id
+    ).all()
 
     date_range = [start_date + timedelta(days=x) for x in range((end_date - start_date).days + 1)]
     meal_counts = {d.isoformat(): {'breakfast': 0, 'lunch': 0, 'dinner': 0} for d in date_range}
@@ -1320,6 +1415,9 @@ def report(resident_id):
     }
 
     if form.validate_on_submit() and form.export_pdf.data:
+        # ReportLab is only needed here, so it isn't imported at startup
+        from reportlab.lib.pagesizes import letter
+        from reportlab.pdfgen import canvas
         buffer = BytesIO()
         pdf = canvas.Canvas(buffer, pagesize=letter)
         pdf.setFont("Helvetica", 12)
@@ -1374,8 +1472,7 @@ def report(resident_id):
         pdf.drawString(100, y, "Medication Logs")
         y -= 20
         for log in medication_logs:
-            med_name = Medication.query.get(log.medication_id).name
-            pdf.drawString(120, y, f"{log.date} {log.time}: {med_name} - Administered")
+            pdf.drawString(120, y, f"{log.date} {log.time}: {log.medication_name} - {medication_log_status(log)}")
             y -= 15
             if y < 50:
                 pdf.showPage()
@@ -1390,10 +1487,11 @@ def report(resident_id):
     return render_template('report.html', resident=resident, start_date=start_date, end_date=end_date,
                           food_intakes=food_intakes, liquid_intakes=liquid_intakes,
                           bowel_movements=bowel_movements, urine_outputs=urine_outputs,
-                          medication_logs=medication_logs, chart_labels=json.dumps(chart_labels),
+                          medication_logs=medication_logs, medication_log_status=medication_log_status,
+                          chart_labels=json.dumps(chart_labels),
                           chart_data=json.dumps(chart_data), form=form)
 
-@app.route('/resident/<int:resident_id>/incidents', methods=['GET', 'POST'])
+@route('/resident/<int:resident_id>/incidents', methods=['GET', 'POST'])
 @login_required
 def incidents(resident_id):
     if current_user.role not in ['admin', 'caregiver']:
@@ -1418,6 +1516,7 @@ def incidents(resident_id):
             reported_by=current_user.id
         )
         db.session.add(incident)
+        record_audit(db, current_user.id, f"Created incident report for {resident.name}")
         db.session.commit()
 
         # Send alert email for high severity incidents
@@ -1430,10 +1529,6 @@ def incidents(resident_id):
                 f"Reported by: {current_user.username}"
             )
 
-        audit_log = AuditLog(user_id=current_user.id, action=f"Created incident report for {resident.name}")
-        db.session.add(audit_log)
-        db.session.commit()
-
         flash('Incident report submitted successfully.')
         return redirect(url_for('incidents', resident_id=resident_id))
 
@@ -1442,7 +1537,7 @@ def incidents(resident_id):
 
     return render_template('incidents.html', resident=resident, incidents=incidents, form=form)
 
-@app.route('/incident/<int:incident_id>/update_status', methods=['POST'])
+@route('/incident/<int:incident_id>/update_status', methods=['POST'])
 @login_required
 def update_incident_status(incident_id):
     if current_user.role != 'admin':
@@ -1454,10 +1549,7 @@ def update_incident_status(incident_id):
 
     if new_status in ['open', 'in_progress', 'closed']:
         incident.status = new_status
-        db.session.commit()
-
-        audit_log = AuditLog(user_id=current_user.id, action=f"Updated incident #{incident.id} status to {new_status}")
-        db.session.add(audit_log)
+        record_audit(db, current_user.id, f"Updated incident #{incident.id} status to {new_status}")
         db.session.commit()
 
         flash('Incident status updated successfully.')
@@ -1466,7 +1558,18 @@ def update_incident_status(incident_id):
 
     return redirect(url_for('incidents', resident_id=incident.resident_id))
 
-@app.route('/incidents/all')
+def incident_cursor(incident):
+    """Keyset cursor for the incident dashboard: date_reported and id of the last row shown"""
+    return f"{incident.date_reported.isoformat()}_{incident.id}"
+
+def parse_incident_cursor(value):
+    try:
+        stamp, incident_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(stamp), int(incident_id)
+    except (AttributeError, ValueError):
+        return None
+
+@route('/incidents/all')
 @login_required
 def all_incidents():
     if current_user.role != 'admin':
@@ -1478,7 +1581,11 @@ def all_incidents():
     severity_filter = request.args.get('severity', 'all')
     type_filter = request.args.get('type', 'all')
 
-    query = IncidentReport.query
+    # The encrypted narrative columns are loaded per incident via incident_details()
+    query = IncidentReport.query.options(load_only(
+        IncidentReport.id, IncidentReport.resident_id, IncidentReport.incident_type,
+        IncidentReport.severity, IncidentReport.status, IncidentReport.date_reported
+    ))
 
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
@@ -1487,17 +1594,455 @@ def all_incidents():
     if type_filter != 'all':
         query = query.filter_by(incident_type=type_filter)
 
-    incidents = query.order_by(IncidentReport.date_reported.desc()).all()
+    cursor = parse_incident_cursor(request.args.get('before'))
+    if cursor:
+        query = query.filter(tuple_(IncidentReport.date_reported, IncidentReport.id) < cursor)
 
-    return render_template('all_incidents.html', incidents=incidents, 
+    page_size = current_app.config['INCIDENTS_PAGE_SIZE']
+    incidents = query.order_by(IncidentReport.date_reported.desc(), IncidentReport.id.desc()).limit(page_size + 1).all()
+    next_cursor = incident_cursor(incidents[page_size - 1]) if len(incidents) > page_size else None
+    incidents = incidents[:page_size]
+    resident_names = {entry.id: entry.name for entry in directory.all(db)}
+
+    return render_template('all_incidents.html', incidents=incidents, resident_names=resident_names,
+                         next_cursor=next_cursor, is_first_page=cursor is None,
                          status_filter=status_filter, severity_filter=severity_filter, type_filter=type_filter)
 
+@route('/api/incidents/<int:incident_id>')
+@login_required
+def incident_details(incident_id):
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    incident = IncidentReport.query.get_or_404(incident_id)
+    return jsonify({
+        'id': incident.id,
+        'description': incident.description,
+        'immediate_action': incident.immediate_action,
+        'witnesses': incident.witnesses,
+        'follow_up_notes': incident.follow_up_notes,
+        'injury_occurred': incident.injury_occurred,
+        'medical_attention': incident.medical_attention,
+        'follow_up_required': incident.follow_up_required,
+    })
+
+@route('/api/incidents/summary')
+@login_required
+def incident_summary():
+    """Incident counts by status x severity x type, from one GROUP BY"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    rows = db.session.query(
+        IncidentReport.status, IncidentReport.severity, IncidentReport.incident_type, func.count()
+    ).group_by(IncidentReport.status, IncidentReport.severity, IncidentReport.incident_type).all()
+    return jsonify({
+        'total': sum(row[3] for row in rows),
+        'counts': [
+            {'status': status, 'severity': severity, 'incident_type': incident_type, 'count': count}
+            for status, severity, incident_type, count in rows
+        ],
+    })
+
+@route('/api/incidents/trends')
+@login_required
+def incident_trends():
+    """Incident trend series for charts: ?days=365&window=7"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    from incident_analytics import incident_trends as compute_trends
+    days = min(max(request.args.get('days', 90, type=int), 1), 3660)
+    window = min(max(request.args.get('window', 7, type=int), 1), days)
+    end = date.today()
+    start = end - timedelta(days=days - 1)
+    trends = compute_trends(db, start, end, len(directory.all(db)), window)
+    for entry in trends['per_resident']:
+        entry['name'] = directory.name(db, entry['resident_id'], 'Unknown resident')
+    return jsonify(trends)
+
+# Endpoints averaging more queries than this are highlighted on /admin/metrics as likely N+1 patterns
+ADMIN_METRICS_QUERY_WARNING = 20
+
+def _emar_window():
+    """Shift window from ?date=YYYY-MM-DD&shift=day|evening|night, defaulting to the current shift"""
+    shift, day = current_shift(datetime.now())
+    shift = request.args.get('shift', shift)
+    if request.args.get('date'):
+        try:
+            day = datetime.strptime(request.args['date'], '%Y-%m-%d').date()
+        except ValueError:
+            abort(400)
+    try:
+        start, end = shift_window(day, shift)
+    except ValueError:
+        abort(400)
+    return shift, day, start, end
+
+def _emar_grid(start, end):
+    residents = directory.all(db)
+    grid, unscheduled = build_grid(db, Medication, MedicationLog, start, end, [entry.id for entry in residents])
+    for slot in grid:
+        slot['resident'] = directory.name(db, slot['resident_id'], 'Unknown resident')
+    return residents, grid, unscheduled
+
+@route('/emar')
+@login_required
+def emar():
+    """Facility-wide due/missed medication grid for one shift"""
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('home'))
+    shift, day, start, end = _emar_window()
+    residents, grid, unscheduled = _emar_grid(start, end)
+    rows = {}
+    for slot in grid:
+        rows.setdefault((slot['resident'], slot['medication'], slot['dosage']), []).append(slot)
+    counts = {}
+    for slot in grid:
+        counts[slot['status']] = counts.get(slot['status'], 0) + 1
+    return render_template('emar.html', shift=shift, day=day, start=start, end=end, shifts=[name for name, _, _ in SHIFTS],
+                           rows=sorted(rows.items(), key=lambda item: tuple(part or '' for part in item[0])), counts=counts, unscheduled=unscheduled,
+                           resident_names={entry.id: entry.name for entry in residents},
+                           prev_day=day - timedelta(days=1), next_day=day + timedelta(days=1))
+
+@route('/api/emar')
+@login_required
+def emar_grid():
+    """Due/missed grid for a shift as JSON: ?date=YYYY-MM-DD&shift=day"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Access denied'}), 403
+    shift, day, start, end = _emar_window()
+    _, grid, unscheduled = _emar_grid(start, end)
+    return jsonify({
+        'date': day.isoformat(),
+        'shift': shift,
+        'start': start.isoformat(timespec='minutes'),
+        'end': end.isoformat(timespec='minutes'),
+        'slots': grid,
+        'unscheduled': [
+            {'medication_id': medication.id, 'resident_id': medication.resident_id,
+             'medication': medication.name, 'frequency': medication.frequency}
+            for medication in unscheduled
+        ],
+    })
+
+@route('/api/med-pass', methods=['GET', 'POST'])
+@login_required
+def med_pass():
+    """
+    GET: every resident's doses for a shift (?date=&shift=), grouped by
+    resident. POST: log a batch of results,
+    {"results": [{"medication_id": 1, "status": "administered|refused|held",
+    "time": "HH:MM", "date": "YYYY-MM-DD", "reason": "..."}]}. The batch is
+    validated up front and committed with its audit entries in one
+    transaction, so either every dose is logged or none is. A result for a
+    medication already logged at that date and time is rejected, so
+    resending a batch doesn't log its doses twice.
+    """
+    if current_user.role not in ['admin', 'caregiver']:
+        return jsonify({'error': 'Access denied'}), 403
+
+    if request.method == 'GET':
+        shift, day, start, end = _emar_window()
+        residents, grid, unscheduled = _emar_grid(start, end)
+        by_resident = {entry.id: {'resident_id': entry.id, 'name': entry.name, 'doses': []} for entry in residents}
+        for slot in grid:
+            by_resident[slot['resident_id']]['doses'].append(slot)
+        return jsonify({
+            'date': day.isoformat(),
+            'shift': shift,
+            'start': start.isoformat(timespec='minutes'),
+            'end': end.isoformat(timespec='minutes'),
+            'residents': [entry for entry in by_resident.values() if entry['doses']],
+        })
+
+    data = request.get_json(silent=True) or {}
+    results = data.get('results')
+    if not isinstance(results, list) or not results:
+        return jsonify({'error': 'results must be a non-empty list'}), 400
+    medication_ids = {result.get('medication_id') for result in results
+                      if isinstance(result, dict) and is_id(result.get('medication_id'))}
+    medications = {
+        medication.id: medication
+        for medication in Medication.query.options(load_only(Medication.id, Medication.resident_id, Medication.name, Medication.start_date))
+        .filter(Medication.id.in_(medication_ids))
+    }
+    entries, errors = parse_dose_results(results, medications, date.today())
+    if entries:
+        logged = {tuple(row) for row in MedicationLog.query.with_entities(
+            MedicationLog.medication_id, MedicationLog.date, MedicationLog.time
+        ).filter(MedicationLog.medication_id.in_({entry['medication_id'] for entry in entries}),
+                 MedicationLog.date.in_({entry['date'] for entry in entries}))}
+        for entry in entries:
+            key = (entry['medication_id'], entry['date'], entry['time'])
+            if key in logged:
+                errors.append({'index': entry['index'], 'error': 'This dose is already logged'})
+            logged.add(key)
+        errors.sort(key=lambda error: error['index'])
+    if errors:
+        return jsonify({'error': 'Invalid results; nothing was logged', 'errors': errors}), 400
+
+    try:
+        logs = []
+        for entry in entries:
+            medication = medications[entry['medication_id']]
+            log = MedicationLog(medication_id=medication.id, resident_id=medication.resident_id,
+                                date=entry['date'], time=entry['time'], status=entry['status'],
+                                administered=entry['status'] == 'administered', reason=entry['reason'])
+            logs.append(log)
+            # Ids rather than names keep the entry inside AuditLog.action's 100 characters
+            record_audit(db, current_user.id,
+                         f"Med pass: {entry['status']} medication {medication.id} for resident {medication.resident_id} "
+                         f"at {entry['date']} {entry['time'].strftime('%H:%M')}")
+        db.session.add_all(logs)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Database error: {str(e)}'}), 500
+    return jsonify({'success': True, 'logged': len(logs), 'log_ids': [log.id for log in logs]})
+
+@route('/admin/metrics', methods=['GET', 'POST'])
+@login_required
+def admin_metrics():
+    """Per-endpoint request time, query counts and crypto operations collected by instrumentation.py"""
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('home'))
+    if request.method == 'POST':
+        endpoint_stats.reset()
+        flash('Metrics reset.')
+        return redirect(url_for('admin_metrics'))
+    return render_template('metrics.html', enabled=current_app.config['INSTRUMENTATION'],
+                           rows=endpoint_stats.snapshot(), query_warning=ADMIN_METRICS_QUERY_WARNING)
+
+@route('/admin/slow-queries')
+@login_required
+def admin_slow_queries():
+    """Statements from the slow query log grouped by fingerprint, most total time first"""
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('home'))
+    return render_template('slow_queries.html', threshold_ms=current_app.config['SLOW_QUERY_MS'],
+                           rows=slowest_statements(current_app.config['SLOW_QUERY_LOG']))
+
+@route('/admin/profiles', methods=['GET', 'POST'])
+@login_required
+def admin_profiles():
+    """Recent on-demand request profiles taken by profiling.py"""
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('home'))
+    if request.method == 'POST':
+        profiles.clear()
+        flash('Profiles cleared.')
+        return redirect(url_for('admin_profiles'))
+    return render_template('profiles.html', enabled=current_app.config['PROFILING'], profiles=profiles.all())
+
+@route('/admin/profiles/<int:profile_id>')
+@login_required
+def download_profile(profile_id):
+    if current_user.role != 'admin':
+        flash('Access denied')
+        return redirect(url_for('home'))
+    profile = profiles.get(profile_id)
+    if profile is None:
+        abort(404)
+    return send_file(BytesIO(profile['data']), as_attachment=True, mimetype='application/octet-stream',
+                     download_name=f"profile-{profile_id}-{profile['endpoint']}.{profile['extension']}")
+
+@click.command('verify-audit-log')
+@click.option('--full', is_flag=True, help='Verify from the first entry instead of the latest checkpoint.')
+@click.option('--checkpoint/--no-checkpoint', default=True, help='Record a checkpoint after a successful run.')
+@with_appcontext
+def verify_audit_log_command(full, checkpoint):
+    """Verify the audit log hash chain."""
+    started = datetime.now()
+    result = verify_audit_chain(db, from_checkpoint=not full)
+    elapsed = (datetime.now() - started).total_seconds()
+    if not result['ok']:
+        click.echo(f"Audit log verification FAILED after {result['verified']} entries: {result['error']}")
+        raise SystemExit(1)
+    click.echo(f"Verified {result['verified']} entries in {elapsed:.2f}s (chain head #{result['last_id']})")
+    if checkpoint:
+        saved = create_checkpoint(db, result)
+        if saved:
+            click.echo(f"Checkpoint #{saved.id} at entry #{saved.last_audit_id}: {saved.entry_hash}")
+
+@click.command('sqlite-maintenance')
+@with_appcontext
+def sqlite_maintenance_command():
+    """Checkpoint the SQLite WAL and run PRAGMA optimize."""
+    result = run_sqlite_maintenance(db)
+    if result is None:
+        click.echo("Not running on SQLite, nothing to do")
+    else:
+        click.echo(f"WAL checkpoint: busy={result[0]} log={result[1]} checkpointed={result[2]}")
+
+@click.command('migrate')
+@with_appcontext
+def migrate_command():
+    """Apply pending schema migrations."""
+    applied = run_migrations(db)
+    ensure_data_keys(db)
+    click.echo(f"Schema version {current_version(db)}" + (f", applied {applied}" if applied else ", nothing to apply"))
+
+@click.command('rotate-encryption-keys')
+@click.option('--batch-size', default=500, show_default=True, help='Rows re-encrypted per transaction.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches to limit load.')
+@click.option('--skip-files', is_flag=True, help='Only re-encrypt database columns, not document files.')
+@with_appcontext
+def rotate_encryption_keys_command(batch_size, pause, skip_files):
+    """Re-encrypt stored data under the first key in ENCRYPTION_KEYS and each column's codec."""
+    def report(table_name, last_id, rotated):
+        click.echo(f"  {table_name}: through id {last_id}, {rotated} values re-encrypted so far")
+
+    click.echo(f"Re-wrapped {rewrap_data_keys(db)} data keys")
+    rotated = reencrypt_columns(db, batch_size=batch_size, pause=pause, progress=report)
+    click.echo(f"Re-encrypted {rotated} database values")
+    if not skip_files:
+        filenames = (doc.filename for doc in Document.query.yield_per(batch_size))
+        rewritten = reencrypt_files(current_app.config['UPLOAD_FOLDER'], filenames)
+        click.echo(f"Re-encrypted {rewritten} document files")
+
+@click.command('delete-resident')
+@click.argument('resident_id', type=int)
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows deleted per transaction.')
+@click.option('--username', default='admin', show_default=True, help='User the deletion is audited under.')
+@with_appcontext
+def delete_resident_command(resident_id, chunk_size, username):
+    """Delete a resident and their whole history, reporting progress."""
+    resident = db.session.get(Resident, resident_id)
+    if not resident:
+        raise click.ClickException(f"Resident {resident_id} not found")
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"User {username} not found")
+    name = resident.name
+
+    def report(table_name, deleted):
+        click.echo(f"  {table_name}: {deleted} rows deleted")
+
+    deleted = delete_resident_history(db, resident_id, RESIDENT_HISTORY_MODELS, Document,
+                                      current_app.config['UPLOAD_FOLDER'], chunk_size, report)
+    db.session.delete(db.session.get(Resident, resident_id))
+    record_audit(db, user.id, f"Deleted resident {name}")
+    db.session.commit()
+    click.echo(f"Deleted resident {name} and {deleted} history rows, removing {reaper.pending()} files...")
+    reaper.join()
+
+@click.command('import-catalog')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows parsed and inserted per transaction.')
+@with_appcontext
+def import_catalog_command(csv_path, chunk_size):
+    """Import a formulary CSV into the medication catalog, skipping names already present."""
+    def report(inserted, skipped):
+        click.echo(f"  {inserted} inserted, {skipped} skipped")
+
+    started = datetime.now()
+    with open(csv_path, newline='', encoding='utf-8-sig') as csvfile:
+        try:
+            inserted, skipped = import_catalog_csv(MedicationCatalog, csvfile, chunk_size, report)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+    click.echo(f"Imported {inserted} medications ({skipped} skipped) in {(datetime.now() - started).total_seconds():.1f}s")
+
+@click.command('rebuild-vitals-baselines')
+@with_appcontext
+def rebuild_vitals_baselines_command():
+    """Recompute every resident's vitals baseline and flags from history."""
+    from vitals_analytics import rebuild_vitals_baseline
+    for entry in directory.all(db):
+        rebuild_vitals_baseline(db, entry.id)
+        db.session.commit()
+    flagged = VitalsBaseline.query.filter(VitalsBaseline.flags != '[]').count()
+    click.echo(f"Rebuilt vitals baselines, {flagged} residents flagged")
+
+@click.command('score-intake')
+@click.option('--rebuild', is_flag=True, help='Rebuild daily intake totals from all logs first.')
+@with_appcontext
+def score_intake_command(rebuild):
+    """Recompute intake risk flags for every resident as of today."""
+    if rebuild:
+        click.echo(f"Rebuilt {rebuild_intake_daily(db)} daily intake totals")
+    flagged = score_all_residents(db, [entry.id for entry in directory.all(db)], date.today())
+    db.session.commit()
+    click.echo(f"Scored intake, {flagged} residents at risk")
+
+def create_app(config=None):
+    """Build and configure the Flask application"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', os.urandom(24))
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri_from_env()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_for(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLITE_PRAGMAS'] = {}  # overrides for db_tuning.DEFAULT_SQLITE_PRAGMAS
+    app.config['SQLITE_MAINTENANCE_INTERVAL'] = int(os.environ.get('SQLITE_MAINTENANCE_INTERVAL', 3600))  # seconds, 0 disables
+    app.config['UPLOAD_FOLDER'] = 'documents'
+    app.config['INCIDENTS_PAGE_SIZE'] = 50
+    app.config['MEDICATION_LOG_DAYS'] = 30  # days of dose history rendered on the medications page
+    app.config['MEDICATION_LOG_PAGE_SIZE'] = 50
+    app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB file size limit
+    app.config['INSTRUMENTATION'] = os.environ.get('INSTRUMENTATION', '') == '1'  # request/query timing, see /admin/metrics
+    app.config['PROMETHEUS_METRICS'] = os.environ.get('PROMETHEUS_METRICS', '') == '1'  # /metrics, needs the metrics extra
+    app.config['PROMETHEUS_METRICS_TOKEN'] = os.environ.get('PROMETHEUS_METRICS_TOKEN')  # bearer token for /metrics, which is 404 without one
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 0))  # log statements slower than this, 0 disables
+    app.config['SLOW_QUERY_LOG'] = os.environ.get('SLOW_QUERY_LOG', 'logs/slow_queries.log')
+    app.config['SLOW_QUERY_LOG_BYTES'] = 5 * 1024 * 1024  # rotated with 5 backups
+    app.config['PROFILING'] = os.environ.get('PROFILING', '') == '1'  # admins can profile a request with ?_profile=cprofile
+    app.config['PROFILE_HISTORY'] = int(os.environ.get('PROFILE_HISTORY', 20))  # profiles kept in memory
+    app.config['MAIL_SERVER'] = 'smtp.gmail.com'
+    app.config['MAIL_PORT'] = 587
+    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'your-email@gmail.com')
+    app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'your-app-password')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_USERNAME', 'your-email@gmail.com')
+    if config:
+        app.config.update(config)
+        if 'SQLALCHEMY_DATABASE_URI' in config and 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+            app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_for(config['SQLALCHEMY_DATABASE_URI'])
+
+    db.init_app(app)
+    configure_sqlite(app, db)
+    csrf.init_app(app)
+    login_manager.init_app(app)
+    if app.config['INSTRUMENTATION']:
+        init_instrumentation(app, db)
+    if app.config['PROMETHEUS_METRICS']:
+        init_prometheus(app, db)
+    if app.config['SLOW_QUERY_MS'] > 0:
+        init_slow_query_log(app, db)
+    if app.config['PROFILING']:
+        init_profiling(app)
+
+    # Ensure upload folder exists
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    with app.app_context():
+        # Every server and test app needs the data keys before its first encrypted write.
+        # A new database gets them from migrate once its tables exist.
+        if sa_inspect(db.engine).has_table('app_setting'):
+            ensure_data_keys(db)
+    init_file_reaper(app, db)
+
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.context_processor(utility_processor)
+    app.cli.add_command(verify_audit_log_command)
+    app.cli.add_command(sqlite_maintenance_command)
+    app.cli.add_command(migrate_command)
+    app.cli.add_command(rotate_encryption_keys_command)
+    app.cli.add_command(delete_resident_command)
+    app.cli.add_command(rebuild_vitals_baselines_command)
+    app.cli.add_command(score_intake_command)
+    app.cli.add_command(import_catalog_command)
+    return app
+
 # Run the app and initialize database with sample data
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        print("Creating database at afh.db...")
-        db.create_all()
-        print("Database created!")
+        print(f"Creating database at {db.engine.url.render_as_string(hide_password=True)}...")
+        applied = run_migrations(db)
+        ensure_data_keys(db)
+        print(f"Database created! Schema version {current_version(db)}" + (f", applied {applied}" if applied else ""))
         if not User.query.filter_by(username='admin').first():
             admin = User(username='admin', password_hash=generate_password_hash('admin123'), role='admin')
             db.session.add(admin)
@@ -1510,140 +2055,12 @@ if __name__ == '__main__':
             resident = Resident(name='John Doe', dob=date(1950, 1, 1), medical_info='Diabetic', emergency_contact='Jane Doe - 555-1234')
             db.session.add(resident)
             db.session.commit()
-        sample_medications = [
-            # Most commonly prescribed for elderly
-            {'name': 'Lisinopril', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor blood pressure', 'form': 'tablet', 'common_uses': 'hypertension, heart failure'},
-            {'name': 'Metformin', 'default_dosage': '500 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with meals', 'form': 'tablet', 'common_uses': 'type 2 diabetes'},
-            {'name': 'Atorvastatin', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'high cholesterol'},
-            {'name': 'Amlodipine', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor for ankle swelling', 'form': 'tablet', 'common_uses': 'hypertension, angina'},
-            {'name': 'Omeprazole', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take before breakfast', 'form': 'capsule', 'common_uses': 'GERD, stomach ulcers'},
-            {'name': 'Aricept', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'Alzheimer\'s disease'},
-            {'name': 'Furosemide', 'default_dosage': '40 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'heart failure, fluid retention'},
-            {'name': 'Warfarin', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Regular INR monitoring required', 'form': 'tablet', 'common_uses': 'blood clot prevention'},
-            {'name': 'Synthroid', 'default_dosage': '100 mcg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach', 'form': 'tablet', 'common_uses': 'hypothyroidism'},
-            {'name': 'Acetaminophen', 'default_dosage': '325 mg', 'default_frequency': 'As needed', 'default_notes': 'Max 3000 mg daily', 'form': 'tablet', 'common_uses': 'pain relief, fever'},
-            {'name': 'Gabapentin', 'default_dosage': '300 mg', 'default_frequency': 'Three times daily', 'default_notes': 'Gradual dose increase', 'form': 'capsule', 'common_uses': 'neuropathy, seizures'},
-            {'name': 'Sertraline', 'default_dosage': '50 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'depression, anxiety'},
-            {'name': 'Fosamax', 'default_dosage': '70 mg', 'default_frequency': 'Weekly', 'default_notes': 'Take on empty stomach, remain upright 30 min', 'form': 'tablet', 'common_uses': 'osteoporosis'},
-            {'name': 'Vitamin D3', 'default_dosage': '1000 IU', 'default_frequency': 'Daily', 'default_notes': 'Take with meals', 'form': 'tablet', 'common_uses': 'bone health, vitamin deficiency'},
-            {'name': 'Calcium', 'default_dosage': '500 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'bone health'},
-            {'name': 'Aspirin', 'default_dosage': '81 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'heart protection, stroke prevention'},
-            {'name': 'Sinemet', 'default_dosage': '25/100 mg', 'default_frequency': 'Three times daily', 'default_notes': 'Take with food if nausea occurs', 'form': 'tablet', 'common_uses': 'Parkinson\'s disease'},
-            {'name': 'Donepezil', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'Alzheimer\'s disease'},
-            {'name': 'Pantoprazole', 'default_dosage': '40 mg', 'default_frequency': 'Daily', 'default_notes': 'Take before breakfast', 'form': 'tablet', 'common_uses': 'GERD, stomach ulcers'},
-            {'name': 'Tramadol', 'default_dosage': '50 mg', 'default_frequency': 'As needed', 'default_notes': 'Max 400 mg daily', 'form': 'tablet', 'common_uses': 'moderate pain'},
-            {'name': 'Prednisone', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food, taper gradually', 'form': 'tablet', 'common_uses': 'inflammation, autoimmune conditions'},
-            {'name': 'Carvedilol', 'default_dosage': '12.5 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'heart failure, high blood pressure'},
-            {'name': 'Clopidogrel', 'default_dosage': '75 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'blood clot prevention'},
-            {'name': 'Metoprolol', 'default_dosage': '50 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Monitor heart rate', 'form': 'tablet', 'common_uses': 'high blood pressure, heart failure'},
-            {'name': 'Losartan', 'default_dosage': '50 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'high blood pressure'},
-            {'name': 'Hydrochlorothiazide', 'default_dosage': '25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor electrolytes', 'form': 'tablet', 'common_uses': 'high blood pressure, fluid retention'},
-            {'name': 'Glipizide', 'default_dosage': '5 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take before meals', 'form': 'tablet', 'common_uses': 'type 2 diabetes'},
-            {'name': 'Allopurinol', 'default_dosage': '300 mg', 'default_frequency': 'Daily', 'default_notes': 'Take after meals', 'form': 'tablet', 'common_uses': 'gout prevention'},
-            {'name': 'Tamsulosin', 'default_dosage': '0.4 mg', 'default_frequency': 'Daily', 'default_notes': 'Take 30 min after same meal daily', 'form': 'capsule', 'common_uses': 'enlarged prostate'},
-            {'name': 'Finasteride', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'enlarged prostate'},
-            {'name': 'Latanoprost', 'default_dosage': '0.005%', 'default_frequency': 'Daily at bedtime', 'default_notes': 'One drop in affected eye', 'form': 'eye drops', 'common_uses': 'glaucoma'},
-            {'name': 'Levothyroxine', 'default_dosage': '100 mcg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach', 'form': 'tablet', 'common_uses': 'hypothyroidism'},
-            {'name': 'Escitalopram', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'depression, anxiety'},
-            {'name': 'Fluoxetine', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take in morning', 'form': 'capsule', 'common_uses': 'depression, anxiety'},
-            {'name': 'Trazodone', 'default_dosage': '50 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'depression, insomnia'},
-            {'name': 'Lorazepam', 'default_dosage': '0.5 mg', 'default_frequency': 'As needed', 'default_notes': 'Use cautiously in elderly', 'form': 'tablet', 'common_uses': 'anxiety, insomnia'},
-            {'name': 'Zolpidem', 'default_dosage': '5 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Use lowest effective dose', 'form': 'tablet', 'common_uses': 'insomnia'},
-            {'name': 'Simvastatin', 'default_dosage': '40 mg', 'default_frequency': 'Daily at bedtime', 'default_notes': 'Monitor for muscle pain', 'form': 'tablet', 'common_uses': 'high cholesterol'},
-            {'name': 'Digoxin', 'default_dosage': '0.25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor drug levels', 'form': 'tablet', 'common_uses': 'heart failure, atrial fibrillation'},
-            {'name': 'Spironolactone', 'default_dosage': '25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'heart failure, high blood pressure'},
-            {'name': 'Potassium', 'default_dosage': '10 mEq', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'potassium deficiency'},
-            {'name': 'Iron', 'default_dosage': '325 mg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach if tolerated', 'form': 'tablet', 'common_uses': 'iron deficiency anemia'},
-            {'name': 'Multivitamin', 'default_dosage': '1 tablet', 'default_frequency': 'Daily', 'default_notes': 'Take with breakfast', 'form': 'tablet', 'common_uses': 'nutritional supplement'},
-            {'name': 'Fish Oil', 'default_dosage': '1000 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with meals', 'form': 'capsule', 'common_uses': 'heart health, inflammation'},
-            {'name': 'Celecoxib', 'default_dosage': '200 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'arthritis pain, inflammation'},
-            {'name': 'Meloxicam', 'default_dosage': '7.5 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'arthritis pain, inflammation'},
-            {'name': 'Duloxetine', 'default_dosage': '60 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'depression, anxiety, neuropathy'},
-            {'name': 'Pregabalin', 'default_dosage': '150 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Gradual dose titration', 'form': 'capsule', 'common_uses': 'neuropathy, fibromyalgia'},
-            {'name': 'Venlafaxine', 'default_dosage': '75 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'depression, anxiety'},
-            {'name': 'Mirtazapine', 'default_dosage': '15 mg', 'default_frequency': 'At bedtime', 'default_notes': 'May cause drowsiness', 'form': 'tablet', 'common_uses': 'depression'},
-            {'name': 'Quetiapine', 'default_dosage': '25 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Start with low dose', 'form': 'tablet', 'common_uses': 'bipolar disorder, schizophrenia'},
-            {'name': 'Risperidone', 'default_dosage': '1 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Monitor for side effects', 'form': 'tablet', 'common_uses': 'schizophrenia, bipolar disorder'}
-        ]
-        for med in sample_medications:
-            if not MedicationCatalog.query.filter_by(name=med['name']).first():
-                db.session.add(MedicationCatalog(**med))
-        db.session.commit()
-
-        # Sync ELDERLY_MEDS to MedicationCatalog
-        print("Syncing medications from ELDERLY_MEDS...")
-        for brand_name, generic_name, common_uses in ELDERLY_MEDS:
-            if not MedicationCatalog.query.filter_by(name=brand_name).first():
-                catalog_entry = MedicationCatalog(
-                    name=brand_name,
-                    default_dosage='',
-                    default_frequency='',
-                    default_notes=f'Generic: {generic_name}',
-                    form='',
-                    common_uses=common_uses
-                )
-                db.session.add(catalog_entry)
-        db.session.commit()
-        print("Medication sync complete!")
+        # Sync SAMPLE_MEDICATIONS and ELDERLY_MEDS to MedicationCatalog
+        inserted = sync_medication_catalog(MedicationCatalog)
+        print(f"Medication catalog synced ({inserted} added)" if inserted else "Medication catalog is up to date")
 
-        # Fix medication table column name issue
-        try:
-            from sqlalchemy import text
-            # First check what columns exist in the medication table
-            result = db.session.execute(text("PRAGMA table_info(medication)")).fetchall()
-            columns = [row[1] for row in result]  # Column names are in index 1
-
-            if 'end_date' in columns and 'expiration_date' not in columns:
-                # Rename end_date to expiration_date
-                print("Renaming end_date to expiration_date...")
-                db.session.execute(text("ALTER TABLE medication RENAME COLUMN end_date TO expiration_date"))
-                db.session.commit()
-                print("Successfully renamed end_date to expiration_date!")
-            elif 'expiration_date' not in columns:
-                # Add expiration_date column
-                print("Adding expiration_date column...")
-                db.session.execute(text("ALTER TABLE medication ADD COLUMN expiration_date DATE"))
-                db.session.commit()
-                print("expiration_date column added successfully!")
-            else:
-                print("Medication table is already up to date")
-        except Exception as e:
-            print(f"Error updating medication table: {e}")
-            # If there's still an issue, try to recreate the table
-            try:
-                print("Attempting to fix medication table structure...")
-                db.session.execute(text("""
-                    CREATE TABLE IF NOT EXISTS medication_new (
-                        id INTEGER PRIMARY KEY,
-                        resident_id INTEGER NOT NULL,
-                        name VARCHAR(100) NOT NULL,
-                        dosage VARCHAR(50),
-                        frequency VARCHAR(50),
-                        _notes TEXT,
-                        start_date DATE,
-                        expiration_date DATE,
-                        form VARCHAR(50),
-                        _common_uses TEXT,
-                        FOREIGN KEY (resident_id) REFERENCES resident(id)
-                    )
-                """))
-
-                # Copy data from old table if it exists
-                db.session.execute(text("""
-                    INSERT INTO medication_new (id, resident_id, name, dosage, frequency, _notes, start_date, expiration_date, form, _common_uses)
-                    SELECT id, resident_id, name, dosage, frequency, _notes, start_date, 
-                           COALESCE(expiration_date, end_date) as expiration_date, form, _common_uses
-                    FROM medication
-                """))
-
-                # Drop old table and rename new one
-                db.session.execute(text("DROP TABLE medication"))
-                db.session.execute(text("ALTER TABLE medication_new RENAME TO medication"))
-                db.session.commit()
-                print("Medication table structure fixed!")
-            except Exception as fix_error:
-                print(f"Error fixing medication table: {fix_error}")
-                db.session.rollback()
+    if app.config['SQLITE_MAINTENANCE_INTERVAL'] > 0:
+        start_sqlite_maintenance(app, db, app.config['SQLITE_MAINTENANCE_INTERVAL'])
 
     import os
     port = int(os.environ.get('PORT', 8080))
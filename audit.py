@@ -0,0 +1,203 @@
+import hashlib
+from datetime import datetime
+from sqlalchemy import event, inspect, select, text
+
+# Key under which pending audit entries are stashed on the session
+_PENDING_KEY = 'pending_audit_entries'
+
+# prev_hash of the first entry in the chain
+GENESIS_HASH = '0' * 64
+
+# Transaction-level advisory lock serializing chain appends on PostgreSQL
+_CHAIN_LOCK_KEY = 0x415544  # 'AUD'
+
+_audit_model = None
+_checkpoint_model = None
+
+
+def init_audit(db, audit_model, checkpoint_model=None):
+    """
+    Register the session hooks that write queued audit entries.
+    Entries recorded with record_audit() are added to the session right
+    before it commits, so they land in the same transaction as the change
+    they describe instead of needing a second commit.
+    """
+    global _audit_model, _checkpoint_model
+    _audit_model = audit_model
+    _checkpoint_model = checkpoint_model
+    if not event.contains(db.session, 'before_commit', _write_pending_entries):
+        event.listen(db.session, 'before_commit', _write_pending_entries)
+        event.listen(db.session, 'after_soft_rollback', _discard_pending_entries)
+    if not event.contains(audit_model, 'before_update', _reject_audit_update):
+        event.listen(audit_model, 'before_update', _reject_audit_update)
+        event.listen(audit_model, 'before_delete', _reject_audit_delete)
+
+
+def record_audit(db, user_id, action):
+    """Queue an audit entry to be written with the session's next commit"""
+    pending = db.session.info.setdefault(_PENDING_KEY, [])
+    pending.append((user_id, action, datetime.utcnow()))
+
+
+def compute_entry_hash(prev_hash, entry_id, user_id, timestamp, action):
+    """Hash one audit entry together with the hash of the entry before it"""
+    payload = f"{prev_hash}|{entry_id}|{user_id}|{timestamp.isoformat()}|{action}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _previous_hash(session, entry_id):
+    """Return the entry_hash of the row just before entry_id"""
+    prev = session.execute(
+        select(_audit_model.entry_hash)
+        .where(_audit_model.id < entry_id)
+        .order_by(_audit_model.id.desc())
+        .limit(1)
+    ).scalar()
+    return prev or GENESIS_HASH
+
+
+def _write_pending_entries(session):
+    """Add queued audit entries to the session and chain them before it commits"""
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    entries = [
+        _audit_model(user_id=user_id, action=action, timestamp=timestamp)
+        for user_id, action, timestamp in pending
+    ]
+    # SQLite's write lock already serializes writers once we insert; server
+    # databases need an explicit lock so concurrent appends can't fork the chain
+    if session.get_bind().dialect.name == 'postgresql':
+        session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': _CHAIN_LOCK_KEY})
+    session.add_all(entries)
+    # Inserting first assigns ids and takes the write lock, so no other
+    # writer can slip a row in between the chain head and our entries
+    session.flush(entries)
+    prev_hash = _previous_hash(session, entries[0].id)
+    for entry in entries:
+        entry.prev_hash = prev_hash
+        entry.entry_hash = compute_entry_hash(prev_hash, entry.id, entry.user_id, entry.timestamp, entry.action)
+        prev_hash = entry.entry_hash
+
+
+def _discard_pending_entries(session, previous_transaction):
+    """Drop queued audit entries when their transaction is rolled back"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _reject_audit_update(mapper, connection, target):
+    """Only allow an entry's hashes to be filled in once; everything else is immutable"""
+    state = inspect(target)
+    for attr in ('user_id', 'action', 'timestamp'):
+        if state.attrs[attr].history.has_changes():
+            raise RuntimeError("Audit log entries are append-only")
+    for attr in ('prev_hash', 'entry_hash'):
+        history = state.attrs[attr].history
+        if history.has_changes() and any(value is not None for value in history.deleted):
+            raise RuntimeError("Audit log entries are append-only")
+
+
+def _reject_audit_delete(mapper, connection, target):
+    raise RuntimeError("Audit log entries are append-only")
+
+
+def seal_unhashed_entries(db, batch_size=5000, progress=None):
+    """
+    Chain entries written before hashing was introduced.
+    Works through the table in id order, one batch per transaction, calling
+    progress(sealed_so_far) after each batch. Returns the number sealed.
+    """
+    table = _audit_model.__table__
+    sealed = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.user_id, table.c.timestamp, table.c.action)
+            .where(table.c.entry_hash.is_(None))
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return sealed
+        prev_hash = _previous_hash(db.session, rows[0].id)
+        for row in rows:
+            entry_hash = compute_entry_hash(prev_hash, row.id, row.user_id, row.timestamp, row.action)
+            db.session.execute(
+                table.update().where(table.c.id == row.id).values(prev_hash=prev_hash, entry_hash=entry_hash)
+            )
+            prev_hash = entry_hash
+        db.session.commit()
+        sealed += len(rows)
+        if progress:
+            progress(sealed)
+
+
+def verify_audit_chain(db, from_checkpoint=True, batch_size=5000):
+    """
+    Recompute the audit hash chain in id order.
+    Rows are fetched in keyset-paginated batches of plain tuples, so memory
+    stays constant regardless of table size. When from_checkpoint is set and
+    a checkpoint exists, verification resumes after the latest checkpoint.
+    Returns a dict with 'ok', 'verified', 'last_id', 'last_hash' and, on
+    failure, 'error' and 'failed_id'. Successful results also carry 'total',
+    the number of entries covered including those behind the checkpoint.
+    """
+    table = _audit_model.__table__
+    last_id = 0
+    prev_hash = GENESIS_HASH
+    already_verified = 0
+
+    if from_checkpoint and _checkpoint_model is not None:
+        checkpoint = _checkpoint_model.query.order_by(_checkpoint_model.id.desc()).first()
+        if checkpoint:
+            stored = db.session.execute(
+                select(table.c.entry_hash).where(table.c.id == checkpoint.last_audit_id)
+            ).scalar()
+            if stored != checkpoint.entry_hash:
+                return {'ok': False, 'verified': 0, 'last_id': checkpoint.last_audit_id, 'last_hash': stored,
+                        'failed_id': checkpoint.last_audit_id,
+                        'error': f"Entry #{checkpoint.last_audit_id} no longer matches checkpoint #{checkpoint.id}"}
+            last_id = checkpoint.last_audit_id
+            prev_hash = checkpoint.entry_hash
+            already_verified = checkpoint.row_count
+
+    verified = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, table.c.user_id, table.c.timestamp, table.c.action,
+                   table.c.prev_hash, table.c.entry_hash)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        for entry_id, user_id, timestamp, action, row_prev_hash, row_hash in rows:
+            if row_prev_hash != prev_hash:
+                return {'ok': False, 'verified': verified, 'last_id': last_id, 'last_hash': prev_hash,
+                        'failed_id': entry_id, 'error': f"Entry #{entry_id} does not link to the entry before it"}
+            if compute_entry_hash(prev_hash, entry_id, user_id, timestamp, action) != row_hash:
+                return {'ok': False, 'verified': verified, 'last_id': last_id, 'last_hash': prev_hash,
+                        'failed_id': entry_id, 'error': f"Entry #{entry_id} has been modified"}
+            prev_hash = row_hash
+            last_id = entry_id
+            verified += 1
+
+    return {'ok': True, 'verified': verified, 'total': already_verified + verified,
+            'last_id': last_id, 'last_hash': prev_hash}
+
+
+def create_checkpoint(db, result):
+    """Record the chain head from a successful verification as a checkpoint"""
+    if not result['ok'] or not result['last_id']:
+        return None
+    latest = _checkpoint_model.query.order_by(_checkpoint_model.id.desc()).first()
+    if latest and latest.last_audit_id == result['last_id']:
+        return latest
+    checkpoint = _checkpoint_model(
+        last_audit_id=result['last_id'],
+        entry_hash=result['last_hash'],
+        row_count=result['total']
+    )
+    db.session.add(checkpoint)
+    db.session.commit()
+    return checkpoint
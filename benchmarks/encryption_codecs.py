@@ -0,0 +1,60 @@
+"""
+Micro-benchmark for the EncryptedText codecs in envelope.py.
+
+Encrypts and decrypts sample values of typical field sizes (a name, a
+short note, an incident description) with each codec, and prints
+throughput and the stored size compared with the plaintext.
+
+    python benchmarks/encryption_codecs.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import envelope
+from envelope import CODECS, DATA_KEY_SIZE, decrypt_value, encrypt_value
+
+SAMPLES = {
+    'name (12 B)': 'Margaret Lee',
+    'note (200 B)': 'Ate most of breakfast, refused toast. ' * 5 + 'Fluids ok.',
+    'incident (2 KB)': 'Resident found seated on floor beside bed, no visible injury. ' * 32,
+}
+SCOPE = 'benchmark'
+
+
+def bench(codec, plaintext, iterations):
+    """Return (encrypt ops/s, decrypt ops/s, stored size in bytes)"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        token = encrypt_value(plaintext, codec, SCOPE)
+    encrypt_rate = iterations / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        decrypt_value(token, SCOPE)
+    decrypt_rate = iterations / (time.perf_counter() - start)
+    return encrypt_rate, decrypt_rate, len(token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    if not os.environ.get('ENCRYPTION_KEYS'):
+        from cryptography.fernet import Fernet
+        os.environ['ENCRYPTION_KEYS'] = Fernet.generate_key().decode()
+    envelope.data_keys.add(SCOPE, 1, os.urandom(DATA_KEY_SIZE))
+
+    for label, plaintext in SAMPLES.items():
+        size = len(plaintext.encode())
+        print(f"{label}")
+        for codec in CODECS:
+            encrypt_rate, decrypt_rate, stored = bench(codec, plaintext, args.iterations)
+            print(f"  {codec:<18} {encrypt_rate:10.0f} enc/s {decrypt_rate:10.0f} dec/s "
+                  f"{stored:6d} B stored (+{(stored - size) * 100 / size:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Hot-path benchmarks on a synthetic facility.
+
+Builds a database with synthetic_data.py (or reuses --database), then
+times the pages and actions staff use most through the Flask test client:
+the dashboard, daily logs and the wizard submit, the report as HTML and
+PDF, the medication suggestion endpoints, the audit log, the incident
+dashboard and the expiry alert pass. Each case runs --rounds times after
+a warm-up. The median, the fastest run and the number of SQL statements
+are printed and written to --output as JSON.
+
+With --baseline, the run exits non-zero when a case's median is more than
+--tolerance (and at least --min-delta-ms) slower than the baseline, or when
+it runs more statements, so a CI job can keep a baseline from the main
+branch and fail on regressions. Statement counts don't depend on the
+machine, so they catch new N+1 patterns even where timings are noisy.
+
+    python benchmarks/hot_paths.py --residents 20 --years 1 --output main.json
+    python benchmarks/hot_paths.py --baseline main.json --tolerance 0.25
+"""
+import argparse
+import atexit
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic_data import create_database, populate
+
+
+def cases(app, resident_id):
+    """(name, callable) pairs; request cases return the response, which must be a 200"""
+    from app import Document, Medication, db, get_mail
+    from medication_notifications import check_and_send_medication_alerts
+    from models import Resident
+
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+    if response.status_code != 302:
+        raise SystemExit('Could not log in as admin')
+    today = date.today()
+    report_url = (f'/resident/{resident_id}/report?start_date={(today - timedelta(days=30)).isoformat()}'
+                  f'&end_date={today.isoformat()}')
+    wizard_entry = {'meal_type': 'lunch', 'form_data': {
+        'intake_level': '75%', 'liquid_1': 'Yes', 'liquid_2': 'Partial',
+        'size': 'Medium', 'consistency': 'Soft', 'urine_output': 'Yes',
+    }}
+
+    def alert_pass():
+        with app.app_context():
+            check_and_send_medication_alerts(db, get_mail(), Medication, Document, Resident)
+
+    return [
+        ('home', lambda: client.get('/')),
+        ('daily_logs', lambda: client.get(f'/resident/{resident_id}/logs?date={(today - timedelta(days=1)).isoformat()}')),
+        ('daily_log_submit', lambda: client.post(f'/resident/{resident_id}/daily-log-submit', json=wizard_entry)),
+        ('report_html', lambda: client.get(report_url)),
+        ('report_pdf', lambda: client.post(report_url, data={'export_pdf': '1'})),
+        ('medication_suggestions', lambda: client.get('/api/medication-suggestions?term=pril')),
+        ('search_medications', lambda: client.get('/search_medications?q=pain')),
+        ('audit_logs', lambda: client.get('/audit_logs')),
+        ('all_incidents', lambda: client.get('/incidents/all')),
+        ('alert_pass', alert_pass),
+    ]
+
+
+def run_cases(app, db, rounds, only=None):
+    """{case: {'median_ms', 'min_ms', 'queries'}}; queries is the statement count of the last run"""
+    from instrumentation import init_query_timing, query_observers
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    init_query_timing(app, db)
+    query_observers.append(count)
+    results = {}
+    try:
+        for name, case in cases(app, resident_id=1):
+            if only and name not in only:
+                continue
+            timings = []
+            for attempt in range(rounds + 1):
+                statements[0] = 0
+                started = time.perf_counter()
+                response = case()
+                elapsed = (time.perf_counter() - started) * 1000
+                if response is not None and response.status_code != 200:
+                    raise SystemExit(f"{name} returned {response.status_code}")
+                if attempt:  # the first run warms caches
+                    timings.append(elapsed)
+            results[name] = {'median_ms': round(statistics.median(timings), 2),
+                             'min_ms': round(min(timings), 2), 'queries': statements[0]}
+    finally:
+        query_observers.remove(count)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms=0):
+    """Return the regressions against a baseline run as messages"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        slower = result['median_ms'] - before['median_ms']
+        if result['median_ms'] > before['median_ms'] * (1 + tolerance) and slower >= min_delta_ms:
+            regressions.append(f"{name}: median {result['median_ms']} ms, baseline {before['median_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: {result['queries']} queries, baseline {before['queries']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database', help='SQLite file to reuse; generated when missing. Defaults to a temporary file')
+    parser.add_argument('--residents', type=int, default=20)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--case', action='append', help='Only run this case (repeatable)')
+    parser.add_argument('--output', help='Write results as JSON')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed median slowdown, 0.25 = 25%%')
+    parser.add_argument('--min-delta-ms', type=float, default=5,
+                        help='Ignore slowdowns smaller than this, which are mostly timer noise on fast cases')
+    args = parser.parse_args()
+
+    from app import db
+    workdir = tempfile.mkdtemp(prefix='afh-bench-')
+    atexit.register(shutil.rmtree, workdir, True)
+    path = args.database or os.path.join(workdir, 'bench.db')
+    generate = not os.path.exists(path)
+    app = create_database(path, UPLOAD_FOLDER=os.path.join(workdir, 'documents'))
+    dataset = {'residents': args.residents, 'years': args.years, 'seed': args.seed}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['dataset'] != dataset:
+            raise SystemExit(f"Baseline was recorded on a different dataset: {baseline['dataset']}")
+    if generate:
+        started = time.perf_counter()
+        with app.app_context():
+            counts = populate(db, residents=args.residents, years=args.years, seed=args.seed)
+        print(f"Generated {counts['daily_log_rows']} daily log rows and {counts['dose_logs']} dose logs "
+              f"for {counts['residents']} residents in {time.perf_counter() - started:.1f}s")
+
+    results = run_cases(app, db, args.rounds, only=args.case)
+    print(f"{'case':<24}{'median ms':>12}{'min ms':>10}{'queries':>9}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['median_ms']:>12.1f}{result['min_ms']:>10.1f}{result['queries']:>9}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'dataset': dataset, 'python': sys.version.split()[0], 'results': results}, f, indent=2)
+
+    if args.baseline:
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Import-time guard for cold starts.
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter, reports
+the cumulative import time of app.py and its slowest dependencies, and fails
+when a module that should be imported lazily shows up, or when the import
+takes longer than --max-ms.
+
+    python benchmarks/import_time.py --max-ms 800
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy modules only needed on specific code paths
+LAZY_MODULES = [
+    'reportlab',  # PDF export in report()
+    'flask_mail',  # alert emails
+    'cryptography',  # first encrypt/decrypt
+    'medications_data',  # catalog seeding
+    'numpy',  # incident and vitals analytics
+]
+
+
+def measure(runs=3):
+    """Return (best cumulative app import time in microseconds, {module: cumulative us}) over `runs` fresh imports"""
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import app'],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise SystemExit(f"Importing app failed:\n{result.stderr}")
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            fields = line[len('import time:'):].split('|')
+            modules[fields[2].strip()] = int(fields[1])
+        total = modules.get('app')
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-ms', type=float, default=None, help='fail when importing app takes longer than this')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='number of top-level dependencies to list')
+    args = parser.parse_args()
+
+    total, modules = measure(args.runs)
+    print(f"import app: {total / 1000:.1f} ms (best of {args.runs})")
+    top_level = sorted(
+        ((name, us) for name, us in modules.items() if '.' not in name and name != 'app'),
+        key=lambda item: item[1], reverse=True
+    )
+    for name, us in top_level[:args.top]:
+        print(f"  {name:<24} {us / 1000:7.1f} ms")
+
+    failures = [f"{name} is imported at startup" for name in LAZY_MODULES
+                if any(module == name or module.startswith(name + '.') for module in modules)]
+    if args.max_ms is not None and total / 1000 > args.max_ms:
+        failures.append(f"import took {total / 1000:.1f} ms, budget is {args.max_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
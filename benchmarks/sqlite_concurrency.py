@@ -0,0 +1,107 @@
+"""
+Concurrent read/write benchmark for the SQLite tuning in db_tuning.py.
+
+Runs writer threads (caregivers saving logs, one commit per row) alongside
+reader threads (an admin running report-style aggregates) for a fixed time,
+once with SQLite defaults and once with DEFAULT_SQLITE_PRAGMAS, and prints
+throughput and "database is locked" errors for each.
+
+    python benchmarks/sqlite_concurrency.py --seconds 5 --writers 4 --readers 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_tuning import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+
+def make_engine(path, pragmas):
+    # timeout=0 so the defaults run really has no busy timeout, like a
+    # connection opened without any configuration
+    engine = create_engine(f"sqlite:///{path}", connect_args={'timeout': 0})
+    if pragmas:
+        @event.listens_for(engine, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            apply_sqlite_pragmas(dbapi_connection, pragmas)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS food_intake (id INTEGER PRIMARY KEY, resident_id INTEGER, "
+            "date DATE, meal_type VARCHAR(20), intake_level VARCHAR(20))"
+        ))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_bench_resident ON food_intake (resident_id, date)"))
+    return engine
+
+
+def run(pragmas, seconds, writers, readers):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    engine = make_engine(path, pragmas)
+    counts = {'writes': 0, 'reads': 0, 'locked': 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def bump(key):
+        with lock:
+            counts[key] += 1
+
+    def writer(resident_id):
+        while not stop.is_set():
+            try:
+                with engine.begin() as connection:
+                    connection.execute(
+                        text("INSERT INTO food_intake (resident_id, date, meal_type, intake_level) "
+                             "VALUES (:r, date('now'), 'lunch', '75%')"),
+                        {'r': resident_id}
+                    )
+                bump('writes')
+            except OperationalError:
+                bump('locked')
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        "SELECT resident_id, meal_type, COUNT(*) FROM food_intake GROUP BY resident_id, meal_type"
+                    )).fetchall()
+                bump('reads')
+            except OperationalError:
+                bump('locked')
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    args = parser.parse_args()
+
+    for label, pragmas in (('defaults', None), ('tuned', DEFAULT_SQLITE_PRAGMAS)):
+        counts = run(pragmas, args.seconds, args.writers, args.readers)
+        print(f"{label:>8}: {counts['writes'] / args.seconds:8.0f} writes/s  "
+              f"{counts['reads'] / args.seconds:8.0f} reads/s  {counts['locked']:6d} locked errors")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""
+Synthetic facility data for the benchmarks.
+
+Fills a database with residents, years of daily logs and vitals,
+medications with their scheduled dose logs, document records, incident
+reports and a sealed audit trail. Rows are written through the models'
+column types, so encrypted columns hold real ciphertext under the
+configured keys, as in production. Document rows have no files behind
+them. Runs are reproducible for a given --seed.
+
+    python benchmarks/synthetic_data.py bench.db --residents 20 --years 2
+"""
+import argparse
+import os
+import random
+import sys
+import time as clock
+from datetime import date, datetime, time, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+FIRST_NAMES = ['Margaret', 'Harold', 'Dorothy', 'Walter', 'Betty', 'Eugene', 'Ruth', 'Clarence', 'Helen',
+               'Arthur', 'Mildred', 'Raymond', 'Frances', 'Howard', 'Evelyn', 'Ernest', 'Gladys', 'Floyd']
+LAST_NAMES = ['Anderson', 'Nguyen', 'Okafor', 'Schmidt', 'Yamamoto', 'Rivera', 'Kowalski', 'Johansson',
+              'Patel', 'Murphy', 'Haddad', 'Larsen', 'Fitzgerald', 'Moreau', 'Castillo', 'Becker']
+CONDITIONS = ['Type 2 diabetes', 'Hypertension', 'Mild dementia', 'COPD', 'Atrial fibrillation',
+              'Osteoarthritis', 'Congestive heart failure', 'Parkinson disease', 'Chronic kidney disease']
+MEALS = ('breakfast', 'lunch', 'dinner')
+FOOD_LEVELS = ['100%'] * 5 + ['75%'] * 4 + ['50%'] * 2 + ['25%', 'Ensure', 'Other']
+LIQUIDS = ['Yes'] * 6 + ['Partial', 'No']
+FREQUENCIES = ['Daily', 'Daily', 'Twice daily', 'Three times daily', 'Every 8 hours', 'At bedtime',
+               'Weekly', 'Every other day', 'As needed']
+INCIDENT_TYPES = ['fall', 'medication_error', 'behavioral', 'injury', 'elopement', 'other']
+SEVERITIES = ['low'] * 5 + ['medium'] * 3 + ['high', 'critical']
+DOCUMENT_NAMES = ['Care plan', 'Physician orders', 'POLST', 'Negotiated care plan', 'TB test',
+                  'Insurance card', 'Assessment', 'Power of attorney']
+
+
+def _daily_rows(rng, resident_id, day, baseline):
+    """One day of wizard entries: vitals, three meals of food, liquid, bowel and urine logs"""
+    from intake_codes import food_intake_code, liquid_intake_code
+    rows = {'vitals': [], 'food': [], 'liquid': [], 'bowel': [], 'urine': []}
+    systolic, diastolic, pulse = baseline
+    rows['vitals'].append({
+        'resident_id': resident_id, 'date': day, 'meal_type': 'breakfast',
+        'systolic': int(rng.gauss(systolic, 8)), 'diastolic': int(rng.gauss(diastolic, 6)), 'pulse': int(rng.gauss(pulse, 6)),
+    })
+    for meal in MEALS:
+        level = rng.choice(FOOD_LEVELS)
+        rows['food'].append({
+            'resident_id': resident_id, 'date': day, 'meal_type': meal, 'intake_level': level,
+            'intake_code': food_intake_code(level), '_notes': 'Ate half a sandwich and soup' if level == 'Other' else None,
+        })
+        for i in range(1, rng.choice((2, 3, 3, 4))):
+            intake = f"Liquid {i}: {rng.choice(LIQUIDS)}"
+            rows['liquid'].append({'resident_id': resident_id, 'date': day, 'meal_type': meal,
+                                   'intake': intake, 'intake_code': liquid_intake_code(intake)})
+        rows['urine'].append({'resident_id': resident_id, 'date': day, 'meal_type': meal,
+                              'output': 'Yes' if rng.random() < 0.9 else 'No'})
+    if rng.random() < 0.8:
+        rows['bowel'].append({'resident_id': resident_id, 'date': day, 'meal_type': rng.choice(MEALS),
+                              'size': rng.choice(('Small', 'Medium', 'Large')),
+                              'consistency': rng.choice(('Soft', 'Medium', 'Hard'))})
+    return rows
+
+
+def _dose_rows(rng, medication, start, end):
+    """Logged doses for every scheduled slot of a medication, with some refused or held"""
+    from emar import materialize_slots, parse_frequency
+    rows = []
+    rule = parse_frequency(medication.frequency, medication.administration_times)
+    for slot in materialize_slots(medication, rule, start, end):
+        roll = rng.random()
+        status = 'administered' if roll < 0.95 else 'refused' if roll < 0.98 else 'held'
+        given = slot.due + timedelta(minutes=rng.randint(-20, 30))
+        rows.append({
+            'medication_id': medication.id, 'resident_id': medication.resident_id,
+            'date': given.date(), 'time': given.time().replace(second=0, microsecond=0),
+            'administered': status == 'administered', 'status': status,
+            '_reason': None if status == 'administered' else
+            ('Resident declined, said it upsets their stomach' if status == 'refused' else 'Held per nurse, BP 92/58'),
+        })
+    return rows
+
+
+def _expiration(rng, today):
+    """Mostly months away, with some expired and some inside the 7-day alert window"""
+    roll = rng.random()
+    if roll < 0.1:
+        return today - timedelta(days=rng.randint(1, 90))
+    if roll < 0.2:
+        return today + timedelta(days=rng.randint(0, 7))
+    return today + timedelta(days=rng.randint(8, 400))
+
+
+def populate(db, residents=20, years=1, medications=8, documents=6, incidents=12, audit_entries=5000,
+             seed=0, progress=None):
+    """
+    Add a synthetic facility to the app's database, ending today. Needs an
+    app context, a created schema and data keys. Returns row counts per table.
+    """
+    from werkzeug.security import generate_password_hash
+    from app import (AuditLog, Document, Medication, MedicationCatalog, MedicationLog, User,
+                     sync_medication_catalog)
+    from audit import seal_unhashed_entries
+    from intake_risk import rebuild_intake_daily, score_all_residents
+    from medications_data import ELDERLY_MEDS
+    from models import BowelMovement, FoodIntake, IncidentReport, LiquidIntake, Resident, UrineOutput, Vitals
+    from vitals_analytics import rebuild_vitals_baseline
+
+    rng = random.Random(seed)
+    today = date.today()
+    first_day = today - timedelta(days=int(365 * years) - 1)
+    counts = dict.fromkeys(('residents', 'daily_log_rows', 'medications', 'dose_logs', 'documents',
+                            'incidents', 'audit_entries'), 0)
+    tables = {'vitals': Vitals, 'food': FoodIntake, 'liquid': LiquidIntake, 'bowel': BowelMovement, 'urine': UrineOutput}
+
+    users = {}
+    for username, role in (('admin', 'admin'), ('caregiver', 'caregiver')):
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            user = User(username=username, password_hash=generate_password_hash(f'{username}123'), role=role)
+            db.session.add(user)
+        users[role] = user
+    sync_medication_catalog(MedicationCatalog)
+    db.session.commit()
+
+    for number in range(residents):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        resident = Resident(
+            name=name, dob=date(rng.randint(1928, 1955), rng.randint(1, 12), rng.randint(1, 28)),
+            medical_info=', '.join(rng.sample(CONDITIONS, 3)),
+            emergency_contact=f"{rng.choice(FIRST_NAMES)} {name.split()[1]} - 555-{rng.randint(1000, 9999)}",
+        )
+        db.session.add(resident)
+        db.session.flush()
+        counts['residents'] += 1
+
+        # A year at a time keeps memory flat for long histories
+        baseline = (rng.randint(115, 145), rng.randint(68, 88), rng.randint(62, 84))
+        day = first_day
+        while day <= today:
+            batch = {key: [] for key in tables}
+            for _ in range(366):
+                if day > today:
+                    break
+                for key, rows in _daily_rows(rng, resident.id, day, baseline).items():
+                    batch[key].extend(rows)
+                day += timedelta(days=1)
+            for key, rows in batch.items():
+                if rows:
+                    db.session.execute(tables[key].__table__.insert(), rows)
+                    counts['daily_log_rows'] += len(rows)
+
+        course = []
+        for brand, generic, uses in rng.sample(ELDERLY_MEDS, medications):
+            expiration_date = _expiration(rng, today)
+            latest_start = max(first_day, min(today, expiration_date) - timedelta(days=30))
+            course.append(Medication(
+                resident_id=resident.id, name=brand, dosage=rng.choice(('5 mg', '10 mg', '25 mg', '50 mg', '500 mg')),
+                frequency=rng.choice(FREQUENCIES), notes=f"{generic}. Take with food.", form='Tablet', common_uses=uses,
+                start_date=first_day + timedelta(days=rng.randint(0, (latest_start - first_day).days)),
+                expiration_date=expiration_date,
+            ))
+        db.session.add_all(course)
+        db.session.flush()
+        counts['medications'] += len(course)
+        for medication in course:
+            rows = _dose_rows(rng, medication, datetime.combine(medication.start_date, time()),
+                              datetime.combine(min(today, medication.expiration_date), time(23, 59)))
+            if rows:
+                db.session.execute(MedicationLog.__table__.insert(), rows)
+                counts['dose_logs'] += len(rows)
+
+        for _ in range(documents):
+            uploaded = first_day + timedelta(days=rng.randint(0, (today - first_day).days))
+            doc_name = rng.choice(DOCUMENT_NAMES)
+            db.session.add(Document(
+                resident_id=resident.id, name=doc_name, upload_date=uploaded, expiration_date=_expiration(rng, today),
+                filename=f"{resident.id}_{uploaded.strftime('%Y%m%d')}000000_{doc_name.lower().replace(' ', '_')}.pdf.enc",
+            ))
+            counts['documents'] += 1
+
+        for _ in range(incidents):
+            reported = datetime.combine(first_day, time(8)) + timedelta(minutes=rng.randint(0, (today - first_day).days * 1440))
+            follow_up = rng.random() < 0.4
+            db.session.add(IncidentReport(
+                resident_id=resident.id, incident_type=rng.choice(INCIDENT_TYPES), severity=rng.choice(SEVERITIES),
+                description=f"{name} was found on the floor beside the bed. Alert and oriented, no visible injury.",
+                immediate_action='Assisted back to bed with two staff, vitals taken, family notified.',
+                injury_occurred=rng.choice(('no', 'no', 'yes')), medical_attention=rng.choice(('no', 'no', 'yes')),
+                witnesses='Night caregiver', follow_up_required='yes' if follow_up else 'no',
+                follow_up_notes='Review fall precautions at care conference' if follow_up else None,
+                date_reported=reported, reported_by=users['admin'].id,
+                status='closed' if reported.date() < today - timedelta(days=30) else rng.choice(('open', 'in_progress')),
+            ))
+            counts['incidents'] += 1
+
+        db.session.commit()
+        if progress:
+            progress(number + 1, counts)
+
+    # Audit entries spread over the period, then chained as a migration would
+    span = (today - first_day).days * 86400
+    started = datetime.combine(first_day, time(6))
+    offsets = sorted(rng.randint(0, span) for _ in range(audit_entries))
+    actions = ['Completed breakfast log for {}', 'Completed lunch log for {}', 'Completed dinner log for {}',
+               'Logged dose for Lisinopril for {}', 'Viewed report for {}', 'User admin logged in']
+    rows = [{
+        'user_id': users['caregiver' if offset % 3 else 'admin'].id,
+        'action': rng.choice(actions).format(f"Resident {offset % max(residents, 1) + 1}"),
+        'timestamp': started + timedelta(seconds=offset),
+    } for offset in offsets]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(AuditLog.__table__.insert(), rows[start:start + 5000])
+    db.session.commit()
+    counts['audit_entries'] = seal_unhashed_entries(db)
+
+    # Derived tables the dashboard reads, as the CLI rebuild commands do
+    resident_ids = [row.id for row in Resident.query.with_entities(Resident.id)]
+    rebuild_intake_daily(db)
+    score_all_residents(db, resident_ids, today)
+    for resident_id in resident_ids:
+        rebuild_vitals_baseline(db, resident_id)
+    db.session.commit()
+    return counts
+
+
+def create_database(path, **config):
+    """A create_app() on a SQLite file with the schema, migrations and data keys in place"""
+    from app import create_app, db, ensure_data_keys, run_migrations
+    app = create_app(dict({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.abspath(path)}",
+        'WTF_CSRF_ENABLED': False,
+        'MAIL_SUPPRESS_SEND': True,
+    }, **config))
+    with app.app_context():
+        run_migrations(db)
+        ensure_data_keys(db)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('database', help='SQLite file to create or add to')
+    parser.add_argument('--residents', type=int, default=20)
+    parser.add_argument('--years', type=float, default=1, help='Years of daily and dose logs, ending today')
+    parser.add_argument('--medications', type=int, default=8, help='Medications per resident')
+    parser.add_argument('--documents', type=int, default=6, help='Documents per resident')
+    parser.add_argument('--incidents', type=int, default=12, help='Incidents per resident')
+    parser.add_argument('--audit-entries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import db
+    app = create_database(args.database)
+    started = clock.perf_counter()
+    with app.app_context():
+        counts = populate(
+            db, residents=args.residents, years=args.years, medications=args.medications,
+            documents=args.documents, incidents=args.incidents, audit_entries=args.audit_entries, seed=args.seed,
+            progress=lambda done, counts: print(f"  {done}/{args.residents} residents, "
+                                                f"{counts['daily_log_rows'] + counts['dose_logs']} log rows", flush=True),
+        )
+    print(f"Generated in {clock.perf_counter() - started:.1f}s: "
+          + ', '.join(f"{count} {table.replace('_', ' ')}" for table, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
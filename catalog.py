@@ -0,0 +1,131 @@
+import csv
+import hashlib
+import json
+from itertools import islice
+from sqlalchemy import select
+from models import db, get_setting, set_setting
+
+# AppSetting key holding the hash of the catalog data last synced
+CATALOG_HASH_KEY = 'medication_catalog_hash'
+
+
+def catalog_content_hash(sample_medications, elderly_meds):
+    """Hash the bundled catalog data so unchanged data can be detected cheaply"""
+    payload = json.dumps([sample_medications, elderly_meds], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def sync_medication_catalog(catalog_model):
+    """
+    Insert bundled medications missing from the catalog.
+    Skips everything when the stored content hash matches medications_data.py.
+    Otherwise loads existing names with one query and bulk-inserts the
+    missing rows in a single transaction. Returns the number of rows inserted.
+    """
+    from medications_data import SAMPLE_MEDICATIONS, ELDERLY_MEDS
+
+    content_hash = catalog_content_hash(SAMPLE_MEDICATIONS, ELDERLY_MEDS)
+    if get_setting(CATALOG_HASH_KEY) == content_hash:
+        return 0
+
+    existing = set(db.session.execute(select(catalog_model.name)).scalars())
+    rows = []
+
+    def add(row):
+        if row['name'] not in existing:
+            existing.add(row['name'])
+            rows.append(row)
+
+    # Sample medications first so their default dosing wins over the bare
+    # ELDERLY_MEDS entry with the same name
+    for med in SAMPLE_MEDICATIONS:
+        add({
+            'name': med['name'],
+            'default_dosage': med['default_dosage'],
+            'default_frequency': med['default_frequency'],
+            '_default_notes': med['default_notes'],
+            'form': med['form'],
+            '_common_uses': med['common_uses'],
+        })
+    for brand_name, generic_name, common_uses in ELDERLY_MEDS:
+        add({
+            'name': brand_name,
+            'default_dosage': '',
+            'default_frequency': '',
+            '_default_notes': f'Generic: {generic_name}',
+            'form': '',
+            '_common_uses': common_uses,
+        })
+
+    if rows:
+        db.session.execute(catalog_model.__table__.insert(), rows)
+    set_setting(CATALOG_HASH_KEY, content_hash)
+    db.session.commit()
+    return len(rows)
+
+
+# CSV header aliases for each catalog column, first match wins
+CSV_COLUMNS = {
+    'name': ('name', 'brand_name'),
+    'generic_name': ('generic_name', 'generic'),
+    'default_dosage': ('default_dosage', 'dosage'),
+    'default_frequency': ('default_frequency', 'frequency'),
+    'default_notes': ('default_notes', 'notes'),
+    'form': ('form',),
+    'common_uses': ('common_uses', 'uses'),
+}
+
+
+def _csv_row(row, columns):
+    values = {key: (row.get(header) or '').strip() if header else '' for key, header in columns.items()}
+    notes = values['default_notes'] or (f"Generic: {values['generic_name']}" if values['generic_name'] else '')
+    return {
+        'name': values['name'],
+        'default_dosage': values['default_dosage'][:50],
+        'default_frequency': values['default_frequency'][:50],
+        '_default_notes': notes,
+        'form': values['form'][:50],
+        '_common_uses': values['common_uses'],
+    }
+
+
+def import_catalog_csv(catalog_model, csvfile, chunk_size=1000, progress=None):
+    """
+    Stream a formulary CSV into the catalog. Rows are read chunk_size at a
+    time, so memory stays flat however long the file is; names already in
+    the catalog (or earlier in the file) are skipped with one set lookup
+    each, and every chunk is a single executemany insert, encrypted as it
+    is bound, committed on its own. Needs a name or brand_name column.
+    Returns (inserted, skipped).
+    """
+    reader = csv.DictReader(csvfile)
+    headers = {header.strip().lower(): header for header in reader.fieldnames or []}
+    columns = {
+        key: next((headers[alias] for alias in aliases if alias in headers), None)
+        for key, aliases in CSV_COLUMNS.items()
+    }
+    if columns['name'] is None:
+        raise ValueError("CSV needs a 'name' or 'brand_name' column")
+
+    existing = set(db.session.execute(select(catalog_model.name)).scalars())
+    max_name = catalog_model.__table__.c.name.type.length
+    inserted = skipped = 0
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            break
+        rows = []
+        for raw in chunk:
+            row = _csv_row(raw, columns)
+            if not row['name'] or len(row['name']) > max_name or row['name'] in existing:
+                skipped += 1
+                continue
+            existing.add(row['name'])
+            rows.append(row)
+        if rows:
+            db.session.execute(catalog_model.__table__.insert(), rows)
+            db.session.commit()
+        inserted += len(rows)
+        if progress:
+            progress(inserted, skipped)
+    return inserted, skipped
@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+from sqlalchemy import event, text
+
+# Applied to every new SQLite connection. WAL lets readers run alongside a
+# writer, and synchronous=NORMAL is durable in WAL mode apart from the last
+# transactions before a power loss.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms to wait for a lock instead of failing with "database is locked"
+    'cache_size': -20000,  # negative means KiB, so ~20MB of page cache per connection
+    'mmap_size': 268435456,  # 256MB of memory-mapped reads
+    'temp_store': 'MEMORY',
+}
+
+
+# Connection pool settings for server databases (PostgreSQL, MySQL). SQLite
+# keeps SQLAlchemy's default pool since connections there are just file handles.
+DEFAULT_POOL_OPTIONS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_pre_ping': True,  # replace connections dropped by the server or a proxy
+    'pool_recycle': 1800,  # seconds, below typical server/load balancer idle timeouts
+    'pool_timeout': 30,
+}
+
+
+def database_uri_from_env(default='sqlite:///afh.db'):
+    """Read DATABASE_URL, accepting the postgres:// scheme many hosts still hand out"""
+    uri = os.environ.get('DATABASE_URL', default)
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def engine_options_for(uri):
+    """
+    Return SQLALCHEMY_ENGINE_OPTIONS for a database URI.
+    Pool sizes can be overridden with DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE and DB_POOL_TIMEOUT.
+    """
+    if uri.startswith('sqlite'):
+        return {}
+    options = dict(DEFAULT_POOL_OPTIONS)
+    for key, env_var in (('pool_size', 'DB_POOL_SIZE'), ('max_overflow', 'DB_MAX_OVERFLOW'),
+                         ('pool_recycle', 'DB_POOL_RECYCLE'), ('pool_timeout', 'DB_POOL_TIMEOUT')):
+        if os.environ.get(env_var):
+            options[key] = int(os.environ[env_var])
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """Run PRAGMA statements on a raw sqlite3 connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+def configure_sqlite(app, db):
+    """
+    Apply SQLITE_PRAGMAS to every connection the app's engine opens.
+    Does nothing when the app is not running on SQLite.
+    """
+    pragmas = dict(DEFAULT_SQLITE_PRAGMAS)
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    event.listen(engine, 'connect', on_connect)
+
+
+def run_sqlite_maintenance(db):
+    """
+    Checkpoint the WAL back into the main database file and refresh the
+    query planner statistics. Returns the wal_checkpoint result as
+    (busy, wal_pages, checkpointed_pages).
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return None
+    with db.engine.connect() as connection:
+        result = connection.execute(text("PRAGMA wal_checkpoint(TRUNCATE)")).fetchone()
+        connection.execute(text("PRAGMA optimize"))
+    return tuple(result) if result else None
+
+
+def start_sqlite_maintenance(app, db, interval):
+    """
+    Run run_sqlite_maintenance() every `interval` seconds on a daemon thread.
+    Returns a threading.Event that stops the thread when set.
+    """
+    stop = threading.Event()
+
+    def worker():
+        while not stop.wait(interval):
+            try:
+                with app.app_context():
+                    run_sqlite_maintenance(db)
+            except Exception as e:
+                logging.error(f"SQLite maintenance failed: {e}")
+
+    thread = threading.Thread(target=worker, name='sqlite-maintenance', daemon=True)
+    thread.start()
+    return stop
@@ -0,0 +1,192 @@
+import re
+import threading
+
+# Screening aid for the add-medication workflow, not a substitute for a
+# pharmacist's review. Names are lower-case generics; a term may also name a
+# class from DRUG_CLASSES, which expands to every generic in it.
+DRUG_CLASSES = {
+    'statin': ['atorvastatin', 'rosuvastatin', 'simvastatin', 'pravastatin', 'pitavastatin', 'lovastatin'],
+    'ACE inhibitor': ['lisinopril', 'benazepril', 'enalapril', 'ramipril', 'captopril', 'fosinopril',
+                      'quinapril', 'moexipril', 'trandolapril'],
+    'ARB': ['losartan', 'valsartan', 'irbesartan', 'candesartan', 'olmesartan', 'telmisartan'],
+    'beta blocker': ['metoprolol', 'carvedilol', 'atenolol', 'propranolol', 'bisoprolol', 'nebivolol',
+                     'nadolol', 'labetalol', 'acebutolol', 'pindolol', 'sotalol'],
+    'SSRI/SNRI': ['sertraline', 'fluoxetine', 'escitalopram', 'citalopram', 'paroxetine', 'duloxetine',
+                  'venlafaxine', 'desvenlafaxine'],
+    'NSAID': ['ibuprofen', 'naproxen', 'celecoxib', 'meloxicam', 'diclofenac', 'etodolac', 'indomethacin',
+              'ketoprofen', 'nabumetone', 'oxaprozin', 'piroxicam', 'sulindac', 'flurbiprofen', 'tolmetin'],
+    'proton pump inhibitor': ['omeprazole', 'esomeprazole', 'pantoprazole', 'lansoprazole',
+                              'dexlansoprazole', 'rabeprazole'],
+    'benzodiazepine': ['lorazepam', 'alprazolam', 'clonazepam', 'diazepam', 'temazepam', 'oxazepam',
+                       'triazolam', 'chlordiazepoxide', 'estazolam', 'flurazepam', 'midazolam'],
+    'opioid': ['tramadol', 'oxycodone', 'hydrocodone', 'morphine', 'hydromorphone', 'fentanyl'],
+    'sedative hypnotic': ['zolpidem', 'eszopiclone', 'zaleplon'],
+    'anticoagulant': ['warfarin', 'apixaban', 'rivaroxaban', 'dabigatran', 'edoxaban'],
+    'antiplatelet': ['clopidogrel', 'prasugrel', 'ticagrelor'],
+    'cholinesterase inhibitor': ['donepezil', 'rivastigmine', 'galantamine'],
+    'antipsychotic': ['quetiapine', 'risperidone', 'olanzapine', 'haloperidol', 'aripiprazole',
+                      'ziprasidone', 'lurasidone'],
+    'sulfonylurea': ['glipizide', 'glyburide', 'glimepiride'],
+    'MAO inhibitor': ['phenelzine', 'tranylcypromine', 'isocarboxazid', 'selegiline', 'rasagiline'],
+    'potassium-sparing diuretic': ['spironolactone', 'eplerenone', 'amiloride', 'triamterene'],
+    'thyroid hormone': ['levothyroxine', 'liothyronine', 'liotrix', 'thyroid desiccated'],
+}
+
+# (term, term, severity, message)
+INTERACTIONS = [
+    ('anticoagulant', 'NSAID', 'major', 'Increased bleeding risk'),
+    ('anticoagulant', 'antiplatelet', 'major', 'Increased bleeding risk'),
+    ('anticoagulant', 'aspirin', 'major', 'Increased bleeding risk'),
+    ('warfarin', 'amiodarone', 'major', 'Amiodarone raises INR; warfarin dose usually needs reducing'),
+    ('warfarin', 'fluconazole', 'major', 'Fluconazole raises INR'),
+    ('warfarin', 'SSRI/SNRI', 'moderate', 'Increased bleeding risk'),
+    ('opioid', 'benzodiazepine', 'major', 'Additive sedation and respiratory depression'),
+    ('opioid', 'sedative hypnotic', 'major', 'Additive sedation and respiratory depression'),
+    ('benzodiazepine', 'sedative hypnotic', 'major', 'Additive sedation; high fall risk in older adults'),
+    ('tramadol', 'SSRI/SNRI', 'major', 'Serotonin syndrome and seizure risk'),
+    ('tramadol', 'trazodone', 'major', 'Serotonin syndrome risk'),
+    ('tramadol', 'mirtazapine', 'major', 'Serotonin syndrome risk'),
+    ('MAO inhibitor', 'SSRI/SNRI', 'major', 'Serotonin syndrome risk; contraindicated'),
+    ('MAO inhibitor', 'tramadol', 'major', 'Serotonin syndrome risk; contraindicated'),
+    ('potassium-sparing diuretic', 'potassium', 'major', 'Hyperkalemia risk'),
+    ('potassium-sparing diuretic', 'ACE inhibitor', 'moderate', 'Hyperkalemia risk; monitor potassium'),
+    ('potassium-sparing diuretic', 'ARB', 'moderate', 'Hyperkalemia risk; monitor potassium'),
+    ('ACE inhibitor', 'potassium', 'moderate', 'Hyperkalemia risk; monitor potassium'),
+    ('ARB', 'potassium', 'moderate', 'Hyperkalemia risk; monitor potassium'),
+    ('ACE inhibitor', 'ARB', 'moderate', 'Dual RAAS blockade: hyperkalemia, hypotension and kidney injury'),
+    ('ACE inhibitor', 'NSAID', 'moderate', 'Reduced blood pressure control and kidney injury risk'),
+    ('ARB', 'NSAID', 'moderate', 'Reduced blood pressure control and kidney injury risk'),
+    ('furosemide', 'NSAID', 'moderate', 'Reduced diuretic effect and kidney injury risk'),
+    ('SSRI/SNRI', 'NSAID', 'moderate', 'Increased GI bleeding risk'),
+    ('SSRI/SNRI', 'aspirin', 'moderate', 'Increased GI bleeding risk'),
+    ('SSRI/SNRI', 'antiplatelet', 'moderate', 'Increased bleeding risk'),
+    ('digoxin', 'amiodarone', 'major', 'Amiodarone raises digoxin levels'),
+    ('digoxin', 'furosemide', 'moderate', 'Low potassium increases digoxin toxicity; monitor potassium'),
+    ('simvastatin', 'amiodarone', 'major', 'Myopathy risk; limit simvastatin to 20 mg'),
+    ('simvastatin', 'clarithromycin', 'major', 'Myopathy and rhabdomyolysis risk; contraindicated'),
+    ('clopidogrel', 'omeprazole', 'moderate', 'Omeprazole reduces the antiplatelet effect of clopidogrel'),
+    ('clopidogrel', 'esomeprazole', 'moderate', 'Esomeprazole reduces the antiplatelet effect of clopidogrel'),
+    ('cholinesterase inhibitor', 'beta blocker', 'moderate', 'Additive bradycardia; monitor pulse'),
+    ('thyroid hormone', 'calcium carbonate', 'minor', 'Calcium reduces absorption; separate doses by 4 hours'),
+    ('thyroid hormone', 'ferrous sulfate', 'minor', 'Iron reduces absorption; separate doses by 4 hours'),
+    ('sulfonylurea', 'fluconazole', 'moderate', 'Hypoglycemia risk'),
+    ('lithium', 'ACE inhibitor', 'major', 'Raises lithium levels'),
+    ('lithium', 'NSAID', 'major', 'Raises lithium levels'),
+]
+
+# Abbreviations and common names used in brand and catalog names
+ALIASES = {
+    'hctz': 'hydrochlorothiazide',
+    'asa': 'aspirin',
+    'iron': 'ferrous sulfate',
+    'calcium': 'calcium carbonate',
+    'potassium chloride': 'potassium',
+    'klor-con': 'potassium',
+    'morphine sulfate': 'morphine',
+}
+# Salt and release suffixes dropped from generic names, e.g. "Metoprolol tartrate"
+_SALTS = {'tartrate', 'succinate', 'fumarate', 'sodium', 'hydrochloride', 'hcl', 'besylate',
+          'maleate', 'mesylate', 'er', 'xl', 'sr', 'cr', 'odt'}
+_SEVERITY_ORDER = {'major': 0, 'moderate': 1, 'minor': 2}
+
+
+def normalize_generic(name):
+    """Lower-case, strip salt suffixes and resolve aliases: "Metoprolol Tartrate" -> "metoprolol" """
+    name = re.sub(r'\s+', ' ', (name or '').strip().lower())
+    if name in ALIASES:
+        return ALIASES[name]
+    words = name.split(' ')
+    while len(words) > 1 and words[-1] in _SALTS:
+        words.pop()
+    name = ' '.join(words)
+    return ALIASES.get(name, name)
+
+
+class InteractionIndex:
+    """
+    Brand-to-ingredient map, generic-to-class map and pair table compiled
+    once from ELDERLY_MEDS and INTERACTIONS. Every lookup is a dict hit, so
+    checking a new medication costs O(current medications) however large
+    the tables grow. The bundled list is only imported and compiled on the
+    first lookup, so app startup doesn't pay for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compiled = False
+        self.ingredients = {}
+        self.classes = {}
+        self.pairs = {}
+
+    def compile(self, brand_generics, drug_classes=DRUG_CLASSES, interactions=INTERACTIONS):
+        """brand_generics: (brand, generic, ...) tuples, as in medications_data.ELDERLY_MEDS"""
+        ingredients = {}
+        for entry in brand_generics:
+            brand, generic = entry[0], entry[1]
+            components = frozenset(normalize_generic(part) for part in generic.split('/'))
+            ingredients[brand.strip().lower()] = components
+            ingredients.setdefault(generic.strip().lower(), components)
+        members = {label: [normalize_generic(generic) for generic in generics] for label, generics in drug_classes.items()}
+        classes = {generic: label for label, generics in members.items() for generic in generics}
+        pairs = {}
+        for first, second, severity, message in interactions:
+            for a in members.get(first, [normalize_generic(first)]):
+                for b in members.get(second, [normalize_generic(second)]):
+                    key = frozenset((a, b))
+                    # Keep the most severe entry when class and drug rules overlap
+                    if key not in pairs or _SEVERITY_ORDER[severity] < _SEVERITY_ORDER[pairs[key][0]]:
+                        pairs[key] = (severity, message)
+        with self._lock:
+            self.ingredients, self.classes, self.pairs = ingredients, classes, pairs
+            self.compiled = True
+        return len(pairs)
+
+    def _ensure_compiled(self):
+        # Two threads racing here both compile the same tables; the swap above is atomic
+        if not self.compiled:
+            from medications_data import ELDERLY_MEDS
+            self.compile(ELDERLY_MEDS)
+
+    def resolve(self, name):
+        """Generic ingredients of a brand, generic or combination name"""
+        self._ensure_compiled()
+        key = re.sub(r'\s+', ' ', (name or '').strip().lower())
+        if key in self.ingredients:
+            return self.ingredients[key]
+        return frozenset(normalize_generic(part) for part in key.split('/') if part.strip())
+
+    def check(self, new_name, current_names):
+        """
+        Findings for adding new_name to a resident already taking
+        current_names, most severe first. Each finding is a dict with
+        kind ('duplicate', 'duplicate_class' or 'interaction'), severity,
+        medication (the current one involved) and message.
+        """
+        new = self.resolve(new_name)
+        findings = []
+        for current_name in current_names:
+            for current in self.resolve(current_name):
+                for generic in new:
+                    if generic == current:
+                        findings.append({
+                            'kind': 'duplicate', 'severity': 'major', 'medication': current_name,
+                            'message': f"{new_name} duplicates {current_name} ({generic})",
+                        })
+                        continue
+                    drug_class = self.classes.get(generic)
+                    if drug_class and drug_class == self.classes.get(current):
+                        findings.append({
+                            'kind': 'duplicate_class', 'severity': 'moderate', 'medication': current_name,
+                            'message': f"{new_name} and {current_name} are both {drug_class}s",
+                        })
+                    interaction = self.pairs.get(frozenset((generic, current)))
+                    if interaction:
+                        findings.append({
+                            'kind': 'interaction', 'severity': interaction[0], 'medication': current_name,
+                            'message': f"{new_name} + {current_name}: {interaction[1]}",
+                        })
+        findings.sort(key=lambda finding: _SEVERITY_ORDER[finding['severity']])
+        return findings
+
+
+interactions = InteractionIndex()
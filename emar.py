@@ -0,0 +1,261 @@
+import re
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from sqlalchemy import select
+
+# A parsed Medication.frequency: administration times of day, every
+# `interval_days` days counted from the medication's start date. as_needed
+# medications (PRN) never have due slots.
+ScheduleRule = namedtuple('ScheduleRule', ['times', 'interval_days', 'as_needed'])
+DoseSlot = namedtuple('DoseSlot', ['medication_id', 'resident_id', 'due'])
+
+# Default times match the presets in the add-medication wizard
+_DAILY_TIMES = {
+    1: ('07:00',),
+    2: ('07:00', '19:00'),
+    3: ('07:00', '13:00', '19:00'),
+    4: ('07:00', '12:00', '16:00', '20:00'),
+}
+_BEDTIME = ('21:00',)
+
+# Several doses a week fall on chosen weekdays, which an interval can't express
+_UNSCHEDULED = ()
+_AS_NEEDED = re.compile(r'\bprn\b|as needed')
+# (pattern, times, interval days), tried in order against the lower-cased frequency.
+# Weekly frequencies come before the daily counts, so "twice weekly" isn't read as twice daily.
+_FREQUENCY_PATTERNS = [
+    (r'\b(twice|two times|three times|\d+ times|\d ?x)\s+(a |per )?week(ly)?\b|\bbiw\b|\btiw\b', _UNSCHEDULED, None),
+    (r'\b(weekly|once a week|every week)\b', _DAILY_TIMES[1], 7),
+    (r'\b(four times|qid|4 ?x)\b', _DAILY_TIMES[4], 1),
+    (r'\b(three times|tid|3 ?x)\b', _DAILY_TIMES[3], 1),
+    (r'\b(twice|two times|bid|2 ?x)\b', _DAILY_TIMES[2], 1),
+    (r'\b(every other day|alternate days|qod)\b', _DAILY_TIMES[1], 2),
+    (r'\b(bedtime|qhs|hs|nightly|at night)\b', _BEDTIME, 1),
+    (r'\b(daily|once|every day|qd|every morning|in the morning)\b', _DAILY_TIMES[1], 1),
+]
+_EVERY_N_HOURS = re.compile(r'\b(?:every|q)\s*(\d{1,2})\s*(?:h|hr|hrs|hours?)\b')
+
+# Shifts as (name, start, length). The night shift runs past midnight.
+SHIFTS = [
+    ('day', time(7, 0), timedelta(hours=8)),
+    ('evening', time(15, 0), timedelta(hours=8)),
+    ('night', time(23, 0), timedelta(hours=8)),
+]
+# A dose logged this close to a slot counts for it
+MATCH_TOLERANCE = timedelta(minutes=90)
+# A slot becomes missed once it is this far past due with no dose logged
+MISSED_AFTER = timedelta(minutes=60)
+# What a logged dose records. Refused and held doses count as handled, not missed.
+DOSE_RESULTS = ('administered', 'refused', 'held')
+
+
+def _parse_times(values):
+    return tuple(sorted(datetime.strptime(value.strip(), '%H:%M').time() for value in values))
+
+
+@lru_cache(maxsize=1024)
+def parse_frequency(frequency, administration_times=None):
+    """
+    Parse a frequency such as "Twice daily", "BID", "Every 8 hours",
+    "Weekly" or "As needed" into a ScheduleRule. administration_times
+    ("07:00,19:00") override the default times. Returns None when the
+    frequency isn't understood or names several doses a week ("Twice
+    weekly"), so the medication is listed as unscheduled.
+    """
+    text = (frequency or '').strip().lower()
+    explicit = None
+    if administration_times:
+        try:
+            explicit = _parse_times(administration_times.split(','))
+        except ValueError:
+            explicit = None
+
+    # "q6h prn" is still as needed; the interval is a minimum, not a schedule
+    if _AS_NEEDED.search(text):
+        return ScheduleRule((), None, True)
+
+    match = _EVERY_N_HOURS.search(text)
+    if match and 0 < int(match.group(1)) <= 24 and 24 % int(match.group(1)) == 0:
+        hours = int(match.group(1))
+        default = tuple(time((6 + hours * i) % 24) for i in range(24 // hours))
+        return ScheduleRule(explicit or tuple(sorted(default)), 1, False)
+
+    for pattern, times, interval in _FREQUENCY_PATTERNS:
+        if re.search(pattern, text):
+            if times is _UNSCHEDULED:
+                return None
+            return ScheduleRule(explicit or _parse_times(times), interval, False)
+    if explicit:
+        return ScheduleRule(explicit, 1, False)
+    return None
+
+
+def shift_window(day, shift_name):
+    """Return (start, end) datetimes of a shift that starts on `day`"""
+    for name, start, length in SHIFTS:
+        if name == shift_name:
+            start_at = datetime.combine(day, start)
+            return start_at, start_at + length
+    raise ValueError(f"Unknown shift '{shift_name}'")
+
+
+def current_shift(now):
+    """Return (shift name, day the shift started) for a datetime"""
+    for name, start, length in SHIFTS:
+        for day in (now.date(), now.date() - timedelta(days=1)):
+            start_at = datetime.combine(day, start)
+            if start_at <= now < start_at + length:
+                return name, day
+    return SHIFTS[0][0], now.date()
+
+
+def materialize_slots(medication, rule, start, end):
+    """
+    Yield the DoseSlots of one medication between start and end. Only this
+    window is generated; nothing is stored.
+    """
+    if rule is None or rule.as_needed:
+        return
+    anchor = medication.start_date or date(2000, 1, 1)
+    day = start.date()
+    while day <= end.date():
+        in_course = (not medication.start_date or day >= medication.start_date) and \
+                    (not medication.expiration_date or day <= medication.expiration_date)
+        if in_course and (day - anchor).days % rule.interval_days == 0:
+            for slot_time in rule.times:
+                due = datetime.combine(day, slot_time)
+                if start <= due < end:
+                    yield DoseSlot(medication.id, medication.resident_id, due)
+        day += timedelta(days=1)
+
+
+def match_doses(slots, logs):
+    """
+    Pair each slot with the closest unused logged dose of the same
+    medication within MATCH_TOLERANCE. logs are (id, medication_id,
+    datetime, status). Returns {slot: log}.
+    """
+    by_medication = {}
+    for log in logs:
+        by_medication.setdefault(log[1], []).append(log)
+    matched, used = {}, set()
+    for slot in sorted(slots, key=lambda slot: slot.due):
+        best = None
+        for log in by_medication.get(slot.medication_id, ()):
+            distance = abs(log[2] - slot.due)
+            if log[0] not in used and distance <= MATCH_TOLERANCE and (best is None or distance < abs(best[2] - slot.due)):
+                best = log
+        if best is not None:
+            matched[slot] = best
+            used.add(best[0])
+    return matched
+
+
+def slot_status(slot, log, now):
+    if log is not None:
+        return 'given' if log[3] == 'administered' else log[3]
+    if now >= slot.due + MISSED_AFTER:
+        return 'missed'
+    if now >= slot.due - MATCH_TOLERANCE:
+        return 'due'
+    return 'upcoming'
+
+
+def build_grid(db, medication_model, log_model, start, end, resident_ids, now=None):
+    """
+    Due/missed grid for every resident in resident_ids between start and
+    end. Loads active medications with one query and the window's logged
+    doses with one query on MedicationLog(resident_id, date), materializes
+    the window's slots in memory and matches them. Returns
+    (slots as dicts ordered by due time, unscheduled medications).
+    """
+    now = now or datetime.now()
+    resident_ids = list(resident_ids)
+    if not resident_ids:
+        return [], []
+    medications = medication_model.query.filter(
+        medication_model.resident_id.in_(resident_ids),
+        (medication_model.start_date.is_(None)) | (medication_model.start_date <= end.date()),
+        (medication_model.expiration_date.is_(None)) | (medication_model.expiration_date >= start.date()),
+    ).all()
+
+    slots, unscheduled = [], []
+    for medication in medications:
+        rule = parse_frequency(medication.frequency, medication.administration_times)
+        if rule is None:
+            unscheduled.append(medication)
+        slots.extend(materialize_slots(medication, rule, start, end))
+
+    rows = db.session.execute(
+        select(log_model.id, log_model.medication_id, log_model.date, log_model.time,
+               log_model.status, log_model.administered)
+        .where(log_model.resident_id.in_(resident_ids),
+               log_model.date.between((start - MATCH_TOLERANCE).date(), (end + MATCH_TOLERANCE).date()))
+    ).all()
+    logs = [(row.id, row.medication_id, datetime.combine(row.date, row.time),
+             row.status or ('administered' if row.administered else 'not_given')) for row in rows]
+    matched = match_doses(slots, logs)
+
+    names = {medication.id: medication for medication in medications}
+    grid = []
+    for slot in sorted(slots, key=lambda slot: (slot.due, slot.resident_id, slot.medication_id)):
+        log = matched.get(slot)
+        medication = names[slot.medication_id]
+        grid.append({
+            'resident_id': slot.resident_id,
+            'medication_id': slot.medication_id,
+            'medication': medication.name,
+            'dosage': medication.dosage,
+            'due': slot.due.isoformat(timespec='minutes'),
+            'status': slot_status(slot, log, now),
+            'log_id': log[0] if log else None,
+        })
+    return grid, unscheduled
+
+
+def is_id(value):
+    """True for a JSON integer id; bools are ints in Python but not ids"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def parse_dose_results(results, medications, today):
+    """
+    Validate a med pass batch against {medication_id: Medication}. Returns
+    (entries, errors); entries have index, medication_id, status, date,
+    time and reason, and errors name the index of each bad result.
+    """
+    entries, errors = [], []
+    for index, result in enumerate(results):
+        if not isinstance(result, dict):
+            errors.append({'index': index, 'error': 'Result must be an object'})
+            continue
+        medication_id = result.get('medication_id')
+        if not is_id(medication_id):
+            errors.append({'index': index, 'error': 'medication_id must be an integer'})
+            continue
+        medication = medications.get(medication_id)
+        status = result.get('status')
+        reason = result.get('reason')
+        reason = (reason.strip() or None) if isinstance(reason, str) else None
+        if medication is None:
+            errors.append({'index': index, 'error': 'Unknown medication'})
+            continue
+        if status not in DOSE_RESULTS:
+            errors.append({'index': index, 'error': f"Status must be one of {', '.join(DOSE_RESULTS)}"})
+            continue
+        if status != 'administered' and not reason:
+            errors.append({'index': index, 'error': f'A reason is required for a {status} dose'})
+            continue
+        try:
+            day = datetime.strptime(result['date'], '%Y-%m-%d').date() if result.get('date') else today
+            at = datetime.strptime(result.get('time') or '', '%H:%M').time()
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'error': 'Date must be YYYY-MM-DD and time HH:MM'})
+            continue
+        if day > today or (medication.start_date and day < medication.start_date):
+            errors.append({'index': index, 'error': 'Date is outside the medication course'})
+            continue
+        entries.append({'index': index, 'medication_id': medication.id, 'status': status, 'date': day, 'time': at, 'reason': reason})
+    return entries, errors
@@ -0,0 +1,197 @@
+import base64
+import os
+import struct
+import threading
+
+from key_management import get_keyring
+
+# Codec names accepted by EncryptedText, mapped to the id stored in the first
+# byte of each value. Fernet values are stored as plain Fernet tokens.
+CODECS = {
+    'fernet': None,
+    'aes-gcm': 0x01,
+    'chacha20-poly1305': 0x02,
+}
+
+# Fernet tokens start with the version byte 0x80, which base64-encodes to 'g'.
+# AEAD values start with a small codec id, which encodes to 'A'.
+FERNET_PREFIX = 'g'
+
+DATA_KEY_PREFIX = 'data_key:'
+DATA_KEY_SIZE = 32
+NONCE_SIZE = 12
+# codec id, data key id
+_HEADER = struct.Struct('>BH')
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def _b64decode(token):
+    return base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+
+
+def _aead(codec_id, key):
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+    if codec_id == CODECS['aes-gcm']:
+        return AESGCM(key)
+    if codec_id == CODECS['chacha20-poly1305']:
+        return ChaCha20Poly1305(key)
+    raise ValueError(f"Unknown codec id {codec_id}")
+
+
+class DataKeys:
+    """
+    Per-table data keys, kept in AppSetting wrapped by the keyring and
+    cached unwrapped in memory. A key id is stored with every value so
+    older data keys stay readable.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = {}  # (scope, key id) -> raw key
+        self._current = {}  # scope -> key id for new values
+        self._ciphers = {}  # (codec id, scope, key id) -> AEAD object
+
+    def add(self, scope, key_id, key):
+        with self._lock:
+            self._keys[(scope, key_id)] = key
+            if key_id > self._current.get(scope, 0):
+                self._current[scope] = key_id
+
+    def load(self, rows):
+        """Add keys from (setting key, wrapped key) rows"""
+        keyring = get_keyring()
+        for setting_key, wrapped in rows:
+            scope, key_id = setting_key[len(DATA_KEY_PREFIX):].rsplit(':', 1)
+            self.add(scope, int(key_id), keyring.decrypt(wrapped.encode()))
+
+    def _load_from_database(self):
+        # A separate connection, since this can run in the middle of a flush
+        from sqlalchemy import select
+        from models import db, AppSetting
+        with db.engine.connect() as connection:
+            self.load(connection.execute(
+                select(AppSetting.key, AppSetting.value).where(AppSetting.key.startswith(DATA_KEY_PREFIX))
+            ).all())
+
+    def current(self, scope):
+        """Return the id of the data key new values in `scope` are encrypted with"""
+        key_id = self._current.get(scope)
+        if key_id is None:
+            self._load_from_database()
+            key_id = self._current.get(scope)
+            if key_id is None:
+                raise RuntimeError(f"No data key for '{scope}'. Run ensure_data_keys() at startup (flask migrate).")
+        return key_id
+
+    def cipher(self, codec_id, scope, key_id):
+        cache_key = (codec_id, scope, key_id)
+        cipher = self._ciphers.get(cache_key)
+        if cipher is None:
+            if (scope, key_id) not in self._keys:
+                self._load_from_database()
+            key = self._keys.get((scope, key_id))
+            if key is None:
+                raise RuntimeError(f"Data key {key_id} for '{scope}' not found")
+            cipher = self._ciphers[cache_key] = _aead(codec_id, key)
+        return cipher
+
+
+data_keys = DataKeys()
+
+
+def encrypt_value(plaintext, codec='fernet', scope=''):
+    """
+    Encrypt a string with the given codec. AEAD values are stored as
+    base64 of header | nonce | ciphertext+tag, with the header and scope
+    authenticated so a value can't be moved to another table.
+    """
+    codec_id = CODECS[codec]
+    if codec_id is None:
+        return get_keyring().encrypt(plaintext.encode()).decode()
+    key_id = data_keys.current(scope)
+    header = _HEADER.pack(codec_id, key_id)
+    nonce = os.urandom(NONCE_SIZE)
+    sealed = data_keys.cipher(codec_id, scope, key_id).encrypt(nonce, plaintext.encode(), header + scope.encode())
+    return _b64encode(header + nonce + sealed)
+
+
+def decrypt_value(token, scope=''):
+    """Decrypt a value written by any codec, including legacy Fernet tokens"""
+    if token.startswith(FERNET_PREFIX):
+        return get_keyring().decrypt(token.encode()).decode()
+    raw = _b64decode(token)
+    codec_id, key_id = _HEADER.unpack_from(raw)
+    header_end = _HEADER.size
+    nonce_end = header_end + NONCE_SIZE
+    return data_keys.cipher(codec_id, scope, key_id).decrypt(
+        raw[header_end:nonce_end], raw[nonce_end:], raw[:header_end] + scope.encode()
+    ).decode()
+
+
+def is_current(token, codec='fernet', scope=''):
+    """True when the value is already stored with `codec` (and, for Fernet, the primary key)"""
+    codec_id = CODECS[codec]
+    if token.startswith(FERNET_PREFIX):
+        return codec_id is None and get_keyring().is_current(token.encode())
+    # The first four base64 characters hold the three header bytes
+    return codec_id is not None and _b64decode(token[:4])[0] == codec_id
+
+
+def envelope_scopes(db):
+    """Return the scopes of every EncryptedText column that uses an AEAD codec"""
+    from models import EncryptedText
+    return sorted({
+        column.type.scope
+        for table in db.metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, EncryptedText) and CODECS[column.type.codec] is not None
+    })
+
+
+def ensure_data_keys(db):
+    """
+    Create a data key for every AEAD-encrypted table that doesn't have one
+    and load all data keys into memory. Safe to run from several processes
+    at once. Returns the scopes that got a new key.
+    """
+    from sqlalchemy.exc import IntegrityError
+    from models import AppSetting
+
+    rows = db.session.query(AppSetting.key, AppSetting.value).filter(AppSetting.key.startswith(DATA_KEY_PREFIX)).all()
+    existing = {key[len(DATA_KEY_PREFIX):].rsplit(':', 1)[0] for key, _ in rows}
+    created = []
+    for scope in envelope_scopes(db):
+        if scope in existing:
+            continue
+        wrapped = get_keyring().encrypt(os.urandom(DATA_KEY_SIZE)).decode()
+        db.session.add(AppSetting(key=f"{DATA_KEY_PREFIX}{scope}:1", value=wrapped))
+        try:
+            db.session.commit()
+            created.append(scope)
+        except IntegrityError:
+            # Another process created it first
+            db.session.rollback()
+    data_keys.load(
+        db.session.query(AppSetting.key, AppSetting.value).filter(AppSetting.key.startswith(DATA_KEY_PREFIX)).all()
+    )
+    return created
+
+
+def rewrap_data_keys(db):
+    """
+    Re-wrap data keys under the primary encryption key. This is all a key
+    rotation needs for AEAD columns: the values themselves don't change.
+    Returns the number of data keys re-wrapped.
+    """
+    from models import AppSetting
+    keyring = get_keyring()
+    rewrapped = 0
+    for setting in AppSetting.query.filter(AppSetting.key.startswith(DATA_KEY_PREFIX)):
+        if not keyring.is_current(setting.value.encode()):
+            setting.value = keyring.rotate(setting.value.encode()).decode()
+            rewrapped += 1
+    db.session.commit()
+    return rewrapped
@@ -0,0 +1,76 @@
+import logging
+import os
+import queue
+import threading
+
+from sqlalchemy import delete, inspect, select
+
+
+class FileReaper:
+    """
+    Removes files on a background thread, so requests that delete records
+    don't wait on disk I/O. Each file is queued as a PendingFileDeletion
+    row, added in the same transaction that drops the records naming it;
+    enqueue (id, path) pairs only after that commit. The row is cleared once
+    the file is gone, and init_file_reaper() requeues rows a stopped process
+    left behind.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._app = None
+        self._db = None
+
+    def enqueue(self, pending):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='file-reaper', daemon=True)
+                self._thread.start()
+        for pending_id, path in pending:
+            self._queue.put((pending_id, path))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def join(self):
+        """Block until every queued file has been handled"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            pending_id, path = self._queue.get()
+            try:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                self._clear(pending_id)
+            except Exception as e:
+                # The row stays, so the next start tries again
+                logging.error(f"Could not remove {path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _clear(self, pending_id):
+        from models import PendingFileDeletion
+        with self._app.app_context():
+            self._db.session.execute(delete(PendingFileDeletion).where(PendingFileDeletion.id == pending_id))
+            self._db.session.commit()
+
+
+reaper = FileReaper()
+
+
+def init_file_reaper(app, db):
+    """Let the reaper clear its rows, and requeue files left pending by a previous process"""
+    from models import PendingFileDeletion
+    reaper._app, reaper._db = app, db
+    with app.app_context():
+        # Before the schema exists (or migration 9 has run) there is nothing to resume
+        if not inspect(db.engine).has_table(PendingFileDeletion.__tablename__):
+            return
+        pending = db.session.execute(select(PendingFileDeletion.id, PendingFileDeletion.path)).all()
+    if pending:
+        reaper.enqueue(pending)
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import IncidentReport
+
+
+def load_incident_arrays(db, start, end):
+    """
+    Load incidents reported between start and end (dates, inclusive) as
+    columnar arrays: day offset from start, resident id, type code and
+    severity code, plus the type and severity labels the codes index.
+    Only the four needed columns are read, without building ORM objects,
+    and dates are truncated in SQL so no datetimes are parsed in Python.
+    """
+    rows = db.session.execute(
+        select(func.date(IncidentReport.date_reported), IncidentReport.resident_id,
+               IncidentReport.incident_type, IncidentReport.severity)
+        .where(IncidentReport.date_reported >= start, IncidentReport.date_reported < end + timedelta(days=1))
+    ).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return {'day': empty, 'resident_id': empty, 'type': empty, 'severity': empty, 'types': [], 'severities': []}
+    reported, resident_ids, types, severities = zip(*rows)
+    days = np.array(reported, dtype='datetime64[D]') - np.datetime64(start, 'D')
+    type_labels, type_codes = np.unique(np.array(types), return_inverse=True)
+    severity_labels, severity_codes = np.unique(np.array(severities), return_inverse=True)
+    return {
+        'day': days.astype(np.int64),
+        'resident_id': np.array(resident_ids, dtype=np.int64),
+        'type': type_codes,
+        'severity': severity_codes,
+        'types': type_labels.tolist(),
+        'severities': severity_labels.tolist(),
+    }
+
+
+def daily_counts(days, codes, n_codes, n_days):
+    """Return an (n_codes, n_days) array of incidents per code per day"""
+    return np.bincount(codes * n_days + days, minlength=n_codes * n_days).reshape(n_codes, n_days)
+
+
+def rolling_sum(counts, window):
+    """Trailing `window`-day sums along the last axis; early days sum what is available"""
+    cumulative = np.cumsum(counts, axis=-1)
+    shifted = np.zeros_like(cumulative)
+    shifted[..., window:] = cumulative[..., :-window]
+    return cumulative - shifted
+
+
+def week_over_week(counts):
+    """
+    Sum daily counts into weeks ending on the last day and return
+    (weekly counts, percentage change from the previous week). The change
+    is None where the previous week had no incidents.
+    """
+    n_weeks = counts.shape[-1] // 7
+    if n_weeks == 0:
+        empty = np.zeros(counts.shape[:-1] + (0,), dtype=np.int64)
+        return empty, empty
+    weekly = counts[..., -n_weeks * 7:].reshape(counts.shape[:-1] + (n_weeks, 7)).sum(axis=-1)
+    previous = weekly[..., :-1].astype(float)
+    change = np.full(previous.shape, np.nan)
+    np.divide(weekly[..., 1:] - previous, previous, out=change, where=previous > 0)
+    change = np.round(change * 100, 1)
+    return weekly, np.where(np.isnan(change), None, change)
+
+
+def incident_trends(db, start, end, resident_count, window=7):
+    """
+    Compute incident trends for charts over start..end:
+    per-type daily counts and trailing `window`-day rates per 1,000
+    resident-days, weekly counts with week-over-week change, and
+    per-resident incident counts by type.
+    """
+    data = load_incident_arrays(db, start, end)
+    n_days = (end - start).days + 1
+    types = data['types']
+    counts = daily_counts(data['day'], data['type'], len(types), n_days)
+    resident_days = max(resident_count, 1) * np.minimum(np.arange(1, n_days + 1), window)
+    rates = np.round(rolling_sum(counts, window) / resident_days * 1000, 2)
+    weekly, change = week_over_week(counts)
+    total_weekly, total_change = week_over_week(counts.sum(axis=0))
+
+    residents, resident_codes = np.unique(data['resident_id'], return_inverse=True)
+    per_resident = np.bincount(
+        resident_codes * len(types) + data['type'], minlength=len(residents) * len(types)
+    ).reshape(len(residents), len(types))
+
+    n_weeks = weekly.shape[-1]
+    week_starts = [end - timedelta(days=7 * (n_weeks - i) - 1) for i in range(n_weeks)]
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'window': window,
+        'labels': [(start + timedelta(days=i)).isoformat() for i in range(n_days)],
+        'types': {
+            incident_type: {
+                'daily': counts[i].tolist(),
+                'rolling_rate': rates[i].tolist(),
+                'weekly': weekly[i].tolist(),
+                'week_over_week': change[i].tolist(),
+            }
+            for i, incident_type in enumerate(types)
+        },
+        'weeks': [week_start.isoformat() for week_start in week_starts],
+        'total_weekly': total_weekly.tolist(),
+        'total_week_over_week': total_change.tolist(),
+        'per_resident': [
+            {
+                'resident_id': int(resident_id),
+                'total': int(per_resident[i].sum()),
+                'by_type': {incident_type: int(per_resident[i, j]) for j, incident_type in enumerate(types) if per_resident[i, j]},
+                'per_30_days': round(float(per_resident[i].sum()) / n_days * 30, 2),
+            }
+            for i, resident_id in enumerate(residents)
+        ],
+    }
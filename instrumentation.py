@@ -0,0 +1,162 @@
+import threading
+import time
+
+from flask import g, request
+from sqlalchemy import event
+
+
+class RequestCounters(threading.local):
+    """
+    Per-thread counters for the request being served. EncryptedText bumps
+    the crypto counts unconditionally (an attribute increment); queries are
+    only timed while a request is active on the thread.
+    """
+
+    def __init__(self):
+        self.active = False
+        self.queries = 0
+        self.query_time = 0.0
+        self.encrypts = 0
+        self.decrypts = 0
+
+    def start(self):
+        self.active = True
+        self.queries = 0
+        self.query_time = 0.0
+        self.encrypts = 0
+        self.decrypts = 0
+
+
+request_counters = RequestCounters()
+
+
+class EndpointStats:
+    """Totals per endpoint since startup or the last reset"""
+
+    FIELDS = ('requests', 'total_ms', 'max_ms', 'queries', 'max_queries', 'query_ms', 'encrypts', 'decrypts')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, endpoint, elapsed_ms, queries, query_ms, encrypts, decrypts):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = dict.fromkeys(self.FIELDS, 0)
+            stats['requests'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['query_ms'] += query_ms
+            stats['encrypts'] += encrypts
+            stats['decrypts'] += decrypts
+
+    def snapshot(self):
+        """Per-endpoint averages and maxima, slowest average first"""
+        with self._lock:
+            items = [(endpoint, dict(stats)) for endpoint, stats in self._stats.items()]
+        rows = []
+        for endpoint, stats in items:
+            n = stats['requests']
+            rows.append({
+                'endpoint': endpoint,
+                'requests': n,
+                'avg_ms': round(stats['total_ms'] / n, 1),
+                'max_ms': round(stats['max_ms'], 1),
+                'avg_queries': round(stats['queries'] / n, 1),
+                'max_queries': stats['max_queries'],
+                'avg_query_ms': round(stats['query_ms'] / n, 1),
+                'avg_crypto_ops': round((stats['encrypts'] + stats['decrypts']) / n, 1),
+            })
+        return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+endpoint_stats = EndpointStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+# Called as observer(conn, statement, parameters, context, executemany, elapsed_seconds) after every statement
+query_observers = []
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if request_counters.active:
+        request_counters.queries += 1
+        request_counters.query_time += elapsed
+    for observer in query_observers:
+        observer(conn, statement, parameters, context, executemany, elapsed)
+
+
+def _handle_error(context):
+    # after_cursor_execute doesn't run for a failed statement
+    if context.connection is not None and context.connection.info.get('query_started'):
+        context.connection.info['query_started'].pop()
+
+
+def _start_request():
+    g._instrumentation_started = time.perf_counter()
+    request_counters.start()
+
+
+# Called as observer(response, endpoint, elapsed_ms, counters) after every timed request
+request_observers = []
+
+
+def _finish_request(response):
+    started = g.pop('_instrumentation_started', None)
+    if started is None:
+        return response
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    request_counters.active = False
+    endpoint = request.endpoint or 'unmatched'
+    for observer in request_observers:
+        observer(response, endpoint, elapsed_ms, request_counters)
+    return response
+
+
+def _server_timing(response, endpoint, elapsed_ms, counters):
+    query_ms = counters.query_time * 1000
+    endpoint_stats.record(endpoint, elapsed_ms, counters.queries, query_ms, counters.encrypts, counters.decrypts)
+    response.headers.add('Server-Timing', f'app;dur={elapsed_ms:.1f}')
+    response.headers.add('Server-Timing', f'db;dur={query_ms:.1f};desc="{counters.queries} queries"')
+    response.headers.add('Server-Timing', f'crypto;desc="{counters.encrypts} encrypt, {counters.decrypts} decrypt"')
+
+
+def init_query_timing(app, db):
+    """Time every statement on the app's engine for the request counters and query_observers"""
+    with app.app_context():
+        engine = db.engine
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
+
+
+def init_request_timing(app, db):
+    """Count and time each request's queries and crypto operations for the request_observers"""
+    if app.extensions.get('request_timing'):
+        return
+    app.extensions['request_timing'] = True
+    init_query_timing(app, db)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def init_instrumentation(app, db):
+    """
+    Time every request and the queries it runs. Adds Server-Timing headers
+    and feeds endpoint_stats, shown on the admin metrics page.
+    """
+    init_request_timing(app, db)
+    if _server_timing not in request_observers:
+        request_observers.append(_server_timing)
@@ -0,0 +1,54 @@
+import re
+
+# Integer codes for FoodIntake.intake_level and LiquidIntake.intake. The
+# strings stay as entered; the codes are what aggregation reads. 0 means a
+# free-text value that can't be scored.
+UNKNOWN = 0
+
+FOOD_INTAKE_CODES = {
+    '25%': 25,
+    '50%': 50,
+    '75%': 75,
+    '100%': 100,
+    'Ensure': 1,
+    'Other': 2,
+    '0%': 3,  # 0 is already UNKNOWN
+}
+# Percent of a meal eaten, by code. A supplement drink stands in for about
+# half a meal; 'Other' has only notes and isn't scored.
+FOOD_INTAKE_SCORES = {25: 25, 50: 50, 75: 75, 100: 100, 1: 50, 3: 0}
+
+LIQUID_INTAKE_CODES = {
+    'No': 1,
+    'Partial': 2,
+    'Yes': 3,
+}
+# Percent of the offered fluids taken, by code
+LIQUID_INTAKE_SCORES = {1: 0, 2: 50, 3: 100}
+
+_PERCENT = re.compile(r'^(\d{1,3})\s*%$')
+# Multi-liquid entries from the daily log are stored as "Liquid 2: Yes"
+_LIQUID_PREFIX = re.compile(r'^Liquid \d+:\s*')
+
+
+def food_intake_code(value):
+    """Code for a food intake level; other percentages round to the nearest quarter, 0-12% to nothing eaten"""
+    if value is None:
+        return UNKNOWN
+    value = value.strip()
+    if value in FOOD_INTAKE_CODES:
+        return FOOD_INTAKE_CODES[value]
+    match = _PERCENT.match(value)
+    if match:
+        percent = min(int(match.group(1)), 100)
+        quarter = int(round(percent / 25.0)) * 25
+        return quarter if quarter else FOOD_INTAKE_CODES['0%']
+    return UNKNOWN
+
+
+def liquid_intake_code(value):
+    """Code for a liquid intake entry, with or without the "Liquid N:" prefix"""
+    if value is None:
+        return UNKNOWN
+    value = _LIQUID_PREFIX.sub('', value.strip())
+    return LIQUID_INTAKE_CODES.get(value.capitalize(), UNKNOWN)
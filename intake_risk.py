@@ -0,0 +1,163 @@
+import json
+from datetime import date, timedelta
+
+from sqlalchemy import case, delete, func, select
+
+from intake_codes import FOOD_INTAKE_SCORES, LIQUID_INTAKE_SCORES
+from models import FoodIntake, LiquidIntake, IntakeDaily, IntakeRisk
+
+# Recent days are compared with the baseline days just before them
+RECENT_DAYS = 3
+BASELINE_DAYS = 7
+MIN_RECENT_DAYS = 2
+MIN_BASELINE_DAYS = 3
+# Average percent below which intake is flagged as low
+LOW_FOOD = 50
+LOW_LIQUID = 50
+# Drop in percentage points from baseline to recent that counts as declining
+DECLINE = 25
+
+
+def _daily_totals(db, model, scores, resident_id=None, day=None, since=None):
+    """{(resident_id, date): (total percent, scored entries)} from one GROUP BY"""
+    score = case(scores, value=model.intake_code)  # NULL for unscored codes
+    query = select(model.resident_id, model.date, func.coalesce(func.sum(score), 0), func.count(score))
+    if resident_id is not None:
+        query = query.where(model.resident_id == resident_id)
+    if day is not None:
+        query = query.where(model.date == day)
+    if since is not None:
+        query = query.where(model.date >= since)
+    rows = db.session.execute(query.group_by(model.resident_id, model.date)).all()
+    return {(row[0], row[1]): (int(row[2]), row[3]) for row in rows}
+
+
+def _merge_totals(food, liquid):
+    for key in food.keys() | liquid.keys():
+        food_total, food_meals = food.get(key, (0, 0))
+        liquid_total, liquid_entries = liquid.get(key, (0, 0))
+        if food_meals or liquid_entries:
+            yield {
+                'resident_id': key[0], 'date': key[1],
+                'food_total': food_total, 'food_meals': food_meals,
+                'liquid_total': liquid_total, 'liquid_entries': liquid_entries,
+            }
+
+
+def refresh_intake(db, resident_id, day):
+    """
+    Recompute one resident's totals for one day from that day's logs, then
+    their current risk. A backdated entry can change today's window but
+    never moves the risk back to its day. Call after saving food or liquid
+    entries; the caller commits.
+    """
+    food = _daily_totals(db, FoodIntake, FOOD_INTAKE_SCORES, resident_id, day)
+    liquid = _daily_totals(db, LiquidIntake, LIQUID_INTAKE_SCORES, resident_id, day)
+    daily = IntakeDaily.query.filter_by(resident_id=resident_id, date=day).first()
+    totals = next(_merge_totals(food, liquid), None)
+    if totals is None:
+        if daily:
+            db.session.delete(daily)
+    else:
+        if not daily:
+            daily = IntakeDaily(resident_id=resident_id, date=day)
+            db.session.add(daily)
+        for key in ('food_total', 'food_meals', 'liquid_total', 'liquid_entries'):
+            setattr(daily, key, totals[key])
+    return update_intake_risk(db, resident_id, max(day, date.today()))
+
+
+def _average(days, total_key, count_key):
+    """Mean of the daily average percents over days that have scored entries"""
+    percents = [day[total_key] / day[count_key] for day in days if day[count_key]]
+    return (round(sum(percents) / len(percents)), len(percents)) if percents else (None, 0)
+
+
+def evaluate_intake(daily_rows, as_of):
+    """
+    Compare the last RECENT_DAYS with the BASELINE_DAYS before them.
+    daily_rows are IntakeDaily-like dicts. Returns (averages, flags).
+    """
+    recent_start = as_of - timedelta(days=RECENT_DAYS - 1)
+    recent = [row for row in daily_rows if row['date'] >= recent_start]
+    baseline = [row for row in daily_rows if row['date'] < recent_start]
+    averages, flags = {}, []
+    for label, prefix, low in (('Food', 'food', LOW_FOOD), ('Fluid', 'liquid', LOW_LIQUID)):
+        count_key = 'food_meals' if prefix == 'food' else 'liquid_entries'
+        recent_avg, recent_days = _average(recent, f'{prefix}_total', count_key)
+        baseline_avg, baseline_days = _average(baseline, f'{prefix}_total', count_key)
+        if recent_days < MIN_RECENT_DAYS:
+            recent_avg = None
+        if baseline_days < MIN_BASELINE_DAYS:
+            baseline_avg = None
+        averages[f'{prefix}_recent'] = recent_avg
+        averages[f'{prefix}_baseline'] = baseline_avg
+        if recent_avg is None:
+            continue
+        if recent_avg < low:
+            flags.append({'code': f'low_{prefix}',
+                          'message': f"Low {label.lower()} intake: {recent_avg}% over the last {RECENT_DAYS} days"})
+        if baseline_avg is not None and baseline_avg - recent_avg >= DECLINE:
+            flags.append({'code': f'declining_{prefix}',
+                          'message': f"{label} intake down from {baseline_avg}% to {recent_avg}%"})
+    return averages, flags
+
+
+def update_intake_risk(db, resident_id, as_of):
+    """Recompute a resident's IntakeRisk from their daily totals in the rolling window; the caller commits"""
+    window_start = as_of - timedelta(days=RECENT_DAYS + BASELINE_DAYS - 1)
+    rows = db.session.execute(
+        select(IntakeDaily.date, IntakeDaily.food_total, IntakeDaily.food_meals,
+               IntakeDaily.liquid_total, IntakeDaily.liquid_entries)
+        .where(IntakeDaily.resident_id == resident_id, IntakeDaily.date.between(window_start, as_of))
+    ).mappings().all()
+    averages, flags = evaluate_intake(rows, as_of)
+    risk = IntakeRisk.query.filter_by(resident_id=resident_id).first()
+    if not risk:
+        risk = IntakeRisk(resident_id=resident_id)
+        db.session.add(risk)
+    risk.as_of = as_of
+    for key, value in averages.items():
+        setattr(risk, key, value)
+    risk.flags = json.dumps(flags)
+    return risk
+
+
+def rebuild_intake_daily(db, since=None):
+    """
+    Rebuild IntakeDaily from the raw logs with one GROUP BY per table,
+    from `since` or for all history. Returns the number of days written.
+    """
+    food = _daily_totals(db, FoodIntake, FOOD_INTAKE_SCORES, since=since)
+    liquid = _daily_totals(db, LiquidIntake, LIQUID_INTAKE_SCORES, since=since)
+    statement = delete(IntakeDaily)
+    if since is not None:
+        statement = statement.where(IntakeDaily.date >= since)
+    db.session.execute(statement)
+    rows = list(_merge_totals(food, liquid))
+    if rows:
+        db.session.execute(IntakeDaily.__table__.insert(), rows)
+    return len(rows)
+
+
+def score_all_residents(db, resident_ids, as_of):
+    """Recompute IntakeRisk for every resident as of a date. Returns the number flagged."""
+    flagged = 0
+    for resident_id in resident_ids:
+        if json.loads(update_intake_risk(db, resident_id, as_of).flags):
+            flagged += 1
+    return flagged
+
+
+def at_risk_residents(db, today):
+    """
+    Return [(resident_id, flags, as_of)] for residents with intake flags.
+    Scores are only refreshed when intake is logged, so one older than
+    RECENT_DAYS describes none of the recent days and is left out.
+    """
+    rows = db.session.execute(
+        select(IntakeRisk.resident_id, IntakeRisk.flags, IntakeRisk.as_of)
+        .where(IntakeRisk.flags.isnot(None), IntakeRisk.flags != '[]',
+               IntakeRisk.as_of >= today - timedelta(days=RECENT_DAYS))
+    ).all()
+    return [(resident_id, json.loads(flags), as_of) for resident_id, flags, as_of in rows]
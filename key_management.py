@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+# Where a generated development key is kept so data stays readable across restarts
+DEV_KEY_FILE = os.environ.get('ENCRYPTION_KEY_FILE', '.encryption_key')
+
+_lock = threading.Lock()
+_keyring = None
+
+
+def load_keys():
+    """
+    Return the configured Fernet keys, primary first.
+    ENCRYPTION_KEYS is a comma-separated list: new values are encrypted with
+    the first key, and every key in the list can decrypt. A single
+    ENCRYPTION_KEY is still accepted and is tried after ENCRYPTION_KEYS.
+    Without either, a development key is generated once and stored in
+    DEV_KEY_FILE.
+    """
+    keys = [key.strip() for key in os.environ.get('ENCRYPTION_KEYS', '').split(',') if key.strip()]
+    legacy_key = os.environ.get('ENCRYPTION_KEY', '').strip()
+    if legacy_key and legacy_key not in keys:
+        keys.append(legacy_key)
+    if keys:
+        return keys
+
+    if os.path.exists(DEV_KEY_FILE):
+        with open(DEV_KEY_FILE) as f:
+            return [f.read().strip()]
+    from cryptography.fernet import Fernet
+    key = Fernet.generate_key().decode()
+    with open(DEV_KEY_FILE, 'w') as f:
+        f.write(key)
+    os.chmod(DEV_KEY_FILE, 0o600)
+    print(f"Warning: Generated an encryption key in {DEV_KEY_FILE}. Set ENCRYPTION_KEYS in secrets for production.")
+    return [key]
+
+
+def key_fingerprint(key):
+    """Short identifier for a key that is safe to store and log"""
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+class Keyring:
+    """The configured keys, wrapped for encryption, decryption and rotation"""
+
+    def __init__(self, keys):
+        from cryptography.fernet import Fernet, MultiFernet
+        self.keys = keys
+        self.primary = Fernet(keys[0].encode())
+        self.primary_fingerprint = key_fingerprint(keys[0])
+        self.cipher = MultiFernet([Fernet(key.encode()) for key in keys])
+
+    def encrypt(self, data):
+        return self.cipher.encrypt(data)
+
+    def decrypt(self, token):
+        return self.cipher.decrypt(token)
+
+    def is_current(self, token):
+        """True when the token is already encrypted with the primary key"""
+        from cryptography.fernet import InvalidToken
+        try:
+            # Checks the HMAC only, without decrypting
+            self.primary.extract_timestamp(token)
+            return True
+        except InvalidToken:
+            return False
+
+    def rotate(self, token):
+        """Re-encrypt a token under the primary key"""
+        return self.cipher.rotate(token)
+
+
+def get_keyring():
+    """Return the process-wide keyring, loading keys on first use"""
+    global _keyring
+    if _keyring is None:
+        with _lock:
+            if _keyring is None:
+                _keyring = Keyring(load_keys())
+    return _keyring
+
+
+def encrypted_columns(db):
+    """Return {table: [column names]} for every EncryptedText column in the metadata"""
+    from models import EncryptedText
+    found = {}
+    for table in db.metadata.sorted_tables:
+        columns = [column.name for column in table.columns if isinstance(column.type, EncryptedText)]
+        if columns:
+            found[table] = columns
+    return found
+
+
+def reencrypt_columns(db, batch_size=500, pause=0.0, progress=None):
+    """
+    Re-encrypt every EncryptedText value that isn't stored with its
+    column's codec, or for Fernet columns, under the primary key. Each table is walked in id order, one batch per transaction, and the
+    last id done is stored as an AppSetting checkpoint inside the same
+    transaction, so an interrupted run resumes where it stopped. Rows are
+    updated only if the stored value is unchanged since it was read, so
+    concurrent edits from the running app are never overwritten.
+    Returns the number of values re-encrypted.
+    """
+    from sqlalchemy import Text, and_, select, type_coerce
+    from models import get_setting, set_setting
+
+    keyring = get_keyring()
+    rotated = 0
+    for table, columns in encrypted_columns(db).items():
+        codecs = '+'.join(sorted({table.c[name].type.codec for name in columns}))
+        checkpoint_key = f"reencrypt:{keyring.primary_fingerprint}:{table.name}:{codecs}"
+        last_id = int(get_setting(checkpoint_key, 0))
+        raw_columns = [type_coerce(table.c[name], Text).label(name) for name in columns]
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, *raw_columns)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            for row in rows:
+                for name in columns:
+                    token = getattr(row, name)
+                    column_type = table.c[name].type
+                    if token is None or column_type.is_current(token):
+                        continue
+                    new_token = column_type.reencrypt(token)
+                    result = db.session.execute(
+                        table.update()
+                        .where(and_(table.c.id == row.id, type_coerce(table.c[name], Text) == token))
+                        .values({table.c[name]: type_coerce(new_token, Text)})
+                    )
+                    rotated += result.rowcount
+            last_id = rows[-1].id
+            set_setting(checkpoint_key, str(last_id))
+            db.session.commit()
+            if progress:
+                progress(table.name, last_id, rotated)
+            if pause:
+                time.sleep(pause)
+    return rotated
+
+
+def reencrypt_files(folder, filenames, progress=None):
+    """
+    Re-encrypt document files under the primary key. Each file is written
+    to a temporary name and swapped in atomically. Returns the number of
+    files rewritten.
+    """
+    keyring = get_keyring()
+    rewritten = 0
+    for filename in filenames:
+        path = os.path.join(folder, filename)
+        try:
+            with open(path, 'rb') as f:
+                token = f.read()
+        except OSError as e:
+            logging.error(f"Cannot read {path} for re-encryption: {e}")
+            continue
+        if keyring.is_current(token):
+            continue
+        tmp_path = f"{path}.rotating"
+        with open(tmp_path, 'wb') as f:
+            f.write(keyring.rotate(token))
+        os.replace(tmp_path, path)
+        rewritten += 1
+        if progress:
+            progress(filename, rewritten)
+    return rewritten
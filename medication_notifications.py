@@ -4,6 +4,8 @@ from flask import current_app
 from flask_mail import Message
 import logging
 
+from prometheus_metrics import track_mail
+
 def check_and_send_medication_alerts(db, mail, Medication, Document, Resident):
     """
     Check for expiring medications and documents, send alerts only when appropriate.
@@ -151,7 +153,8 @@ def send_medication_alert(mail, resident_name, med_name, expiration_date, alert_
         
         msg = Message(subject, recipients=[current_app.config['MAIL_DEFAULT_SENDER']])
         msg.body = body
-        mail.send(msg)
+        with track_mail():
+            mail.send(msg)
         logging.info(f"Sent {alert_type} alert for medication {med_name}")
     except Exception as e:
         logging.error(f"Failed to send medication alert: {e}")
@@ -171,7 +174,8 @@ def send_document_alert(mail, resident_name, doc_name, expiration_date, alert_ty
         
         msg = Message(subject, recipients=[current_app.config['MAIL_DEFAULT_SENDER']])
         msg.body = body
-        mail.send(msg)
+        with track_mail():
+            mail.send(msg)
         logging.info(f"Sent {alert_type} alert for document {doc_name}")
     except Exception as e:
         logging.error(f"Failed to send document alert: {e}")
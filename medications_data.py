@@ -621,3 +621,60 @@ ELDERLY_MEDS = [
     ('Gas Relief (Simethicone)', 'Simethicone', 'Gas, bloating, flatulence'),
     ('Milk of Magnesia', 'Magnesium hydroxide', 'Constipation, heartburn'),
 ]
+
+# Catalog entries with default dosing, seeded ahead of ELDERLY_MEDS
+SAMPLE_MEDICATIONS = [
+    # Most commonly prescribed for elderly
+    {'name': 'Lisinopril', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor blood pressure', 'form': 'tablet', 'common_uses': 'hypertension, heart failure'},
+    {'name': 'Metformin', 'default_dosage': '500 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with meals', 'form': 'tablet', 'common_uses': 'type 2 diabetes'},
+    {'name': 'Atorvastatin', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'high cholesterol'},
+    {'name': 'Amlodipine', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor for ankle swelling', 'form': 'tablet', 'common_uses': 'hypertension, angina'},
+    {'name': 'Omeprazole', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take before breakfast', 'form': 'capsule', 'common_uses': 'GERD, stomach ulcers'},
+    {'name': 'Aricept', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'Alzheimer\'s disease'},
+    {'name': 'Furosemide', 'default_dosage': '40 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'heart failure, fluid retention'},
+    {'name': 'Warfarin', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Regular INR monitoring required', 'form': 'tablet', 'common_uses': 'blood clot prevention'},
+    {'name': 'Synthroid', 'default_dosage': '100 mcg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach', 'form': 'tablet', 'common_uses': 'hypothyroidism'},
+    {'name': 'Acetaminophen', 'default_dosage': '325 mg', 'default_frequency': 'As needed', 'default_notes': 'Max 3000 mg daily', 'form': 'tablet', 'common_uses': 'pain relief, fever'},
+    {'name': 'Gabapentin', 'default_dosage': '300 mg', 'default_frequency': 'Three times daily', 'default_notes': 'Gradual dose increase', 'form': 'capsule', 'common_uses': 'neuropathy, seizures'},
+    {'name': 'Sertraline', 'default_dosage': '50 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'depression, anxiety'},
+    {'name': 'Fosamax', 'default_dosage': '70 mg', 'default_frequency': 'Weekly', 'default_notes': 'Take on empty stomach, remain upright 30 min', 'form': 'tablet', 'common_uses': 'osteoporosis'},
+    {'name': 'Vitamin D3', 'default_dosage': '1000 IU', 'default_frequency': 'Daily', 'default_notes': 'Take with meals', 'form': 'tablet', 'common_uses': 'bone health, vitamin deficiency'},
+    {'name': 'Calcium', 'default_dosage': '500 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'bone health'},
+    {'name': 'Aspirin', 'default_dosage': '81 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'heart protection, stroke prevention'},
+    {'name': 'Sinemet', 'default_dosage': '25/100 mg', 'default_frequency': 'Three times daily', 'default_notes': 'Take with food if nausea occurs', 'form': 'tablet', 'common_uses': 'Parkinson\'s disease'},
+    {'name': 'Donepezil', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take at bedtime', 'form': 'tablet', 'common_uses': 'Alzheimer\'s disease'},
+    {'name': 'Pantoprazole', 'default_dosage': '40 mg', 'default_frequency': 'Daily', 'default_notes': 'Take before breakfast', 'form': 'tablet', 'common_uses': 'GERD, stomach ulcers'},
+    {'name': 'Tramadol', 'default_dosage': '50 mg', 'default_frequency': 'As needed', 'default_notes': 'Max 400 mg daily', 'form': 'tablet', 'common_uses': 'moderate pain'},
+    {'name': 'Prednisone', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food, taper gradually', 'form': 'tablet', 'common_uses': 'inflammation, autoimmune conditions'},
+    {'name': 'Carvedilol', 'default_dosage': '12.5 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'heart failure, high blood pressure'},
+    {'name': 'Clopidogrel', 'default_dosage': '75 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'blood clot prevention'},
+    {'name': 'Metoprolol', 'default_dosage': '50 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Monitor heart rate', 'form': 'tablet', 'common_uses': 'high blood pressure, heart failure'},
+    {'name': 'Losartan', 'default_dosage': '50 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'high blood pressure'},
+    {'name': 'Hydrochlorothiazide', 'default_dosage': '25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor electrolytes', 'form': 'tablet', 'common_uses': 'high blood pressure, fluid retention'},
+    {'name': 'Glipizide', 'default_dosage': '5 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Take before meals', 'form': 'tablet', 'common_uses': 'type 2 diabetes'},
+    {'name': 'Allopurinol', 'default_dosage': '300 mg', 'default_frequency': 'Daily', 'default_notes': 'Take after meals', 'form': 'tablet', 'common_uses': 'gout prevention'},
+    {'name': 'Tamsulosin', 'default_dosage': '0.4 mg', 'default_frequency': 'Daily', 'default_notes': 'Take 30 min after same meal daily', 'form': 'capsule', 'common_uses': 'enlarged prostate'},
+    {'name': 'Finasteride', 'default_dosage': '5 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'enlarged prostate'},
+    {'name': 'Latanoprost', 'default_dosage': '0.005%', 'default_frequency': 'Daily at bedtime', 'default_notes': 'One drop in affected eye', 'form': 'eye drops', 'common_uses': 'glaucoma'},
+    {'name': 'Levothyroxine', 'default_dosage': '100 mcg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach', 'form': 'tablet', 'common_uses': 'hypothyroidism'},
+    {'name': 'Escitalopram', 'default_dosage': '10 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with or without food', 'form': 'tablet', 'common_uses': 'depression, anxiety'},
+    {'name': 'Fluoxetine', 'default_dosage': '20 mg', 'default_frequency': 'Daily', 'default_notes': 'Take in morning', 'form': 'capsule', 'common_uses': 'depression, anxiety'},
+    {'name': 'Trazodone', 'default_dosage': '50 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'depression, insomnia'},
+    {'name': 'Lorazepam', 'default_dosage': '0.5 mg', 'default_frequency': 'As needed', 'default_notes': 'Use cautiously in elderly', 'form': 'tablet', 'common_uses': 'anxiety, insomnia'},
+    {'name': 'Zolpidem', 'default_dosage': '5 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Use lowest effective dose', 'form': 'tablet', 'common_uses': 'insomnia'},
+    {'name': 'Simvastatin', 'default_dosage': '40 mg', 'default_frequency': 'Daily at bedtime', 'default_notes': 'Monitor for muscle pain', 'form': 'tablet', 'common_uses': 'high cholesterol'},
+    {'name': 'Digoxin', 'default_dosage': '0.25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor drug levels', 'form': 'tablet', 'common_uses': 'heart failure, atrial fibrillation'},
+    {'name': 'Spironolactone', 'default_dosage': '25 mg', 'default_frequency': 'Daily', 'default_notes': 'Monitor potassium levels', 'form': 'tablet', 'common_uses': 'heart failure, high blood pressure'},
+    {'name': 'Potassium', 'default_dosage': '10 mEq', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'potassium deficiency'},
+    {'name': 'Iron', 'default_dosage': '325 mg', 'default_frequency': 'Daily', 'default_notes': 'Take on empty stomach if tolerated', 'form': 'tablet', 'common_uses': 'iron deficiency anemia'},
+    {'name': 'Multivitamin', 'default_dosage': '1 tablet', 'default_frequency': 'Daily', 'default_notes': 'Take with breakfast', 'form': 'tablet', 'common_uses': 'nutritional supplement'},
+    {'name': 'Fish Oil', 'default_dosage': '1000 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with meals', 'form': 'capsule', 'common_uses': 'heart health, inflammation'},
+    {'name': 'Celecoxib', 'default_dosage': '200 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'arthritis pain, inflammation'},
+    {'name': 'Meloxicam', 'default_dosage': '7.5 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'tablet', 'common_uses': 'arthritis pain, inflammation'},
+    {'name': 'Duloxetine', 'default_dosage': '60 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'depression, anxiety, neuropathy'},
+    {'name': 'Pregabalin', 'default_dosage': '150 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Gradual dose titration', 'form': 'capsule', 'common_uses': 'neuropathy, fibromyalgia'},
+    {'name': 'Venlafaxine', 'default_dosage': '75 mg', 'default_frequency': 'Daily', 'default_notes': 'Take with food', 'form': 'capsule', 'common_uses': 'depression, anxiety'},
+    {'name': 'Mirtazapine', 'default_dosage': '15 mg', 'default_frequency': 'At bedtime', 'default_notes': 'May cause drowsiness', 'form': 'tablet', 'common_uses': 'depression'},
+    {'name': 'Quetiapine', 'default_dosage': '25 mg', 'default_frequency': 'At bedtime', 'default_notes': 'Start with low dose', 'form': 'tablet', 'common_uses': 'bipolar disorder, schizophrenia'},
+    {'name': 'Risperidone', 'default_dosage': '1 mg', 'default_frequency': 'Twice daily', 'default_notes': 'Monitor for side effects', 'form': 'tablet', 'common_uses': 'schizophrenia, bipolar disorder'}
+]
@@ -0,0 +1,243 @@
+from datetime import date
+from sqlalchemy import func, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+from models import SchemaVersion
+from audit import seal_unhashed_entries
+
+# Registered migrations as (version, description, function), in version order
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a schema migration. Versions must be unique and increasing."""
+    def decorator(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} is out of order")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def print_progress(label, done, total):
+    """Default progress reporter for long-running migrations"""
+    if total:
+        print(f"  {label}: {done}/{total} ({done * 100 // total}%)")
+    else:
+        print(f"  {label}: {done}")
+
+
+def current_version(db):
+    """Return the highest applied migration version, 0 for a new database"""
+    return db.session.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def run_migrations(db, progress=print_progress):
+    """
+    Create missing tables and bring the schema up to the latest version.
+    When the database is current this is a single SELECT against
+    schema_version, without create_all's reflection of every table. Each
+    pending migration runs once and is recorded as soon as it finishes, so
+    an interrupted upgrade resumes where it stopped. Returns the list of
+    versions applied.
+    """
+    try:
+        version = current_version(db)
+    except DBAPIError:
+        # No schema_version table yet: a new database
+        db.session.rollback()
+        version = 0
+    if version >= latest_version():
+        return []
+    # Creates schema_version, and any tables added alongside the pending migrations
+    db.create_all()
+
+    applied = []
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        print(f"Applying migration {number}: {description}...")
+        fn(db, progress)
+        db.session.add(SchemaVersion(version=number, description=description))
+        db.session.commit()
+        applied.append(number)
+    return applied
+
+
+def column_names(db, table_name):
+    return [column['name'] for column in inspect(db.engine).get_columns(table_name)]
+
+
+def update_in_chunks(db, table_name, assignment, where, label, progress, chunk_size=5000):
+    """
+    Run `UPDATE table SET assignment WHERE where` over id ranges of
+    chunk_size rows, committing after each chunk so no single transaction
+    holds the table for long. The statements must be idempotent.
+    """
+    low, high = db.session.execute(text(f"SELECT MIN(id), MAX(id) FROM {table_name}")).one()
+    if low is None:
+        return
+    total = high - low + 1
+    for start in range(low, high + 1, chunk_size):
+        db.session.execute(
+            text(f"UPDATE {table_name} SET {assignment} WHERE id >= :start AND id < :end AND ({where})"),
+            {'start': start, 'end': start + chunk_size}
+        )
+        db.session.commit()
+        progress(label, min(start + chunk_size, high + 1) - low, total)
+
+
+@migration(1, "Rename medication.end_date to expiration_date")
+def medication_expiration_date(db, progress):
+    columns = column_names(db, 'medication')
+    if 'expiration_date' in columns:
+        return
+    if 'end_date' in columns:
+        try:
+            db.session.execute(text("ALTER TABLE medication RENAME COLUMN end_date TO expiration_date"))
+            db.session.commit()
+            return
+        except Exception as e:
+            # SQLite before 3.25 cannot rename columns; copy the values over instead
+            db.session.rollback()
+            print(f"  Rename not supported ({e}), copying end_date instead")
+    db.session.execute(text("ALTER TABLE medication ADD COLUMN expiration_date DATE"))
+    db.session.commit()
+    if 'end_date' in columns:
+        update_in_chunks(db, 'medication', 'expiration_date = end_date',
+                         'expiration_date IS NULL AND end_date IS NOT NULL',
+                         'medication.expiration_date', progress)
+
+
+@migration(2, "Add audit log hash chain")
+def audit_log_hash_chain(db, progress):
+    if 'entry_hash' not in column_names(db, 'audit_log'):
+        db.session.execute(text("ALTER TABLE audit_log ADD COLUMN prev_hash VARCHAR(64)"))
+        db.session.execute(text("ALTER TABLE audit_log ADD COLUMN entry_hash VARCHAR(64)"))
+        db.session.commit()
+    seal_unhashed_entries(db, progress=lambda done: progress('audit_log entries sealed', done, None))
+
+
+# Tables with a resident_id column, indexed for per-resident lookups and deletes
+RESIDENT_HISTORY_TABLES = [
+    'medication_log', 'medication', 'document', 'food_intake', 'liquid_intake',
+    'bowel_movement', 'urine_output', 'vitals', 'incident_report',
+]
+
+
+@migration(3, "Index resident_id on resident history tables")
+def resident_id_indexes(db, progress):
+    for done, table_name in enumerate(RESIDENT_HISTORY_TABLES, 1):
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table_name}_resident_id ON {table_name} (resident_id)"))
+        db.session.commit()
+        progress('resident_id indexes', done, len(RESIDENT_HISTORY_TABLES))
+
+
+INCIDENT_DASHBOARD_INDEXES = {
+    'ix_incident_report_date': 'date_reported, id',
+    'ix_incident_report_status_date': 'status, date_reported, id',
+    'ix_incident_report_severity_date': 'severity, date_reported, id',
+    'ix_incident_report_type_date': 'incident_type, date_reported, id',
+    'ix_incident_report_summary': 'status, severity, incident_type',
+}
+
+
+@migration(4, "Index incident_report for the incident dashboard")
+def incident_dashboard_indexes(db, progress):
+    for done, (name, columns) in enumerate(INCIDENT_DASHBOARD_INDEXES.items(), 1):
+        db.session.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON incident_report ({columns})"))
+        db.session.commit()
+        progress('incident_report indexes', done, len(INCIDENT_DASHBOARD_INDEXES))
+
+
+@migration(5, "Add integer intake codes to food and liquid intake")
+def intake_codes(db, progress):
+    from intake_codes import food_intake_code, liquid_intake_code
+    from intake_risk import rebuild_intake_daily, score_all_residents
+    for table_name, column, to_code in (('food_intake', 'intake_level', food_intake_code),
+                                        ('liquid_intake', 'intake', liquid_intake_code)):
+        if 'intake_code' not in column_names(db, table_name):
+            db.session.execute(text(f"ALTER TABLE {table_name} ADD COLUMN intake_code SMALLINT"))
+            db.session.commit()
+        # One UPDATE per distinct string rather than one per row
+        values = db.session.execute(
+            text(f"SELECT DISTINCT {column} FROM {table_name} WHERE intake_code IS NULL")
+        ).scalars().all()
+        for done, value in enumerate(values, 1):
+            db.session.execute(
+                text(f"UPDATE {table_name} SET intake_code = :code WHERE {column} = :value AND intake_code IS NULL"),
+                {'code': to_code(value), 'value': value}
+            )
+            db.session.commit()
+            progress(f'{table_name}.intake_code values', done, len(values))
+    days = rebuild_intake_daily(db)
+    db.session.commit()
+    progress('intake_daily days', days, None)
+    # Score existing residents so their flags show without a manual score-intake run
+    resident_ids = db.session.execute(text("SELECT id FROM resident")).scalars().all()
+    flagged = score_all_residents(db, resident_ids, date.today())
+    db.session.commit()
+    progress('intake_risk residents flagged', flagged, len(resident_ids))
+
+
+@migration(6, "Add medication administration times and index medication_log by resident and date")
+def medication_schedule(db, progress):
+    if 'administration_times' not in column_names(db, 'medication'):
+        db.session.execute(text("ALTER TABLE medication ADD COLUMN administration_times VARCHAR(100)"))
+        db.session.commit()
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_medication_log_resident_date ON medication_log (resident_id, date)"
+    ))
+    # The composite index serves every lookup the resident_id index did
+    db.session.execute(text("DROP INDEX IF EXISTS ix_medication_log_resident_id"))
+    db.session.commit()
+    progress('medication_log indexes', 1, 1)
+
+
+@migration(7, "Record administered, refused or held results on medication_log")
+def medication_log_status(db, progress):
+    columns = column_names(db, 'medication_log')
+    if 'status' not in columns:
+        db.session.execute(text("ALTER TABLE medication_log ADD COLUMN status VARCHAR(20)"))
+    if '_reason' not in columns:
+        db.session.execute(text("ALTER TABLE medication_log ADD COLUMN _reason TEXT"))
+    db.session.commit()
+    update_in_chunks(db, 'medication_log', "status = 'administered'",
+                     'status IS NULL AND administered = TRUE', 'medication_log.status', progress)
+
+
+@migration(8, "Score food intake of 0-12% as nothing eaten")
+def food_intake_none_eaten(db, progress):
+    # Migration 5 coded these as a quarter meal; databases migrated since use the new code already
+    from intake_codes import food_intake_code
+    from intake_risk import rebuild_intake_daily, score_all_residents
+    values = db.session.execute(
+        text("SELECT DISTINCT intake_level FROM food_intake WHERE intake_code = 25")
+    ).scalars().all()
+    changed = [value for value in values if food_intake_code(value) != 25]
+    for done, value in enumerate(changed, 1):
+        db.session.execute(
+            text("UPDATE food_intake SET intake_code = :code WHERE intake_level = :value AND intake_code = 25"),
+            {'code': food_intake_code(value), 'value': value}
+        )
+        db.session.commit()
+        progress('food_intake.intake_code values', done, len(changed))
+    if not changed:
+        return
+    days = rebuild_intake_daily(db)
+    db.session.commit()
+    progress('intake_daily days', days, None)
+    resident_ids = db.session.execute(text("SELECT id FROM resident")).scalars().all()
+    flagged = score_all_residents(db, resident_ids, date.today())
+    db.session.commit()
+    progress('intake_risk residents flagged', flagged, len(resident_ids))
+
+
+@migration(9, "Add pending_file_deletion for the file reaper")
+def pending_file_deletion(db, progress):
+    from models import PendingFileDeletion
+    PendingFileDeletion.__table__.create(db.engine, checkfirst=True)
+    progress('pending_file_deletion table', 1, 1)
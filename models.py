@@ -1,41 +1,67 @@
 
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import TypeDecorator, Text
+from sqlalchemy import TypeDecorator, Text, Column, event
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 from datetime import datetime
-from cryptography.fernet import Fernet
-import os
-
-# Initialize encryption
-ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY')
-if not ENCRYPTION_KEY:
-    ENCRYPTION_KEY = Fernet.generate_key().decode()
-cipher = Fernet(ENCRYPTION_KEY.encode())
+from envelope import CODECS, decrypt_value, encrypt_value, is_current
+from instrumentation import request_counters
+from intake_codes import food_intake_code, liquid_intake_code
 
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
 
+# Codec for sensitive free-text columns; see envelope.py
+FIELD_CODEC = 'aes-gcm'
+
 # Custom SQLAlchemy type for encrypted fields
 class EncryptedText(TypeDecorator):
+    """
+    Text encrypted with `codec` ('fernet', 'aes-gcm' or 'chacha20-poly1305').
+    Values written by any codec can be read, so a column's codec can be
+    changed without migrating existing rows. `scope` selects the data key
+    and defaults to the table name.
+    """
     impl = Text
     cache_ok = True
 
+    def __init__(self, codec='fernet', scope=None):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown encryption codec '{codec}'")
+        super().__init__()
+        self.codec = codec
+        self.scope = scope
+
     def process_bind_param(self, value, dialect):
         if value is None:
             return None
-        return cipher.encrypt(value.encode()).decode()
+        request_counters.encrypts += 1
+        return encrypt_value(value, self.codec, self.scope)
 
     def process_result_value(self, value, dialect):
         if value is None:
             return None
-        return cipher.decrypt(value.encode()).decode()
+        request_counters.decrypts += 1
+        return decrypt_value(value, self.scope)
+
+    def is_current(self, token):
+        """True when a stored value needs no re-encryption"""
+        return is_current(token, self.codec, self.scope)
+
+    def reencrypt(self, token):
+        return encrypt_value(decrypt_value(token, self.scope), self.codec, self.scope)
+
+@event.listens_for(Column, 'after_parent_attach')
+def _default_encryption_scope(column, table):
+    if isinstance(column.type, EncryptedText) and column.type.scope is None:
+        column.type.scope = table.name
 
 class Resident(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    _name = db.Column(EncryptedText, nullable=False)
-    _dob = db.Column(EncryptedText, nullable=False)
-    _medical_info = db.Column(EncryptedText)
-    _emergency_contact = db.Column(EncryptedText)
+    _name = db.Column(EncryptedText(FIELD_CODEC), nullable=False)
+    _dob = db.Column(EncryptedText(FIELD_CODEC), nullable=False)
+    _medical_info = db.Column(EncryptedText(FIELD_CODEC))
+    _emergency_contact = db.Column(EncryptedText(FIELD_CODEC))
 
     @property
     def name(self):
@@ -45,15 +71,20 @@ class Resident(db.Model):
     def name(self, value):
         self._name = value
 
-    @property
-    def dob(self):
-        if self._dob:
+    @staticmethod
+    def parse_dob(value):
+        """Parse a stored 'YYYY-MM-DD' date of birth, None if missing or invalid"""
+        if value:
             try:
-                return datetime.strptime(self._dob, '%Y-%m-%d').date()
+                return datetime.strptime(value, '%Y-%m-%d').date()
             except (ValueError, TypeError):
                 return None
         return None
 
+    @property
+    def dob(self):
+        return self.parse_dob(self._dob)
+
     @dob.setter
     def dob(self, value):
         if value:
@@ -89,20 +120,36 @@ class Resident(db.Model):
 
 class Vitals(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # 'breakfast'
     systolic = db.Column(db.Integer, nullable=False)
     diastolic = db.Column(db.Integer, nullable=False)
     pulse = db.Column(db.Integer, nullable=False)
 
+class VitalsBaseline(db.Model):
+    """Running vitals statistics and current anomaly flags per resident, see vitals_analytics.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, unique=True)
+    last_date = db.Column(db.Date, nullable=False)
+    readings = db.Column(db.Integer, nullable=False, default=0)
+    state = db.Column(db.Text, nullable=False)  # JSON: statistics before and after the last reading
+    flags = db.Column(db.Text)  # JSON list of {'code', 'message'}
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class FoodIntake(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # 'breakfast', 'lunch', 'dinner'
     intake_level = db.Column(db.String(20), nullable=False)  # '25%', '50%', '75%', '100%', 'Ensure', 'Other'
-    _notes = db.Column(EncryptedText)  # Encrypted notes for 'Other'
+    intake_code = db.Column(db.SmallInteger)  # intake_codes.FOOD_INTAKE_CODES, set from intake_level
+    _notes = db.Column(EncryptedText(FIELD_CODEC))  # Encrypted notes for 'Other'
+
+    @validates('intake_level')
+    def _set_intake_code(self, key, value):
+        self.intake_code = food_intake_code(value)
+        return value
 
     @hybrid_property
     def notes(self):
@@ -114,14 +161,43 @@ class FoodIntake(db.Model):
 
 class LiquidIntake(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # 'breakfast', 'lunch', 'dinner'
     intake = db.Column(db.String(20), nullable=False)  # 'Yes', 'No', 'Partial'
+    intake_code = db.Column(db.SmallInteger)  # intake_codes.LIQUID_INTAKE_CODES, set from intake
+
+    @validates('intake')
+    def _set_intake_code(self, key, value):
+        self.intake_code = liquid_intake_code(value)
+        return value
+
+class IntakeDaily(db.Model):
+    """Per-resident daily food and fluid totals, kept current by intake_risk.refresh_intake()"""
+    __table_args__ = (db.UniqueConstraint('resident_id', 'date'),)
+    id = db.Column(db.Integer, primary_key=True)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False)
+    food_total = db.Column(db.Integer, nullable=False, default=0)  # sum of percent eaten over scored meals
+    food_meals = db.Column(db.SmallInteger, nullable=False, default=0)
+    liquid_total = db.Column(db.Integer, nullable=False, default=0)  # sum of percent taken over scored entries
+    liquid_entries = db.Column(db.SmallInteger, nullable=False, default=0)
+
+class IntakeRisk(db.Model):
+    """Latest rolling intake averages and risk flags per resident, see intake_risk.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, unique=True)
+    as_of = db.Column(db.Date, nullable=False)
+    food_recent = db.Column(db.SmallInteger)  # average percent, None without enough data
+    food_baseline = db.Column(db.SmallInteger)
+    liquid_recent = db.Column(db.SmallInteger)
+    liquid_baseline = db.Column(db.SmallInteger)
+    flags = db.Column(db.Text)  # JSON list of {'code', 'message'}
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class BowelMovement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # 'breakfast', 'lunch', 'dinner'
     size = db.Column(db.String(20), nullable=False)  # 'Small', 'Medium', 'Large'
@@ -129,23 +205,32 @@ class BowelMovement(db.Model):
 
 class UrineOutput(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     meal_type = db.Column(db.String(20), nullable=False)  # 'breakfast', 'lunch', 'dinner'
     output = db.Column(db.String(20), nullable=False)  # 'Yes', 'No'
 
 class IncidentReport(db.Model):
+    # Filtered and paged by date on the incident dashboard; the last one
+    # covers the status x severity x type summary
+    __table_args__ = (
+        db.Index('ix_incident_report_date', 'date_reported', 'id'),
+        db.Index('ix_incident_report_status_date', 'status', 'date_reported', 'id'),
+        db.Index('ix_incident_report_severity_date', 'severity', 'date_reported', 'id'),
+        db.Index('ix_incident_report_type_date', 'incident_type', 'date_reported', 'id'),
+        db.Index('ix_incident_report_summary', 'status', 'severity', 'incident_type'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False)
+    resident_id = db.Column(db.Integer, db.ForeignKey('resident.id'), nullable=False, index=True)
     incident_type = db.Column(db.String(50), nullable=False)
     severity = db.Column(db.String(20), nullable=False)
-    _description = db.Column(EncryptedText, nullable=False)
-    _immediate_action = db.Column(EncryptedText)
+    _description = db.Column(EncryptedText(FIELD_CODEC), nullable=False)
+    _immediate_action = db.Column(EncryptedText(FIELD_CODEC))
     injury_occurred = db.Column(db.String(3), nullable=False)
     medical_attention = db.Column(db.String(3), nullable=False)
-    _witnesses = db.Column(EncryptedText)
+    _witnesses = db.Column(EncryptedText(FIELD_CODEC))
     follow_up_required = db.Column(db.String(3), nullable=False)
-    _follow_up_notes = db.Column(EncryptedText)
+    _follow_up_notes = db.Column(EncryptedText(FIELD_CODEC))
     date_reported = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     reported_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     status = db.Column(db.String(20), default='open')  # 'open', 'in_progress', 'closed'
@@ -181,3 +266,33 @@ class IncidentReport(db.Model):
     @follow_up_notes.setter
     def follow_up_notes(self, value):
         self._follow_up_notes = value
+
+class SchemaVersion(db.Model):
+    """One row per applied migration, see migrations.py"""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(200), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class AppSetting(db.Model):
+    """Small key/value store for application state shared between workers"""
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Text)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PendingFileDeletion(db.Model):
+    """A file whose record is gone but which may still be on disk, see file_reaper.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def get_setting(key, default=None):
+    setting = db.session.get(AppSetting, key)
+    return setting.value if setting else default
+
+def set_setting(key, value):
+    """Stage a setting change; the caller commits"""
+    setting = db.session.get(AppSetting, key)
+    if setting:
+        setting.value = value
+    else:
+        db.session.add(AppSetting(key=key, value=value))
@@ -0,0 +1,179 @@
+import cProfile
+import itertools
+import json
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+# ?_profile=cprofile or ?_profile=sample, or the same value in an X-Profile header
+PROFILE_ARG = '_profile'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.001  # seconds
+
+
+class StackSampler(threading.Thread):
+    """Record the target thread's stack every SAMPLE_INTERVAL until stop()"""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((stack, (now - last) * 1000))
+            last = now
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def speedscope(self, name):
+        """The samples as a speedscope file (https://www.speedscope.app)"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, weight in self.samples:
+            ids = []
+            for key in stack:
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+                ids.append(index[key])
+            samples.append(ids)
+            weights.append(round(weight, 3))
+        return json.dumps({
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled', 'name': name, 'unit': 'milliseconds',
+                'startValue': 0, 'endValue': round(sum(weights), 3),
+                'samples': samples, 'weights': weights,
+            }],
+            'name': name,
+            'exporter': 'afh-management',
+        }).encode()
+
+
+class ProfileStore:
+    """The last `size` request profiles, oldest dropped first"""
+
+    def __init__(self, size=20):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._profiles = deque(maxlen=size)
+
+    def resize(self, size):
+        with self._lock:
+            self._profiles = deque(self._profiles, maxlen=size)
+
+    def add(self, **profile):
+        with self._lock:
+            profile['id'] = next(self._ids)
+            self._profiles.append(profile)
+        return profile['id']
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((profile for profile in self._profiles if profile['id'] == profile_id), None)
+
+    def all(self):
+        """Newest first, without the profile data"""
+        with self._lock:
+            return [{key: value for key, value in profile.items() if key != 'data'}
+                    for profile in reversed(self._profiles)]
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profiles = ProfileStore()
+
+
+def _requested_mode():
+    mode = request.args.get(PROFILE_ARG) or request.headers.get(PROFILE_HEADER)
+    if not mode:
+        return None
+    if mode in ('1', 'true'):
+        mode = PROFILE_MODES[0]
+    return mode if mode in PROFILE_MODES else None
+
+
+def _start_profile():
+    mode = _requested_mode()
+    if mode is None or not current_user.is_authenticated or current_user.role != 'admin':
+        return
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    else:
+        profiler = StackSampler(threading.get_ident())
+        profiler.start()
+    g._profile = (mode, profiler, time.perf_counter())
+
+
+def _stop_profiler(mode, profiler):
+    if mode == 'cprofile':
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _finish_profile(response):
+    started = g.pop('_profile', None)
+    if started is None:
+        return response
+    mode, profiler, started_at = started
+    _stop_profiler(mode, profiler)
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+    name = f'{request.method} {request.path}'
+    if mode == 'cprofile':
+        data, filename = marshal.dumps(pstats.Stats(profiler).stats), 'pstats'
+    else:
+        data, filename = profiler.speedscope(name), 'speedscope.json'
+    profile_id = profiles.add(
+        mode=mode, name=name, endpoint=request.endpoint, status=response.status_code,
+        elapsed_ms=round(elapsed_ms, 1), created=datetime.now(), extension=filename, data=data,
+    )
+    response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+
+def _abandon_profile(exc):
+    # after_request doesn't run when the response itself fails
+    started = g.pop('_profile', None)
+    if started is not None:
+        _stop_profiler(started[0], started[1])
+
+
+def init_profiling(app):
+    """
+    Profile single requests on demand. An admin adds ?_profile=cprofile
+    (or sample) or an X-Profile header; the result is kept in `profiles`
+    and downloadable from /admin/profiles. Other users' flags are ignored.
+    """
+    profiles.resize(app.config['PROFILE_HISTORY'])
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
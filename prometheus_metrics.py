@@ -0,0 +1,110 @@
+import hmac
+import os
+from contextlib import contextmanager
+
+from flask import Response, abort, request
+
+from instrumentation import init_request_timing, request_observers
+
+# Metric objects, created once by init_prometheus. The helpers below are
+# no-ops until then, so call sites don't need to check whether it's enabled.
+_metrics = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+def _create_metrics():
+    from prometheus_client import Counter, Gauge, Histogram
+    return {
+        'latency': Histogram('afh_request_duration_seconds', 'Request latency', ['endpoint', 'method'],
+                             buckets=LATENCY_BUCKETS),
+        'requests': Counter('afh_requests_total', 'Requests served', ['endpoint', 'method', 'status']),
+        'queries': Counter('afh_db_queries_total', 'SQL statements executed', ['endpoint']),
+        'query_seconds': Counter('afh_db_query_seconds_total', 'Time spent executing SQL', ['endpoint']),
+        'queries_per_request': Histogram('afh_db_queries_per_request', 'SQL statements per request', ['endpoint'],
+                                         buckets=QUERY_COUNT_BUCKETS),
+        'crypto': Counter('afh_crypto_operations_total', 'Field encryptions and decryptions', ['operation']),
+        'mail_in_flight': Gauge('afh_mail_in_flight', 'Emails being sent', multiprocess_mode='livesum'),
+        'mail_sent': Counter('afh_mail_sent_total', 'Emails sent', ['result']),
+        'document_bytes': Counter('afh_document_bytes_served_total', 'Decrypted document bytes served'),
+    }
+
+
+def _observe_request(response, endpoint, elapsed_ms, counters):
+    # One update per metric per request; the per-query and per-value work
+    # stays in the thread-local counters
+    method = request.method
+    _metrics['latency'].labels(endpoint, method).observe(elapsed_ms / 1000)
+    _metrics['requests'].labels(endpoint, method, str(response.status_code)).inc()
+    if counters.queries:
+        _metrics['queries'].labels(endpoint).inc(counters.queries)
+        _metrics['query_seconds'].labels(endpoint).inc(counters.query_time)
+    _metrics['queries_per_request'].labels(endpoint).observe(counters.queries)
+    if counters.encrypts:
+        _metrics['crypto'].labels('encrypt').inc(counters.encrypts)
+    if counters.decrypts:
+        _metrics['crypto'].labels('decrypt').inc(counters.decrypts)
+
+
+def count_document_bytes(size):
+    if _metrics is not None:
+        _metrics['document_bytes'].inc(size)
+
+
+@contextmanager
+def track_mail():
+    """Wrap a send: counts it as in flight, then as sent or failed"""
+    if _metrics is None:
+        yield
+        return
+    _metrics['mail_in_flight'].inc()
+    try:
+        yield
+    except Exception:
+        _metrics['mail_sent'].labels('failed').inc()
+        raise
+    else:
+        _metrics['mail_sent'].labels('sent').inc()
+    finally:
+        _metrics['mail_in_flight'].dec()
+
+
+def _metrics_view(token):
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest, multiprocess
+    if not token:
+        # Per-route traffic is not public; without a token there is no endpoint
+        abort(404)
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        abort(401)
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # Each worker writes its samples to files in the directory; merge them all
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_prometheus(app, db):
+    """
+    Export request, SQL, crypto, mail and document metrics at /metrics,
+    for scrapers that send PROMETHEUS_METRICS_TOKEN as a bearer token.
+    Requires prometheus-client (the `metrics` extra). Set
+    PROMETHEUS_MULTIPROC_DIR when running several worker processes.
+    """
+    global _metrics
+    try:
+        import prometheus_client
+    except ImportError:
+        raise RuntimeError("PROMETHEUS_METRICS needs prometheus-client: pip install 'afh-management[metrics]'")
+    if _metrics is None:
+        _metrics = _create_metrics()
+    init_request_timing(app, db)
+    if _observe_request not in request_observers:
+        request_observers.append(_observe_request)
+    token = app.config.get('PROMETHEUS_METRICS_TOKEN')
+    app.add_url_rule('/metrics', 'prometheus_metrics', lambda: _metrics_view(token))
+    if not token:
+        app.logger.warning("PROMETHEUS_METRICS is set without PROMETHEUS_METRICS_TOKEN; /metrics answers 404")
@@ -0,0 +1,70 @@
+import os
+from sqlalchemy import select
+from file_reaper import reaper
+
+
+def delete_in_chunks(db, model, resident_id, chunk_size=5000, progress=None):
+    """
+    Delete a resident's rows from one table with set-based DELETEs of up
+    to chunk_size rows, committing after each so no transaction holds the
+    table for long. Returns the number of rows deleted.
+    """
+    table = model.__table__
+    chunk = select(table.c.id).where(table.c.resident_id == resident_id).limit(chunk_size)
+    deleted = 0
+    while True:
+        result = db.session.execute(table.delete().where(table.c.id.in_(chunk.scalar_subquery())))
+        db.session.commit()
+        if not result.rowcount:
+            return deleted
+        deleted += result.rowcount
+        if progress:
+            progress(table.name, deleted)
+
+
+def delete_documents_in_chunks(db, document_model, resident_id, upload_folder, chunk_size=5000, progress=None):
+    """
+    Like delete_in_chunks for Document rows, recording each chunk's files as
+    PendingFileDeletion rows in the same transaction and handing them to the
+    background reaper after the commit. A file can't outlive both its
+    Document row and its pending record.
+    """
+    from models import PendingFileDeletion
+    table = document_model.__table__
+    pending_table = PendingFileDeletion.__table__
+    deleted = 0
+    while True:
+        rows = db.session.execute(
+            select(table.c.id, document_model._filename).where(table.c.resident_id == resident_id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return deleted
+        paths = [os.path.join(upload_folder, filename) for _, filename in rows if filename]
+        pending_ids = [
+            db.session.execute(pending_table.insert().values(path=path)).inserted_primary_key[0]
+            for path in paths
+        ]
+        db.session.execute(table.delete().where(table.c.id.in_([row[0] for row in rows])))
+        db.session.commit()
+        reaper.enqueue(zip(pending_ids, paths))
+        deleted += len(rows)
+        if progress:
+            progress(table.name, deleted)
+
+
+def delete_resident_history(db, resident_id, history_models, document_model, upload_folder,
+                            chunk_size=5000, progress=None):
+    """
+    Delete everything recorded for a resident except the resident row,
+    table by table in history_models order (dependents first). Document
+    files are removed by the background reaper, which resumes after a
+    restart. An interrupted run can simply be repeated. Returns the total
+    number of rows deleted.
+    """
+    deleted = 0
+    for model in history_models:
+        if model is document_model:
+            deleted += delete_documents_in_chunks(db, model, resident_id, upload_folder, chunk_size, progress)
+        else:
+            deleted += delete_in_chunks(db, model, resident_id, chunk_size, progress)
+    return deleted
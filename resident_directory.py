@@ -0,0 +1,106 @@
+import threading
+import uuid
+from collections import namedtuple
+from flask import g, has_request_context
+from sqlalchemy import event, select
+
+from models import AppSetting, Resident, get_setting
+
+# Changed whenever a resident is added, edited or deleted, by any worker
+DIRECTORY_VERSION_KEY = 'resident_directory_version'
+# Session.info flag set when a flush touched residents
+_CHANGED_KEY = 'resident_directory_changed'
+
+ResidentEntry = namedtuple('ResidentEntry', ['id', 'name', 'dob', 'formatted_dob'])
+
+_STALE = object()
+
+
+class ResidentDirectory:
+    """
+    Process-wide cache of decrypted resident names and dates of birth.
+    It is tagged with the version stamp stored in AppSetting and reloaded
+    when another worker (or this one) has changed residents since.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = _STALE
+        self._entries = {}
+
+    def invalidate(self):
+        self._version = _STALE
+
+    def refresh(self, db):
+        """Reload the entries if the stored version stamp has moved. Checked once per request."""
+        if self._version is not _STALE and has_request_context() and g.get('resident_directory_checked'):
+            return
+        version = get_setting(DIRECTORY_VERSION_KEY)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    rows = db.session.execute(select(Resident.id, Resident._name, Resident._dob).order_by(Resident.id))
+                    entries = {}
+                    for resident_id, name, dob_value in rows:
+                        dob = Resident.parse_dob(dob_value)
+                        entries[resident_id] = ResidentEntry(
+                            resident_id, name, dob, dob.strftime('%B %d, %Y') if dob else None
+                        )
+                    self._entries = entries
+                    self._version = version
+        if has_request_context():
+            g.resident_directory_checked = True
+
+    def get(self, db, resident_id):
+        """Return the ResidentEntry for an id, or None"""
+        self.refresh(db)
+        return self._entries.get(resident_id)
+
+    def name(self, db, resident_id, default=None):
+        entry = self.get(db, resident_id)
+        return entry.name if entry else default
+
+    def all(self, db):
+        """Return every ResidentEntry in id order"""
+        self.refresh(db)
+        return list(self._entries.values())
+
+
+directory = ResidentDirectory()
+
+
+def bump_directory_version(session):
+    """
+    Stage a new version stamp in the session's transaction. Called
+    automatically when residents are flushed; call it yourself after bulk
+    statements that bypass the ORM.
+    """
+    with session.no_autoflush:
+        setting = session.get(AppSetting, DIRECTORY_VERSION_KEY)
+        if setting:
+            setting.value = uuid.uuid4().hex
+        else:
+            session.add(AppSetting(key=DIRECTORY_VERSION_KEY, value=uuid.uuid4().hex))
+    session.info[_CHANGED_KEY] = True
+
+
+def _bump_on_resident_change(session, flush_context, instances):
+    if any(isinstance(obj, Resident) for obj in (*session.new, *session.dirty, *session.deleted)):
+        bump_directory_version(session)
+
+
+def _invalidate_after_commit(session):
+    if session.info.pop(_CHANGED_KEY, False):
+        directory.invalidate()
+
+
+def _forget_rolled_back_change(session, previous_transaction):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def init_resident_directory(db):
+    """Register the session hooks that keep the directory's version stamp current"""
+    if not event.contains(db.session, 'before_flush', _bump_on_resident_change):
+        event.listen(db.session, 'before_flush', _bump_on_resident_change)
+        event.listen(db.session, 'after_commit', _invalidate_after_commit)
+        event.listen(db.session, 'after_soft_rollback', _forget_rolled_back_change)
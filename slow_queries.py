@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import os
+import re
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+
+from instrumentation import init_query_timing, query_observers
+
+logger = logging.getLogger('afh.slow_queries')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\$\d+|(?<!:):\w+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+_EXPLAINABLE = ('select', 'with', 'update', 'delete')
+
+_settings = {}
+
+
+def fingerprint(statement):
+    """Normalize a statement so runs with different literals or IN-list sizes group together"""
+    normalized = _STRING.sub('?', statement)
+    normalized = _PLACEHOLDER.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _IN_LIST.sub('(?+)', normalized)
+    normalized = _SPACE.sub(' ', normalized).strip().lower()
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized
+
+
+def redact(value):
+    """
+    Describe a bound parameter by type (and length for strings and bytes)
+    without its value. Parameters carry search terms, names, password
+    hashes and ciphertext, so no value is written to the log.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__} {len(value)}>'
+    return f'<{type(value).__name__}>'
+
+
+def _redacted_parameters(parameters):
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    return [redact(value) for value in parameters or ()]
+
+
+def _explain(conn, statement, parameters):
+    """EXPLAIN QUERY PLAN on a fresh DBAPI cursor, so it isn't timed or logged itself"""
+    if conn.dialect.name != 'sqlite' or not statement.lstrip().lower().startswith(_EXPLAINABLE):
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        cursor.close()
+
+
+def _log_slow_query(conn, statement, parameters, context, executemany, elapsed):
+    elapsed_ms = elapsed * 1000
+    if elapsed_ms < _settings['threshold_ms']:
+        return
+    query_id, _ = fingerprint(statement)
+    logger.warning(json.dumps({
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'ms': round(elapsed_ms, 2),
+        'route': (request.endpoint or request.path) if has_request_context() else None,
+        'fingerprint': query_id,
+        'sql': statement,
+        'parameters': '<executemany>' if executemany else _redacted_parameters(parameters),
+        'plan': None if executemany else _explain(conn, statement, parameters),
+    }))
+
+
+def init_slow_query_log(app, db):
+    """
+    Log statements slower than SLOW_QUERY_MS as JSON lines to SLOW_QUERY_LOG,
+    rotated at SLOW_QUERY_LOG_BYTES, with parameter types, the route
+    and (on SQLite) the EXPLAIN QUERY PLAN.
+    """
+    _settings['threshold_ms'] = app.config['SLOW_QUERY_MS']
+    path = app.config['SLOW_QUERY_LOG']
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=app.config['SLOW_QUERY_LOG_BYTES'], backupCount=5)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+        logger.propagate = False
+    init_query_timing(app, db)
+    if _log_slow_query not in query_observers:
+        query_observers.append(_log_slow_query)
+
+
+def slowest_statements(path, limit=50):
+    """Aggregate the current slow query log by fingerprint, highest total time first"""
+    groups = {}
+    if not os.path.exists(path):
+        return []
+    with open(path) as log_file:
+        for line in log_file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            group = groups.get(entry['fingerprint'])
+            if group is None:
+                group = groups[entry['fingerprint']] = {
+                    'fingerprint': entry['fingerprint'], 'statement': fingerprint(entry['sql'])[1],
+                    'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'routes': set(),
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['ms']
+            if entry['ms'] >= group['max_ms']:
+                # Keep the slowest run's parameters and plan as the example
+                group.update(max_ms=entry['ms'], sql=entry['sql'], parameters=entry['parameters'],
+                             plan=entry['plan'], last_seen=entry['time'])
+            if entry['route']:
+                group['routes'].add(entry['route'])
+    rows = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:limit]
+    for row in rows:
+        row['avg_ms'] = round(row['total_ms'] / row['count'], 1)
+        row['total_ms'] = round(row['total_ms'], 1)
+        row['routes'] = sorted(row['routes'])
+    return rows
@@ -0,0 +1,196 @@
+import json
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import select
+
+from models import Vitals, VitalsBaseline
+
+METRICS = ('systolic', 'diastolic', 'pulse')
+
+# Weight of the newest reading in the exponentially weighted baseline
+EWMA_ALPHA = 0.2
+# Readings in the rolling baseline used for z-scores on the history chart
+ROLLING_WINDOW = 14
+# A reading this many standard deviations from the baseline is flagged
+Z_THRESHOLD = 3.0
+# Readings needed before the baseline is trusted for z-scores and trends
+MIN_READINGS = 5
+# Lower bound on the baseline standard deviation, so a resident with very
+# steady readings isn't flagged for ordinary measurement noise
+MIN_STD = {'systolic': 5.0, 'diastolic': 4.0, 'pulse': 4.0}
+
+# Flags on a baseline whose last reading is older than this are no longer shown
+FLAG_MAX_AGE_DAYS = 3
+
+# (code, label, metric, test on the EWMA value). EWMA levels move slowly,
+# so crossing one of these means a sustained change, not a single reading.
+TREND_RULES = [
+    ('hypertension', 'Sustained hypertension', 'systolic', lambda value: value >= 140),
+    ('diastolic_hypertension', 'Sustained diastolic hypertension', 'diastolic', lambda value: value >= 90),
+    ('hypotension', 'Sustained hypotension', 'systolic', lambda value: value < 90),
+    ('bradycardia', 'Sustained bradycardia', 'pulse', lambda value: value < 50),
+    ('tachycardia', 'Sustained tachycardia', 'pulse', lambda value: value > 100),
+]
+
+
+def load_vitals_arrays(db, resident_id, start=None):
+    """Load a resident's vitals in date order as arrays: dates (datetime64[D]) and one int array per metric"""
+    query = select(Vitals.date, Vitals.systolic, Vitals.diastolic, Vitals.pulse).where(Vitals.resident_id == resident_id)
+    if start:
+        query = query.where(Vitals.date >= start)
+    rows = db.session.execute(query.order_by(Vitals.date, Vitals.id)).all()
+    columns = list(zip(*rows)) if rows else [(), (), (), ()]
+    arrays = {'dates': np.array(columns[0], dtype='datetime64[D]')}
+    for metric, values in zip(METRICS, columns[1:]):
+        arrays[metric] = np.array(values, dtype=float)
+    return arrays
+
+
+def rolling_baseline(values, window=ROLLING_WINDOW):
+    """
+    Mean and standard deviation of the `window` readings before each one,
+    so a reading is never compared with itself. NaN until two earlier
+    readings exist.
+    """
+    padded = np.concatenate(([0.0], np.cumsum(values)))
+    padded_sq = np.concatenate(([0.0], np.cumsum(values * values)))
+    index = np.arange(len(values))
+    low = np.maximum(index - window, 0)
+    count = index - low
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (padded[index] - padded[low]) / count
+        variance = (padded_sq[index] - padded_sq[low]) / count - mean * mean
+        std = np.sqrt(np.maximum(variance, 0) * count / (count - 1))
+    mean[count < 2] = np.nan
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def ewma(values, alpha=EWMA_ALPHA):
+    """Exponentially weighted moving average, seeded with the first reading"""
+    result = np.empty(len(values))
+    level = values[0] if len(values) else 0.0
+    for i, value in enumerate(values):
+        level += alpha * (value - level)
+        result[i] = level
+    return result
+
+
+def analyze_vitals(arrays, window=ROLLING_WINDOW, alpha=EWMA_ALPHA):
+    """Per-metric rolling baseline, z-scores, EWMA and anomaly mask for a resident's history"""
+    analysis = {'dates': [str(day) for day in arrays['dates']]}
+    for metric in METRICS:
+        values = arrays[metric]
+        mean, std = rolling_baseline(values, window)
+        z = (values - mean) / np.fmax(std, MIN_STD[metric])
+        analysis[metric] = {
+            'values': values.tolist(),
+            'baseline': _json_floats(mean),
+            'z_score': _json_floats(z),
+            'ewma': _json_floats(ewma(values, alpha)),
+            'anomaly': (np.abs(np.nan_to_num(z)) >= Z_THRESHOLD).tolist(),
+        }
+    return analysis
+
+
+def _json_floats(values):
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def fold_reading(stats, reading, alpha=EWMA_ALPHA):
+    """
+    Return new running statistics after one reading. stats maps each
+    metric to [ewma, exponentially weighted variance, readings].
+    """
+    updated = {}
+    for metric in METRICS:
+        value = float(reading[metric])
+        if not stats:
+            updated[metric] = [value, 0.0, 1]
+            continue
+        mean, variance, count = stats[metric]
+        delta = value - mean
+        mean += alpha * delta
+        variance = (1 - alpha) * (variance + alpha * delta * delta)
+        updated[metric] = [mean, variance, count + 1]
+    return updated
+
+
+def evaluate_flags(stats_before, stats_after, reading):
+    """Flags for the latest reading: z-score spikes against the previous baseline and sustained EWMA trends"""
+    flags = []
+    for metric in METRICS:
+        if not stats_before or stats_before[metric][2] < MIN_READINGS:
+            continue
+        mean, variance, _ = stats_before[metric]
+        z = (reading[metric] - mean) / max(variance ** 0.5, MIN_STD[metric])
+        if abs(z) >= Z_THRESHOLD:
+            direction = 'above' if z > 0 else 'below'
+            flags.append({
+                'code': f'{metric}_spike',
+                'message': f"{metric.title()} {reading[metric]} is {abs(z):.1f} SD {direction} baseline {mean:.0f}",
+            })
+    for code, label, metric, test in TREND_RULES:
+        level, _, count = stats_after[metric]
+        if count >= MIN_READINGS and test(level):
+            flags.append({'code': code, 'message': f"{label} ({metric} trend {level:.1f})"})
+    return flags
+
+
+def rebuild_vitals_baseline(db, resident_id):
+    """Rebuild a resident's cached baseline from their full vitals history"""
+    arrays = load_vitals_arrays(db, resident_id)
+    baseline = VitalsBaseline.query.filter_by(resident_id=resident_id).first()
+    if not len(arrays['dates']):
+        if baseline:
+            db.session.delete(baseline)
+        return None
+    stats_before, stats = None, None
+    for i in range(len(arrays['dates'])):
+        stats_before, stats = stats, fold_reading(stats, {metric: arrays[metric][i] for metric in METRICS})
+    last_reading = {metric: int(arrays[metric][-1]) for metric in METRICS}
+    if not baseline:
+        baseline = VitalsBaseline(resident_id=resident_id)
+        db.session.add(baseline)
+    baseline.last_date = arrays['dates'][-1].item()
+    baseline.readings = len(arrays['dates'])
+    baseline.state = json.dumps({'before': stats_before, 'after': stats})
+    baseline.flags = json.dumps(evaluate_flags(stats_before, stats, last_reading))
+    return baseline
+
+
+def update_vitals_baseline(db, resident_id, day, reading):
+    """
+    Fold one day's reading into the resident's cached baseline without
+    rescanning history. A second reading for the same day replaces the
+    first, using the statistics saved from before it. Falls back to a
+    rebuild when there is no baseline yet or the reading is out of order.
+    The caller commits.
+    """
+    baseline = VitalsBaseline.query.filter_by(resident_id=resident_id).first()
+    if not baseline or day < baseline.last_date:
+        return rebuild_vitals_baseline(db, resident_id)
+    state = json.loads(baseline.state)
+    if day == baseline.last_date:
+        stats_before = state['before']
+        readings = baseline.readings
+    else:
+        stats_before = state['after']
+        readings = baseline.readings + 1
+    stats = fold_reading(stats_before, reading)
+    baseline.last_date = day
+    baseline.readings = readings
+    baseline.state = json.dumps({'before': stats_before, 'after': stats})
+    baseline.flags = json.dumps(evaluate_flags(stats_before, stats, reading))
+    return baseline
+
+
+def flagged_residents(db, today):
+    """Return [(resident_id, flags, last_date)] for residents flagged on a reading from the last FLAG_MAX_AGE_DAYS"""
+    rows = db.session.execute(
+        select(VitalsBaseline.resident_id, VitalsBaseline.flags, VitalsBaseline.last_date)
+        .where(VitalsBaseline.flags.isnot(None), VitalsBaseline.flags != '[]',
+               VitalsBaseline.last_date >= today - timedelta(days=FLAG_MAX_AGE_DAYS))
+    ).all()
+    return [(resident_id, json.loads(flags), last_date) for resident_id, flags, last_date in rows]